@@ -0,0 +1,72 @@
+"""Query shaped indexes
+
+Revision ID: 6e1253f01759
+Revises: 7f0fd7e50b9f
+Create Date: 2026-10-18 02:15:04.512871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e1253f01759'
+down_revision: Union[str, None] = '7f0fd7e50b9f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Primary keys are already indexed
+    op.drop_index(op.f('ix_classes_id'), table_name='classes')
+    op.drop_index(op.f('ix_bookings_id'), table_name='bookings')
+
+    # Upcoming classes filter and sort on scheduled_at, paginating on id
+    op.drop_index(op.f('ix_classes_scheduled_at'), table_name='classes')
+    op.create_index('ix_classes_scheduled_at_id', 'classes', ['scheduled_at', 'id'], unique=False)
+
+    # Booking history filters on client_email and sorts on booking_time
+    op.drop_index(op.f('ix_bookings_client_email'), table_name='bookings')
+    op.create_index('ix_bookings_client_email_booking_time', 'bookings', ['client_email', 'booking_time', 'id'], unique=False)
+
+    # Concurrent bookings could confirm the same client twice for a class.
+    # Keep the earliest booking, cancel the later ones and give their
+    # spots back, or the unique index below cannot be created
+    later_duplicate = (
+        "status = 'confirmed' AND EXISTS ("
+        "SELECT 1 FROM bookings AS earlier"
+        " WHERE earlier.class_id = bookings.class_id"
+        " AND earlier.client_email = bookings.client_email"
+        " AND earlier.status = 'confirmed'"
+        " AND earlier.id < bookings.id)"
+    )
+    op.execute(
+        "UPDATE classes SET available_slots = CASE"
+        " WHEN available_slots + freed > total_slots THEN total_slots"
+        " ELSE available_slots + freed END"
+        " FROM (SELECT class_id, COUNT(*) AS freed FROM bookings"
+        f" WHERE {later_duplicate} GROUP BY class_id) AS duplicates"
+        " WHERE classes.id = duplicates.class_id"
+    )
+    op.execute(f"UPDATE bookings SET status = 'cancelled' WHERE {later_duplicate}")
+
+    # Duplicate check, and at most one confirmed booking per client and class
+    op.create_index(
+        'uq_bookings_confirmed_class_email', 'bookings', ['class_id', 'client_email'], unique=True,
+        sqlite_where=sa.text("status = 'confirmed'"),
+        postgresql_where=sa.text("status = 'confirmed'")
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_bookings_confirmed_class_email', table_name='bookings')
+    op.drop_index('ix_bookings_client_email_booking_time', table_name='bookings')
+    op.create_index(op.f('ix_bookings_client_email'), 'bookings', ['client_email'], unique=False)
+    op.drop_index('ix_classes_scheduled_at_id', table_name='classes')
+    op.create_index(op.f('ix_classes_scheduled_at'), 'classes', ['scheduled_at'], unique=False)
+    op.create_index(op.f('ix_bookings_id'), 'bookings', ['id'], unique=False)
+    op.create_index(op.f('ix_classes_id'), 'classes', ['id'], unique=False)
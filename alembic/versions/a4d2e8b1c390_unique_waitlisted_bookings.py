@@ -0,0 +1,45 @@
+"""Unique waitlisted bookings
+
+Revision ID: a4d2e8b1c390
+Revises: 893dd42a7ed6
+Create Date: 2026-10-18 11:42:18.206514
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d2e8b1c390'
+down_revision: Union[str, None] = '893dd42a7ed6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Concurrent requests could put a client on a waitlist twice. Keep the
+    # earliest place and cancel the later ones, or the index cannot be created
+    later_duplicate = (
+        "status = 'waitlisted' AND EXISTS ("
+        "SELECT 1 FROM bookings AS earlier"
+        " WHERE earlier.class_id = bookings.class_id"
+        " AND earlier.client_email = bookings.client_email"
+        " AND earlier.status = 'waitlisted'"
+        " AND earlier.id < bookings.id)"
+    )
+    op.execute(f"DELETE FROM waitlist_entries WHERE booking_id IN (SELECT id FROM bookings WHERE {later_duplicate})")
+    op.execute(f"UPDATE bookings SET status = 'cancelled' WHERE {later_duplicate}")
+
+    op.create_index(
+        'uq_bookings_waitlisted_class_email', 'bookings', ['class_id', 'client_email'], unique=True,
+        sqlite_where=sa.text("status = 'waitlisted'"),
+        postgresql_where=sa.text("status = 'waitlisted'")
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_bookings_waitlisted_class_email', table_name='bookings')
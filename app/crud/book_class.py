@@ -1,16 +1,51 @@
 import logging
 from datetime import datetime, timezone
-from typing import List, Optional
+from typing import Iterable, List, Optional, Tuple
 
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, case, delete, func, or_, select, update
 
-from ..models import FitnessClass, Booking
-from ..schemas import BookingCreate
+from ..models import FitnessClass, Booking, WaitlistEntry
+from ..schemas import BatchBookingCreate, BookingCreate
+from .fitness_class import get_remaining_slots
+from .slot_shards import SLOT_SHARDS, reserve_from_shards
+from ..utils.availability import availability_broker
+from ..utils.cache import bump_schedule_version
+from ..utils.negative_cache import negative_cache
+from ..utils.timezone_utils import as_utc
 
 logger = logging.getLogger(__name__)
 
 
+class BookingError(Exception):
+    """Base class for reasons a booking cannot be made"""
+
+
+class ClassNotFoundError(BookingError):
+    """The requested class does not exist"""
+
+
+class ClassAlreadyOverError(BookingError):
+    """The requested class has already started"""
+
+
+class DuplicateBookingError(BookingError):
+    """The client already holds a confirmed booking for the class"""
+
+
+class NoAvailableSlotsError(BookingError):
+    """The requested class is fully booked"""
+
+
+class BookingNotFoundError(BookingError):
+    """The booking does not exist or belongs to another client"""
+
+
+class BookingAlreadyCancelledError(BookingError):
+    """The booking was cancelled before"""
+
+
 def get_class(db: Session, class_id: int) -> Optional[FitnessClass]:
     """Get a fitness class by ID"""
     return db.query(FitnessClass).filter(FitnessClass.id == class_id).first()
@@ -29,44 +64,504 @@ def check_existing_booking(db: Session, class_id: int, email: str) -> Optional[B
         .first()
     )
 
-def create_booking(db: Session, booking_data: BookingCreate) -> Optional[Booking]:
+def publish_availability(db: Session, class_ids: Iterable[int]) -> None:
     """
-    Create a new booking with slot validation
-    
+    Push the new open-spot counts of classes someone is watching
+
+    Called after the write has committed, so it is best-effort: a failed
+    read is logged and the watchers miss one update, but the write it
+    follows never turns into an error.
+    """
+    watched = [class_id for class_id in class_ids if availability_broker.is_watched(class_id)]
+    if not watched:
+        return
+    # Taken before the read, so a count read later always wins
+    sequence = availability_broker.next_sequence()
+    try:
+        counts = get_remaining_slots(db, watched)
+    except Exception as e:
+        logger.warning(f"Could not publish availability of classes {watched}: {str(e)}")
+        return
+    for class_id, available_slots in counts.items():
+        availability_broker.publish(class_id, available_slots, sequence)
+
+def _rejection(db_class: Optional[FitnessClass], class_id: int, has_booking: bool, now: datetime) -> BookingError:
+    """The error explaining why a slot in a class could not be reserved"""
+    if not db_class:
+        return ClassNotFoundError(f"Class with id {class_id} not found")
+    if as_utc(db_class.scheduled_at) <= now:
+        return ClassAlreadyOverError("Class is already over")
+    if has_booking:
+        return DuplicateBookingError("You already have a booking for this class")
+    return NoAvailableSlotsError("No available slots for this class")
+
+def _reject_or_waitlist(db: Session, booking_data: BookingCreate, now: datetime) -> Tuple[Booking, datetime]:
+    """
+    Work out why a slot could not be reserved and raise the matching error,
+    or put the client on the waitlist when the class is full and they asked
     """
-    # Check if class exists and has available slots
     db_class = get_class(db, booking_data.class_id)
-    
-    # Create the booking
+    has_booking = bool(db_class) and check_existing_booking(
+        db, booking_data.class_id, booking_data.client_email
+    ) is not None
+    rejection = _rejection(db_class, booking_data.class_id, has_booking, now)
+    if db_class:
+        negative_cache.note_class(db_class.id, db_class.scheduled_at)
+    if has_booking:
+        negative_cache.note_booking(booking_data.class_id, booking_data.client_email)
+    if isinstance(rejection, NoAvailableSlotsError):
+        negative_cache.mark_sold_out(booking_data.class_id)
+    if not (isinstance(rejection, NoAvailableSlotsError) and booking_data.join_waitlist):
+        raise rejection
+
+    already_waiting = (
+        db.query(Booking.id)
+        .filter(
+            Booking.class_id == booking_data.class_id,
+            Booking.client_email == booking_data.client_email,
+            Booking.status == "waitlisted"
+        )
+        .first()
+    )
+    if already_waiting:
+        raise DuplicateBookingError("You are already on the waitlist for this class")
+
+    db_booking = Booking(
+        class_id=booking_data.class_id,
+        client_name=booking_data.client_name,
+        client_email=booking_data.client_email,
+        booking_time=now,
+        status="waitlisted"
+    )
+    try:
+        # The unique index on waitlisted bookings catches a concurrent
+        # request that got past the check above
+        with db.begin_nested():
+            db.add(db_booking)
+            db.flush()
+    except IntegrityError:
+        raise DuplicateBookingError("You are already on the waitlist for this class")
+    db.add(WaitlistEntry(class_id=booking_data.class_id, booking_id=db_booking.id, created_at=now))
+    return db_booking, db_class.scheduled_at
+
+def _reserve(db: Session, booking_data: BookingCreate, now: datetime) -> Tuple[Booking, datetime]:
+    """
+    Take a slot and add the booking to the session, without committing
+
+    Raises the matching BookingError when no slot could be taken, or adds
+    a waitlisted booking instead when the class is full and the client
+    asked to wait. Requests the negative cache knows to be doomed are
+    rejected before the write, without SQL for started and sold-out
+    classes, and with a single read to confirm a duplicate.
+    """
+    class_id, email = booking_data.class_id, booking_data.client_email
+    if negative_cache.has_started(class_id, now):
+        raise ClassAlreadyOverError("Class is already over")
+    if negative_cache.may_have_booking(class_id, email):
+        has_booking = check_existing_booking(db, class_id, email) is not None
+        negative_cache.record_duplicate_check(has_booking)
+        if has_booking:
+            raise DuplicateBookingError("You already have a booking for this class")
+    if not booking_data.join_waitlist and negative_cache.is_sold_out(class_id):
+        raise NoAvailableSlotsError("No available slots for this class")
+
+    reserved = db.execute(
+        update(FitnessClass)
+        .where(
+            FitnessClass.id == booking_data.class_id,
+            FitnessClass.available_slots > 0,
+            FitnessClass.scheduled_at > now
+        )
+        .values(
+            available_slots=FitnessClass.available_slots - 1,
+            updated_at=now
+        )
+        .returning(FitnessClass.scheduled_at)
+        .execution_options(synchronize_session=False)
+    ).first()
+    scheduled_at = reserved.scheduled_at if reserved else None
+    if scheduled_at is not None:
+        negative_cache.note_class(class_id, scheduled_at)
+
+    # A sharded class keeps its open spots in shard rows instead
+    if scheduled_at is None and SLOT_SHARDS and reserve_from_shards(
+        db, booking_data.class_id, booking_data.client_email, now
+    ):
+        scheduled_at = db.query(FitnessClass.scheduled_at).filter(
+            FitnessClass.id == booking_data.class_id
+        ).scalar()
+
+    if scheduled_at is None:
+        return _reject_or_waitlist(db, booking_data, now)
+
+    # Existing bookings were checked above; a duplicate made since is
+    # caught by the unique index on confirmed bookings at commit
     db_booking = Booking(
         class_id=booking_data.class_id,
         client_name=booking_data.client_name,
         client_email=booking_data.client_email,
-        booking_time=datetime.now(timezone.utc),
+        booking_time=now,
         status="confirmed"
     )
-    
-    # Decrease available slots
-    db_class.available_slots -= 1
-    db_class.updated_at = datetime.now(timezone.utc)
-    
-    # Add both to session and commit
     db.add(db_booking)
-    db.commit()
-    db.refresh(db_booking)
-    
-    logger.info(f"Created booking: {db_booking.id} for class {booking_data.class_id}")
-    return db_booking
+    return db_booking, scheduled_at
+
+def create_booking(db: Session, booking_data: BookingCreate) -> Tuple[Booking, datetime]:
+    """
+    Reserve a slot and create the booking in one short transaction
+
+    The slot is taken with a single conditional decrement, so concurrent
+    requests can never push available_slots below zero. The class is only
+    re-read when nothing was reserved, to report why. A full class puts
+    the client on its waitlist instead when join_waitlist is set. Returns
+    the booking together with the class start time.
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        db_booking, scheduled_at = _reserve(db, booking_data, now)
+        db.commit()
+    except IntegrityError:
+        # The unique index on confirmed bookings caught a concurrent duplicate
+        db.rollback()
+        raise DuplicateBookingError("You already have a booking for this class")
+    except Exception:
+        db.rollback()
+        raise
+    if db_booking.status == "confirmed":
+        negative_cache.note_booking(db_booking.class_id, db_booking.client_email)
+        bump_schedule_version()
+        publish_availability(db, [booking_data.class_id])
+
+    logger.info(f"Created {db_booking.status} booking: {db_booking.id} for class {booking_data.class_id}")
+    return db_booking, scheduled_at
+
+def _promote_from_waitlist(db: Session, class_id: int) -> Optional[Booking]:
+    """
+    Confirm the booking at the head of a class's waitlist
 
-def get_bookings_with_class_details_by_email(db: Session, email: str) -> List[dict]:
-    """Get all bookings with class details for a specific email"""
-    results = (
+    The head is found through the (class_id, id) index and removed with a
+    conditional delete, so each promotion costs the same however long the
+    waitlist is. Clients who meanwhile got a confirmed booking some other
+    way are dropped from the waitlist and the next one is tried.
+    """
+    while True:
+        head = (
+            db.query(WaitlistEntry)
+            .filter(WaitlistEntry.class_id == class_id)
+            .order_by(WaitlistEntry.id.asc())
+            .first()
+        )
+        if head is None:
+            return None
+
+        removed = db.execute(
+            delete(WaitlistEntry)
+            .where(WaitlistEntry.id == head.id)
+            .execution_options(synchronize_session=False)
+        )
+        if not removed.rowcount:
+            # Another cancellation promoted this client first
+            continue
+
+        waiting = db.query(Booking).filter(Booking.id == head.booking_id).one()
+        if check_existing_booking(db, class_id, waiting.client_email):
+            waiting.status = "cancelled"
+            continue
+
+        waiting.status = "confirmed"
+        waiting.booking_time = datetime.now(timezone.utc)
+        return waiting
+
+def fill_from_waitlist(db: Session, class_ids: Iterable[int]) -> List[Booking]:
+    """
+    Move waitlisted clients into open spots of upcoming classes, without
+    committing
+
+    Used when capacity grows, since otherwise clients are only promoted
+    when someone cancels. Each promotion takes a spot with the same
+    conditional decrement as a booking. Returns the promoted bookings.
+    """
+    now = datetime.now(timezone.utc)
+    waiting = [
+        class_id for (class_id,) in
+        db.query(WaitlistEntry.class_id).filter(WaitlistEntry.class_id.in_(list(class_ids))).distinct()
+    ]
+    promoted = []
+    for class_id in waiting:
+        while True:
+            taken = db.execute(
+                update(FitnessClass)
+                .where(
+                    FitnessClass.id == class_id,
+                    FitnessClass.available_slots > 0,
+                    FitnessClass.scheduled_at > now
+                )
+                .values(available_slots=FitnessClass.available_slots - 1, updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            if not taken.rowcount:
+                break
+            booking = _promote_from_waitlist(db, class_id)
+            if booking is None:
+                # Nobody left waiting; give the spot back
+                db.execute(
+                    update(FitnessClass)
+                    .where(FitnessClass.id == class_id)
+                    .values(available_slots=FitnessClass.available_slots + 1)
+                    .execution_options(synchronize_session=False)
+                )
+                break
+            promoted.append(booking)
+    return promoted
+
+def cancel_booking(db: Session, booking_id: int, email: str) -> Tuple[Booking, datetime, Optional[Booking]]:
+    """
+    Cancel a booking and hand its spot to the next client on the waitlist
+
+    The promotion happens in the same transaction as the cancellation; the
+    spot is only released to the class when nobody is waiting. Returns the
+    cancelled booking, the class start time and the promoted booking, if any.
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        db_booking = (
+            db.query(Booking)
+            .filter(Booking.id == booking_id, Booking.client_email == email)
+            .first()
+        )
+        if not db_booking:
+            raise BookingNotFoundError(f"Booking with id {booking_id} not found")
+        if db_booking.status == "cancelled":
+            raise BookingAlreadyCancelledError("Booking is already cancelled")
+
+        db_class = get_class(db, db_booking.class_id)
+        if as_utc(db_class.scheduled_at) <= now:
+            raise ClassAlreadyOverError("Class is already over")
+
+        previous_status = db_booking.status
+        cancelled = db.execute(
+            update(Booking)
+            .where(Booking.id == booking_id, Booking.status == previous_status)
+            .values(status="cancelled")
+            .execution_options(synchronize_session=False)
+        )
+        if not cancelled.rowcount:
+            raise BookingAlreadyCancelledError("Booking is already cancelled")
+        db_booking.status = "cancelled"
+
+        promoted = None
+        if previous_status == "waitlisted":
+            db.execute(
+                delete(WaitlistEntry)
+                .where(WaitlistEntry.booking_id == booking_id)
+                .execution_options(synchronize_session=False)
+            )
+        else:
+            promoted = _promote_from_waitlist(db, db_booking.class_id)
+            if promoted is None:
+                db.execute(
+                    update(FitnessClass)
+                    .where(FitnessClass.id == db_booking.class_id)
+                    .values(
+                        available_slots=FitnessClass.available_slots + 1,
+                        updated_at=now
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    if previous_status == "confirmed":
+        bump_schedule_version()
+        if promoted is None:
+            negative_cache.reopen(db_booking.class_id)
+            publish_availability(db, [db_booking.class_id])
+        else:
+            negative_cache.note_booking(promoted.class_id, promoted.client_email)
+
+    logger.info(
+        f"Cancelled booking: {booking_id} for class {db_booking.class_id}"
+        + (f", promoted booking {promoted.id}" if promoted else "")
+    )
+    return db_booking, db_class.scheduled_at, promoted
+
+def create_bookings_batch(db: Session, batch: BatchBookingCreate) -> List[dict]:
+    """
+    Book several classes for one client in a single transaction
+
+    All requested slots are reserved by one conditional UPDATE that also
+    skips classes the client has already booked. The classes and bookings
+    are only read to explain rejections. In all_or_nothing mode any
+    rejection rolls the whole batch back; in best_effort mode the
+    reservable classes are booked. Returns one result dict per requested
+    class, in request order.
+    """
+    now = datetime.now(timezone.utc)
+    class_ids = batch.class_ids
+    already_booked = (
+        select(Booking.id)
+        .where(
+            Booking.class_id == FitnessClass.id,
+            Booking.client_email == batch.client_email,
+            Booking.status == "confirmed"
+        )
+        .exists()
+    )
+    try:
+        reserved = dict(db.execute(
+            update(FitnessClass)
+            .where(
+                FitnessClass.id.in_(class_ids),
+                FitnessClass.available_slots > 0,
+                FitnessClass.scheduled_at > now,
+                ~already_booked
+            )
+            .values(
+                available_slots=FitnessClass.available_slots - 1,
+                updated_at=now
+            )
+            .returning(FitnessClass.id, FitnessClass.scheduled_at)
+            .execution_options(synchronize_session=False)
+        ).all())
+
+        if SLOT_SHARDS:
+            sharded = [
+                class_id for class_id in class_ids
+                if class_id not in reserved
+                and reserve_from_shards(db, class_id, batch.client_email, now)
+            ]
+            if sharded:
+                reserved.update(
+                    db.query(FitnessClass.id, FitnessClass.scheduled_at)
+                    .filter(FitnessClass.id.in_(sharded))
+                    .all()
+                )
+
+        rejections = {}
+        unreserved = [class_id for class_id in class_ids if class_id not in reserved]
+        if unreserved:
+            found = {
+                db_class.id: db_class
+                for db_class in db.query(FitnessClass).filter(FitnessClass.id.in_(unreserved))
+            }
+            booked = {
+                class_id for (class_id,) in db.query(Booking.class_id).filter(
+                    Booking.class_id.in_(unreserved),
+                    Booking.client_email == batch.client_email,
+                    Booking.status == "confirmed"
+                )
+            }
+            rejections = {
+                class_id: _rejection(found.get(class_id), class_id, class_id in booked, now)
+                for class_id in unreserved
+            }
+
+        bookings = {}
+        if rejections and batch.mode == "all_or_nothing":
+            db.rollback()
+        else:
+            bookings = {
+                class_id: Booking(
+                    class_id=class_id,
+                    client_name=batch.client_name,
+                    client_email=batch.client_email,
+                    booking_time=now,
+                    status="confirmed"
+                )
+                for class_id in reserved
+            }
+            db.add_all(bookings.values())
+            db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise DuplicateBookingError("You already have a booking for one of these classes")
+    except Exception:
+        db.rollback()
+        raise
+    if bookings:
+        for class_id in bookings:
+            negative_cache.note_booking(class_id, batch.client_email)
+        bump_schedule_version()
+        publish_availability(db, bookings.keys())
+
+    results = []
+    for class_id in class_ids:
+        if class_id in rejections:
+            results.append({"class_id": class_id, "status": "rejected", "detail": str(rejections[class_id])})
+        elif class_id in bookings:
+            results.append({
+                "class_id": class_id,
+                "status": "confirmed",
+                "booking": bookings[class_id],
+                "scheduled_at": reserved[class_id]
+            })
+        else:
+            results.append({"class_id": class_id, "status": "rejected", "detail": "Batch rolled back"})
+
+    logger.info(f"Batch booked {len(bookings)} of {len(class_ids)} classes for {batch.client_email}")
+    return results
+
+def load_negative_cache(db: Session) -> int:
+    """
+    Seed the negative cache with the upcoming classes and their confirmed
+    bookings, so duplicates of bookings made before startup are recognised
+    too. Returns the number of bookings loaded.
+    """
+    now = datetime.now(timezone.utc)
+    upcoming = db.query(FitnessClass.id, FitnessClass.scheduled_at).filter(FitnessClass.scheduled_at > now).all()
+    bookings = (
+        db.query(Booking.class_id, Booking.client_email)
+        .join(FitnessClass, FitnessClass.id == Booking.class_id)
+        .filter(FitnessClass.scheduled_at > now, Booking.status == "confirmed")
+        .all()
+    )
+    negative_cache.load(upcoming, bookings)
+    return len(bookings)
+
+def get_bookings_fingerprint(db: Session, email: str) -> tuple:
+    """
+    Values that change whenever a client's booking history does
+
+    New bookings raise the count and max id; cancellations and waitlist
+    promotions move bookings between statuses.
+    """
+    return tuple(db.execute(
+        select(
+            func.count(Booking.id),
+            func.max(Booking.id),
+            func.sum(case((Booking.status == "confirmed", 1), else_=0)),
+            func.sum(case((Booking.status == "waitlisted", 1), else_=0))
+        ).where(Booking.client_email == email)
+    ).one())
+
+def get_bookings_with_class_details_by_email(
+    db: Session,
+    email: str,
+    limit: Optional[int] = None,
+    after: Optional[Tuple[datetime, int]] = None
+) -> List[dict]:
+    """
+    Get bookings with class details for a specific email, newest first
+
+    Paginates by keyset: pass the (booking_time, id) of the last row seen
+    as after to continue from it.
+    """
+    query = (
         db.query(Booking, FitnessClass)
         .join(FitnessClass, Booking.class_id == FitnessClass.id)
         .filter(Booking.client_email == email)
-        .order_by(Booking.booking_time.desc())
-        .all()
     )
+    if after is not None:
+        booking_time, booking_id = after
+        query = query.filter(
+            Booking.booking_time <= booking_time,
+            or_(Booking.booking_time < booking_time, Booking.id < booking_id)
+        )
+    query = query.order_by(Booking.booking_time.desc(), Booking.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    results = query.all()
     
     bookings_with_details = []
     for booking, fitness_class in results:
@@ -82,4 +577,4 @@ def get_bookings_with_class_details_by_email(db: Session, email: str) -> List[di
             "status": booking.status
         })
     
-    return bookings_with_details
\ No newline at end of file
+    return bookings_with_details
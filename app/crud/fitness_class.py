@@ -1,13 +1,73 @@
 from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
 
-from sqlalchemy.orm import Session
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session, undefer
 
-from ..models import FitnessClass
+from ..models import ClassSlotShard, FitnessClass
+from .slot_shards import SLOT_SHARDS
 
-def get_upcoming_classes(db: Session, current_time: datetime):
-    return (
-        db.query(FitnessClass)
-        .filter(FitnessClass.scheduled_at > current_time)
-        .order_by(FitnessClass.scheduled_at.asc())
-        .all()
-    )
+def get_upcoming_classes(
+    db: Session,
+    current_time: datetime,
+    limit: Optional[int] = None,
+    after: Optional[Tuple[datetime, int]] = None
+):
+    """
+    Get upcoming classes ordered by start time
+
+    Paginates by keyset: pass the (scheduled_at, id) of the last row seen
+    as after to continue from it.
+    """
+    query = db.query(FitnessClass).filter(FitnessClass.scheduled_at > current_time)
+    if SLOT_SHARDS:
+        query = query.options(undefer(FitnessClass.sharded_slots))
+    if after is not None:
+        scheduled_at, class_id = after
+        query = query.filter(
+            FitnessClass.scheduled_at >= scheduled_at,
+            or_(FitnessClass.scheduled_at > scheduled_at, FitnessClass.id > class_id)
+        )
+    query = query.order_by(FitnessClass.scheduled_at.asc(), FitnessClass.id.asc())
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+def get_remaining_slots(db: Session, class_ids: Iterable[int]) -> Dict[int, int]:
+    """Open spots of classes by id, counting those held in shards"""
+    remaining = FitnessClass.available_slots
+    if SLOT_SHARDS:
+        remaining = remaining + FitnessClass.sharded_slots
+    rows = db.query(FitnessClass.id, remaining).filter(FitnessClass.id.in_(list(class_ids)))
+    return {class_id: remaining for class_id, remaining in rows}
+
+def get_schedule_fingerprint(db: Session, current_time: datetime) -> tuple:
+    """
+    Values that change whenever the upcoming schedule does
+
+    Timestamps alone can miss a change: a booking's updated_at is taken
+    before it waits for the write lock, and workers' clocks drift, so a
+    later commit can leave max(updated_at) where it was. The slot counts
+    themselves are therefore summed too, plain and weighted by class id,
+    so moving a spot from one class to another changes the weighted sum.
+    Classes that start drop out of the count, and with SLOT_SHARDS the
+    shard rows, which bookings from shards update instead, are summed the
+    same way. One aggregate row, so far cheaper than loading and
+    serializing the schedule.
+    """
+    columns = [
+        func.count(FitnessClass.id),
+        func.max(FitnessClass.updated_at),
+        func.min(FitnessClass.scheduled_at),
+        func.sum(FitnessClass.total_slots),
+        func.sum(FitnessClass.available_slots),
+        func.sum(FitnessClass.id * FitnessClass.available_slots),
+    ]
+    if SLOT_SHARDS:
+        columns += [
+            select(func.sum(ClassSlotShard.available_slots)).scalar_subquery(),
+            select(func.sum(ClassSlotShard.class_id * ClassSlotShard.available_slots)).scalar_subquery(),
+        ]
+    return tuple(db.execute(
+        select(*columns).where(FitnessClass.scheduled_at > current_time)
+    ).one())
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from typing import List, Tuple, Union
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models import Booking
+from ..schemas import BookingCreate
+from ..utils.admission import BOOKING_MAX_CONCURRENCY, BOOKING_MAX_QUEUE, BOOKING_QUEUE_TIMEOUT, ConcurrencyLimiter
+from ..utils.cache import bump_schedule_version
+from ..utils.negative_cache import negative_cache
+from .book_class import BookingError, DuplicateBookingError, _reserve, publish_availability
+
+logger = logging.getLogger(__name__)
+
+# Send POST /bookings/book through one writer that commits bookings in groups
+BOOKING_GROUP_COMMIT = os.getenv("BOOKING_GROUP_COMMIT", "false").lower() == "true"
+# How long the writer keeps collecting after the first booking of a group
+GROUP_COMMIT_WINDOW_MS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", "2"))
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "64"))
+
+BookingResult = Union[Tuple[Booking, datetime], BookingError]
+
+
+def apply_bookings(db: Session, requests: List[BookingCreate]) -> List[BookingResult]:
+    """
+    Make several bookings in one transaction, each inside its own savepoint
+
+    Every booking takes its slot exactly as create_booking does. A booking
+    that is rejected rolls back to its savepoint only, leaving the others
+    in the group intact, and the whole group is committed once. Returns
+    (booking, scheduled_at) or the BookingError per request, in order.
+    Any other error rolls the whole group back and is raised.
+    """
+    results: List[BookingResult] = []
+    try:
+        if db.get_bind().dialect.name == "sqlite":
+            # pysqlite defers BEGIN to the first write, and releasing a
+            # savepoint opened outside a transaction would commit it
+            db.execute(text("BEGIN IMMEDIATE"))
+        for booking_data in requests:
+            try:
+                with db.begin_nested():
+                    results.append(_reserve(db, booking_data, datetime.now(timezone.utc)))
+            except IntegrityError:
+                results.append(DuplicateBookingError("You already have a booking for this class"))
+            except BookingError as e:
+                results.append(e)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    bookings = [result[0] for result in results if not isinstance(result, BookingError)]
+    confirmed = {db_booking.class_id for db_booking in bookings if db_booking.status == "confirmed"}
+    for db_booking in bookings:
+        if db_booking.status == "confirmed":
+            negative_cache.note_booking(db_booking.class_id, db_booking.client_email)
+    if confirmed:
+        bump_schedule_version()
+        publish_availability(db, confirmed)
+    logger.info(f"Group committed {len(bookings)} of {len(requests)} bookings")
+    return results
+
+
+class GroupCommitWriter:
+    """
+    A single writer thread applying queued bookings in groups
+
+    The writer takes the first waiting booking, keeps collecting for
+    window_ms or until max_batch bookings, and applies the group with
+    apply_bookings, so a burst of bookings shares one transaction and one
+    commit instead of queuing for the database's write lock one by one.
+    Each caller gets its own booking or BookingError back.
+    """
+
+    def __init__(self, session_factory, window_ms: float = GROUP_COMMIT_WINDOW_MS, max_batch: int = GROUP_COMMIT_MAX_BATCH):
+        self.session_factory = session_factory
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.batches = 0
+        self.bookings = 0
+        self.largest_batch = 0
+        self.failed_batches = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, booking_data: BookingCreate) -> Future:
+        """Queue a booking; the future resolves to (booking, scheduled_at)"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+                self._thread.start()
+        future = Future()
+        self._queue.put((booking_data, future))
+        return future
+
+    async def book(self, booking_data: BookingCreate) -> Tuple[Booking, datetime]:
+        return await asyncio.wrap_future(self.submit(booking_data))
+
+    def close(self) -> None:
+        """Finish the queued bookings and stop the writer thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._apply(batch)
+
+    def _apply(self, batch) -> None:
+        # Bookings whose caller gave up while queued are dropped
+        batch = [(booking_data, future) for booking_data, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        db = self.session_factory()
+        try:
+            results = apply_bookings(db, [booking_data for booking_data, _ in batch])
+        except Exception as e:
+            logger.error(f"Group commit of {len(batch)} bookings failed: {str(e)}")
+            self.failed_batches += 1
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        finally:
+            db.close()
+
+        self.batches += 1
+        self.bookings += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, BookingError):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "bookings": self.bookings,
+            "largest_batch": self.largest_batch,
+            "failed_batches": self.failed_batches,
+        }
+
+
+booking_writer = GroupCommitWriter(SessionLocal)
+
+# Group-committed bookings share the writer's one transaction instead of
+# each holding the write lock, so they are admitted up to a whole group
+# at a time rather than BOOKING_MAX_CONCURRENCY, which would cap groups
+group_commit_slots = ConcurrencyLimiter(
+    max(BOOKING_MAX_CONCURRENCY, GROUP_COMMIT_MAX_BATCH), BOOKING_MAX_QUEUE, BOOKING_QUEUE_TIMEOUT
+)
@@ -0,0 +1,130 @@
+import argparse
+import logging
+import os
+import random
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import and_, select, update
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models import Booking, ClassSlotShard, FitnessClass
+from ..utils.cache import bump_schedule_version
+
+logger = logging.getLogger(__name__)
+
+# Shards per hot class; 0 leaves the booking path on the class row only
+SLOT_SHARDS = int(os.getenv("SLOT_SHARDS", "0"))
+
+
+def shard_class_slots(db: Session, class_id: int, shards: int) -> List[ClassSlotShard]:
+    """
+    Split a class's open spots evenly across shard rows
+
+    Spots already in shards are merged back first, so this can also be
+    used to change the shard count.
+    """
+    if shards < 1:
+        raise ValueError(f"A class needs at least one shard, got {shards}")
+    db_class = db.query(FitnessClass).filter(FitnessClass.id == class_id).with_for_update(of=FitnessClass).one()
+    open_slots = db_class.available_slots + sum(
+        shard.available_slots
+        for shard in db.query(ClassSlotShard).filter(ClassSlotShard.class_id == class_id)
+    )
+    db.query(ClassSlotShard).filter(ClassSlotShard.class_id == class_id).delete()
+
+    share, remainder = divmod(open_slots, shards)
+    rows = [
+        ClassSlotShard(class_id=class_id, shard=shard, available_slots=share + (shard < remainder))
+        for shard in range(shards)
+    ]
+    db.add_all(rows)
+    db_class.available_slots = 0
+    db.commit()
+    bump_schedule_version()
+
+    logger.info(f"Split {open_slots} open spots of class {class_id} across {shards} shards")
+    return rows
+
+def unshard_class_slots(db: Session, class_id: int) -> None:
+    """Move a class's open spots from its shards back onto the class row"""
+    db_class = db.query(FitnessClass).filter(FitnessClass.id == class_id).with_for_update(of=FitnessClass).one()
+    shards = db.query(ClassSlotShard).filter(ClassSlotShard.class_id == class_id)
+    db_class.available_slots += sum(shard.available_slots for shard in shards)
+    shards.delete()
+    db.commit()
+    bump_schedule_version()
+
+def reserve_from_shards(db: Session, class_id: int, email: str, now: datetime) -> bool:
+    """
+    Take one spot of an upcoming class from its shards
+
+    A random one of the class's shards with spots left is tried, so
+    concurrent bookings spread across its rows. A miss means another
+    booking emptied that shard first, so the pick is made again among the
+    shards still holding spots, until the spot is taken or none is left.
+    Classes the client already booked are never reserved. Only used when
+    SLOT_SHARDS is set.
+    """
+    upcoming = (
+        select(FitnessClass.id)
+        .where(FitnessClass.id == class_id, FitnessClass.scheduled_at > now)
+        .exists()
+    )
+    already_booked = (
+        select(Booking.id)
+        .where(
+            Booking.class_id == class_id,
+            Booking.client_email == email,
+            Booking.status == "confirmed"
+        )
+        .exists()
+    )
+    has_spots = (ClassSlotShard.class_id == class_id, ClassSlotShard.available_slots > 0)
+
+    while True:
+        shards = db.scalars(select(ClassSlotShard.shard).where(*has_spots)).all()
+        if not shards:
+            return False
+        result = db.execute(
+            update(ClassSlotShard)
+            .where(ClassSlotShard.shard == random.choice(shards), *has_spots, upcoming, ~already_booked)
+            .values(available_slots=ClassSlotShard.available_slots - 1)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            return True
+        # Not a lost race but a class that started or a client who booked
+        if not db.scalar(select(and_(upcoming, ~already_booked))):
+            return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Split hot classes' open spots across slot shards")
+    parser.add_argument("class_ids", type=int, nargs="+")
+    parser.add_argument("--shards", type=int, default=SLOT_SHARDS, help="Shards per class (default: SLOT_SHARDS)")
+    parser.add_argument("--merge", action="store_true", help="Move the spots back onto the class rows instead")
+    args = parser.parse_args()
+    if not args.merge:
+        # The server only books from shards with SLOT_SHARDS set; sharding
+        # without it would leave the class listed open but unbookable
+        if not SLOT_SHARDS:
+            parser.error("SLOT_SHARDS is not set, so the server would not book from the shards")
+        if args.shards < 1:
+            parser.error("--shards must be at least 1")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    db = SessionLocal()
+    try:
+        for class_id in args.class_ids:
+            if args.merge:
+                unshard_class_slots(db, class_id)
+            else:
+                shard_class_slots(db, class_id, args.shards)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
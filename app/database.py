@@ -1,27 +1,307 @@
+import itertools
+import logging
 import os
+import threading
+import time
+from typing import List, Optional
 from dotenv import load_dotenv
 
-from sqlalchemy import create_engine
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+from .utils.cache import LRUCache
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./fitness_studio.db")
 
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL not set in environment variables.")
 
+# Serve requests through AsyncSession instead of the threadpool
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() == "true"
+
+# Async drivers used when ASYNC_DATABASE_URL is not given explicitly
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def to_async_url(url: str) -> str:
+    """
+    Swap the driver of a database URL for its async counterpart
+    """
+    scheme, rest = url.split("://", 1)
+    dialect = scheme.split("+", 1)[0]
+    if dialect not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for database URL scheme: {scheme}")
+    return f"{ASYNC_DRIVERS[dialect]}://{rest}"
+
+
+# Read replicas for GET endpoints, comma-separated; empty reads from the primary
+REPLICA_DATABASE_URLS = [url.strip() for url in os.getenv("REPLICA_DATABASE_URLS", "").split(",") if url.strip()]
+# "round_robin" or "least_busy"
+REPLICA_SELECTION = os.getenv("REPLICA_SELECTION", "round_robin")
+# A client reads from the primary for this long after it books or cancels
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+# Also recognise such a client by address; behind a proxy every client
+# shares one, so only turn this on when the server trusts forwarded headers
+REPLICA_STICKY_BY_ADDRESS = os.getenv("REPLICA_STICKY_BY_ADDRESS", "false").lower() == "true"
+# A replica that failed is skipped for this long before being tried again
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+
+# Connection pool settings, used for server databases
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+# Pragmas applied to every new SQLite connection
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    # Negative values are in KiB, so this is a 64 MiB page cache
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", "268435456")),
+}
+
+
+def engine_options(url: str) -> dict:
+    """
+    Keyword arguments for create_engine / create_async_engine
+    """
+    if url.startswith("sqlite"):
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": POOL_PRE_PING,
+    }
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Tune a freshly opened SQLite connection
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma}={value}")
+    finally:
+        cursor.close()
+
+
+def configure_engine(sync_engine) -> None:
+    """
+    Attach per-connection tuning to an engine
+    """
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", apply_sqlite_pragmas)
+
+
+def log_database_settings() -> None:
+    """
+    Log the effective pool and SQLite settings at startup
+    """
+    logger.info(f"Database: {engine.url.render_as_string(hide_password=True)} (async={DB_ASYNC})")
+    for replica_engine in replica_engines:
+        logger.info(f"Read replica: {replica_engine.url.render_as_string(hide_password=True)} ({REPLICA_SELECTION})")
+    if engine.dialect.name != "sqlite":
+        logger.info(
+            f"Connection pool: size={POOL_SIZE}, max_overflow={MAX_OVERFLOW}, "
+            f"timeout={POOL_TIMEOUT}s, recycle={POOL_RECYCLE}s, pre_ping={POOL_PRE_PING}"
+        )
+        return
+
+    with engine.connect() as conn:
+        effective = {
+            pragma: conn.execute(text(f"PRAGMA {pragma}")).scalar()
+            for pragma in SQLITE_PRAGMAS
+        }
+    logger.info(
+        "SQLite pragmas: " + ", ".join(f"{k}={v}" for k, v in effective.items())
+    )
+
+
 # Create engine
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        DATABASE_URL,
-        connect_args={"check_same_thread": False}
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+configure_engine(engine)
+
+# Objects stay loaded after commit, so building a response from them does
+# not cost a refresh query per row
+SessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
+)
+
+# The async engine is only created when enabled, so its driver stays optional
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL)
     )
-else:
-    engine = create_engine(DATABASE_URL)
+    configure_engine(async_engine.sync_engine)
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False
+    )
+
+
+
+class Replica:
+    """One read replica: its session factory, load and health"""
+
+    def __init__(self, url: str, session_factory, sync_engine, engine=None):
+        self.url = url
+        self.session_factory = session_factory
+        self.sync_engine = sync_engine
+        # What the sessions run on: sync_engine, or the async engine around it
+        self.engine = engine if engine is not None else sync_engine
+        self.in_flight = 0
+        self.unhealthy_until = 0.0
+        # Whether a connection succeeded since startup or the last failure
+        self.verified = False
+
+    @property
+    def healthy(self) -> bool:
+        return self.unhealthy_until <= time.monotonic()
+
+    @property
+    def on_probation(self) -> bool:
+        """Not known to work, so its connection is checked before use"""
+        return not self.verified and self.healthy
+
+
+class ReplicaSet:
+    """
+    Picks the database a read-only request runs on
+
+    Healthy replicas are chosen round-robin or by fewest sessions in use.
+    Clients that wrote within REPLICA_STICKY_SECONDS, recognised by email
+    and, with REPLICA_STICKY_BY_ADDRESS, by address, read from the primary so they see their own booking
+    before replication catches up. A replica whose connection fails is
+    skipped for REPLICA_RETRY_SECONDS. A replica's connection is checked
+    before its first use and again after each failure, falling back to
+    the primary if it still fails; with no healthy replica, reads go to
+    the primary too.
+    """
+
+    def __init__(self, replicas: List[Replica], selection: str, sticky_seconds: float, retry_seconds: float):
+        if selection not in ("round_robin", "least_busy"):
+            raise ValueError(f"Unknown REPLICA_SELECTION: {selection}")
+        self.replicas = replicas
+        self.selection = selection
+        self.retry_seconds = retry_seconds
+        self.primary_reads = 0
+        self.replica_reads = 0
+        self.sticky_reads = 0
+        self._sticky = LRUCache(max_entries=100_000, ttl_seconds=sticky_seconds)
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+        for replica in replicas:
+            event.listen(replica.sync_engine, "handle_error", self._error_handler(replica))
+
+    def _error_handler(self, replica: Replica):
+        def handle_error(exception_context):
+            if exception_context.is_disconnect or isinstance(exception_context.sqlalchemy_exception, OperationalError):
+                self.mark_unhealthy(replica)
+        return handle_error
+
+    def stick(self, *client_keys: Optional[str]) -> None:
+        """Send this client's reads to the primary for a while"""
+        for key in client_keys:
+            if key:
+                self._sticky.set(key, True)
+
+    def acquire(self, *client_keys: Optional[str]) -> Optional[Replica]:
+        """The replica to read from, or None for the primary"""
+        if any(key and self._sticky.get(key) for key in client_keys):
+            with self._lock:
+                self.sticky_reads += 1
+                self.primary_reads += 1
+            return None
+        with self._lock:
+            healthy = [replica for replica in self.replicas if replica.healthy]
+            if not healthy:
+                self.primary_reads += 1
+                return None
+            if self.selection == "least_busy":
+                replica = min(healthy, key=lambda r: r.in_flight)
+            else:
+                replica = healthy[next(self._turn) % len(healthy)]
+            replica.in_flight += 1
+            self.replica_reads += 1
+            return replica
+
+    def release(self, replica: Replica) -> None:
+        with self._lock:
+            replica.in_flight -= 1
+
+    def fall_back(self, replica: Replica) -> None:
+        """Release a replica that failed its check; the read goes to the primary"""
+        self.mark_unhealthy(replica)
+        with self._lock:
+            replica.in_flight -= 1
+            self.replica_reads -= 1
+            self.primary_reads += 1
+
+    def mark_unhealthy(self, replica: Replica) -> None:
+        if replica.healthy:
+            logger.warning(
+                f"Read replica {replica.sync_engine.url.render_as_string(hide_password=True)} failed; "
+                f"reading from other databases for {self.retry_seconds:.0f}s"
+            )
+        replica.unhealthy_until = time.monotonic() + self.retry_seconds
+        replica.verified = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "replicas": len(self.replicas),
+                "healthy": sum(1 for replica in self.replicas if replica.healthy),
+                "in_flight": sum(replica.in_flight for replica in self.replicas),
+                "primary_reads": self.primary_reads,
+                "replica_reads": self.replica_reads,
+                "sticky_reads": self.sticky_reads,
+            }
+
+
+def make_replica(url: str) -> Replica:
+    """Engine and sessions for a replica, sync or async like the primary"""
+    if DB_ASYNC:
+        async_url = to_async_url(url)
+        replica_engine = create_async_engine(async_url, **engine_options(async_url))
+        sync_engine = replica_engine.sync_engine
+        session_factory = async_sessionmaker(replica_engine, autoflush=False, expire_on_commit=False)
+    else:
+        replica_engine = sync_engine = create_engine(url, **engine_options(url))
+        session_factory = sessionmaker(
+            autocommit=False, autoflush=False, expire_on_commit=False, bind=sync_engine
+        )
+    configure_engine(sync_engine)
+    return Replica(url, session_factory, sync_engine, replica_engine)
+
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+read_replicas = ReplicaSet(
+    [make_replica(url) for url in REPLICA_DATABASE_URLS],
+    REPLICA_SELECTION,
+    REPLICA_STICKY_SECONDS,
+    REPLICA_RETRY_SECONDS,
+)
+replica_engines = [replica.sync_engine for replica in read_replicas.replicas]
 
 Base = declarative_base()
 
@@ -35,3 +315,92 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """
+    Dependency to get an async database session
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Session dependency used by the routers, selected by DB_ASYNC
+get_session = get_async_db if DB_ASYNC else get_db
+
+
+def _client_address(request: Request) -> Optional[str]:
+    if not REPLICA_STICKY_BY_ADDRESS or request.client is None:
+        return None
+    return request.client.host
+
+
+def _client_keys(request: Request):
+    return request.query_params.get("email"), _client_address(request)
+
+
+async def get_read_db(request: Request):
+    """
+    Dependency to get a session for read-only requests, on a replica when one fits
+    """
+    primary = AsyncSessionLocal if DB_ASYNC else SessionLocal
+    replica = read_replicas.acquire(*_client_keys(request))
+    db = (replica.session_factory if replica else primary)()
+    if replica is not None and replica.on_probation:
+        try:
+            await run_db(db, Session.connection)
+            replica.verified = True
+        except OperationalError:
+            await close_db(db)
+            read_replicas.fall_back(replica)
+            replica = None
+            db = primary()
+    if replica is not None:
+        db.info["replica"] = True
+    try:
+        yield db
+    finally:
+        await close_db(db)
+        if replica is not None:
+            read_replicas.release(replica)
+
+
+def is_replica_session(db) -> bool:
+    """Whether a session from get_read_db reads from a replica, which may lag the primary"""
+    return bool(db.info.get("replica"))
+
+
+def mark_client_wrote(request: Request, email: str) -> None:
+    """Keep a client that just booked or cancelled reading from the primary"""
+    if read_replicas.replicas:
+        read_replicas.stick(email, _client_address(request))
+
+
+# Session dependency used by read-only routes; the primary unless replicas are set
+get_read_session = get_read_db if REPLICA_DATABASE_URLS else get_session
+
+
+async def close_db(db) -> None:
+    """
+    Give a session's connection back to the pool
+
+    For handlers that keep running long after their last query, such as
+    streams. The session can still be used afterwards.
+    """
+    if isinstance(db, AsyncSession):
+        await db.close()
+    else:
+        await run_in_threadpool(db.close)
+
+
+async def run_db(db, fn, *args, **kwargs):
+    """
+    Run a CRUD function without blocking the event loop
+
+    With an AsyncSession the function runs through run_sync, so its queries
+    go through the async driver. With a plain Session it runs in the
+    threadpool. Either way the CRUD code is written once, against Session.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
@@ -1,40 +1,231 @@
+import argparse
 from datetime import datetime
+import json
+import logging
 import os
+from typing import IO, Iterator, List
 from dotenv import load_dotenv
-import json
 
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session, undefer
+
+from .crud.book_class import fill_from_waitlist, publish_availability
+from .crud.slot_shards import SLOT_SHARDS
 from .database import SessionLocal
 from .models import FitnessClass
-from .utils.timezone_utils import convert_timezone_to_utc
+from .utils.cache import bump_schedule_version
+from .utils.negative_cache import negative_cache
+from .utils.timezone_utils import as_utc, convert_timezone_to_utc
 
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 CLASSES_FILE = os.environ.get('CLASSES_FILE')
+LOAD_BATCH_SIZE = int(os.environ.get('LOAD_BATCH_SIZE', '1000'))
+# Set to false to leave data import to the CLI instead of app startup
+LOAD_CLASSES_ON_STARTUP = os.environ.get('LOAD_CLASSES_ON_STARTUP', 'true').lower() == 'true'
+
+READ_CHUNK_SIZE = 64 * 1024
+# Characters that can continue a JSON number
+NUMBER_CHARS = "0123456789+-.eE"
+
+
+def iter_json_array(file: IO[str], chunk_size: int = READ_CHUNK_SIZE) -> Iterator:
+    """
+    Yield the items of a top-level JSON array without reading it all at once
+
+    Raises ValueError on anything json.load would reject, such as a
+    missing or trailing comma, or data after the closing bracket.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position = "", 0
+    eof = need_more = False
+    # What the grammar allows next: "[", the first item or "]", an item,
+    # "," or "]", and nothing but whitespace once the array is closed
+    expecting = "open"
+
+    while True:
+        # Skip whitespace between tokens
+        while position < len(buffer) and buffer[position] in " \t\r\n":
+            position += 1
+
+        if need_more or position == len(buffer):
+            if eof:
+                if expecting == "done":
+                    return
+                raise ValueError("Unexpected end of file in JSON array")
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            need_more = False
+            continue
+
+        char = buffer[position]
+        if expecting == "open":
+            if char != "[":
+                raise ValueError("Expected a JSON array")
+            expecting = "first"
+            position += 1
+            continue
+        if expecting == "done":
+            raise ValueError(f"Unexpected data after the JSON array: {char!r}")
+        if expecting == "separator":
+            if char == ",":
+                expecting = "item"
+            elif char == "]":
+                expecting = "done"
+            else:
+                raise ValueError(f"Expected ',' or ']' in JSON array, found {char!r}")
+            position += 1
+            continue
+        if char == "]":
+            if expecting == "item":
+                raise ValueError("Trailing comma in JSON array")
+            expecting = "done"
+            position += 1
+            continue
+
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            need_more = True
+            continue
+        # A value running to the end of the buffer may have been cut short,
+        # and a number may go on past what was read: "1e" | "5" or "-0." | "5"
+        if not eof and buffer[end:].strip(NUMBER_CHARS) == "":
+            need_more = True
+            continue
+
+        yield item
+        position = end
+        expecting = "separator"
+
+
+def _upsert_batch(db: Session, batch: List[dict]) -> dict:
+    """
+    Insert new classes and update changed ones, matched on name, start
+    time and instructor
+    """
+    query = db.query(FitnessClass).filter(
+        FitnessClass.scheduled_at.in_({row["scheduled_at"] for row in batch})
+    )
+    if SLOT_SHARDS:
+        query = query.options(undefer(FitnessClass.sharded_slots))
+    existing = {(c.name, as_utc(c.scheduled_at), c.instructor): c for c in query}
+
+    inserts, updates = [], []
+    for row in batch:
+        current = existing.get((row["name"], row["scheduled_at"], row["instructor"]))
+        if current is None:
+            inserts.append(row)
+        elif current.total_slots != row["total_slots"]:
+            # Keep the spots already booked when capacity changes; spots
+            # held in slot shards stay there
+            booked = current.total_slots - current.remaining_slots
+            held_in_shards = current.remaining_slots - current.available_slots
+            updates.append({
+                "id": current.id,
+                "total_slots": row["total_slots"],
+                "available_slots": max(row["total_slots"] - booked - held_in_shards, 0),
+            })
+
+    if inserts:
+        db.execute(insert(FitnessClass), inserts)
+    promoted = []
+    if updates:
+        db.execute(update(FitnessClass), updates)
+        # Spots added to a class go to its waitlist first
+        promoted = fill_from_waitlist(db, [row["id"] for row in updates if row["available_slots"] > 0])
+    return {"inserted": len(inserts), "updated": len(updates), "promoted": promoted}
+
+
+def load_fitness_classes(db: Session, path: str, batch_size: int = LOAD_BATCH_SIZE) -> dict:
+    """
+    Stream classes from a JSON file into the database in one transaction
+
+    Rows are written with executemany in batches of batch_size. Classes
+    already present are updated in place rather than duplicated, so the
+    same file can be re-loaded to re-sync the schedule. Spots added to a
+    class with a waitlist are handed to the clients waiting on it.
+    """
+    totals = {"inserted": 0, "updated": 0, "unchanged": 0, "promoted": 0}
+    batch = []
+    promoted = []
+
+    def flush():
+        counts = _upsert_batch(db, batch)
+        promoted.extend(counts["promoted"])
+        totals["inserted"] += counts["inserted"]
+        totals["updated"] += counts["updated"]
+        totals["promoted"] += len(counts["promoted"])
+        totals["unchanged"] += len(batch) - counts["inserted"] - counts["updated"]
+        batch.clear()
+
+    try:
+        with open(path) as file:
+            for cls in iter_json_array(file):
+                naive = datetime.fromisoformat(cls["scheduled_at"])
+                batch.append({
+                    "name": cls["name"],
+                    "scheduled_at": convert_timezone_to_utc(naive),
+                    "instructor": cls["instructor"],
+                    "total_slots": cls["slots"],
+                    "available_slots": cls["slots"],
+                })
+                if len(batch) >= batch_size:
+                    flush()
+        if batch:
+            flush()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    if totals["inserted"] or totals["updated"]:
+        bump_schedule_version()
+    for booking in promoted:
+        negative_cache.note_booking(booking.class_id, booking.client_email)
+    if promoted:
+        publish_availability(db, {booking.class_id for booking in promoted})
+    return totals
 
-with open(CLASSES_FILE) as file:
-    classes_data = json.load(file)
 
 def initial_data_load_fitness_classes():
-    db = SessionLocal() 
+    if not LOAD_CLASSES_ON_STARTUP:
+        logger.info("Skipping class data load on startup")
+        return
+    if not CLASSES_FILE:
+        logger.warning("CLASSES_FILE not set, skipping class data load")
+        return
+
+    db = SessionLocal()
     try:
-        if db.query(FitnessClass).first():
-            print("Data already inserted.")
-            return
-
-        for cls in classes_data:
-            naive  = datetime.fromisoformat(cls["scheduled_at"])
-            utc_dt = convert_timezone_to_utc(naive)
-
-            fitness_class = FitnessClass(
-                name=cls["name"],
-                scheduled_at=utc_dt,
-                instructor=cls["instructor"],
-                total_slots=cls["slots"],
-                available_slots=cls["slots"],
-            )
-            db.add(fitness_class)
-            db.commit()
-        print("Initial data inserted.")
+        totals = load_fitness_classes(db, CLASSES_FILE)
+        logger.info(f"Class data loaded from {CLASSES_FILE}: {totals}")
     finally:
         db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load or re-sync fitness classes from a JSON file")
+    parser.add_argument("--file", default=CLASSES_FILE, help="Path to the classes JSON file (default: CLASSES_FILE)")
+    parser.add_argument("--batch-size", type=int, default=LOAD_BATCH_SIZE, help="Rows per executemany batch")
+    args = parser.parse_args()
+    if not args.file:
+        parser.error("--file is required when CLASSES_FILE is not set")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    db = SessionLocal()
+    try:
+        totals = load_fitness_classes(db, args.file, args.batch_size)
+    finally:
+        db.close()
+    logger.info(f"Class data loaded from {args.file}: {totals}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,24 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request, status
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 
+from .crud.group_commit import BOOKING_GROUP_COMMIT, booking_writer, group_commit_slots
+from .database import async_engine, engine, log_database_settings, read_replicas, replica_engines
 from .routers import bookings, classes
-from .initial_data_loading import initial_data_load_fitness_classes
+from .utils.admission import admission_stats
+from .utils.availability import availability_broker
+from .utils.cache import classes_cache
+from .utils.compression import COMPRESSION_ENABLED, CompressionMiddleware, compressor
+from .utils.idempotency import idempotency_store
+from .utils.metrics import METRICS_ENABLED, MetricsMiddleware, instrument_engine, register_stats, registry
+from .utils.negative_cache import negative_cache
+from .utils.profiling import SQL_PROFILING, SQLProfilingMiddleware, profile_engine
+from .warmup import load_data, readiness, warm_up
 
 # Configure logging
 logging.basicConfig(
@@ -21,10 +32,16 @@ async def lifespan(app: FastAPI):
     """Lifespan context manager for startup and shutdown events"""
     # Startup
     logger.info("Starting up Fitness Studio Booking API")
-    initial_data_load_fitness_classes()
+    log_database_settings()
+    # The class data is loaded before any request is served
+    await load_data()
+    # Requests are served during the rest of warm-up; /ready reports when it is done
+    warmup_task = asyncio.create_task(warm_up())
     yield
     # Shutdown
     logger.info("Shutting down Fitness Studio Booking API")
+    warmup_task.cancel()
+    booking_writer.close()
 
 
 # Create FastAPI instance
@@ -44,6 +61,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    instrument_engine(engine)
+    if async_engine is not None:
+        instrument_engine(async_engine.sync_engine)
+    for replica_engine in replica_engines:
+        instrument_engine(replica_engine)
+    register_stats("classes_cache", "GET /classes response cache counters", classes_cache.stats)
+    register_stats("idempotency_keys", "Idempotency-Key store counters", idempotency_store.stats)
+    register_stats("read_replicas", "Read replica routing counters", read_replicas.stats)
+    register_stats("availability_stream", "Live availability subscribers and updates", availability_broker.stats)
+    register_stats("negative_cache", "Booking requests rejected from the negative cache", negative_cache.stats)
+    register_stats("compression", "Response bodies compressed and compressions reused from cache", compressor.stats)
+    register_stats("booking_admission", "Booking writer slots, queue and rate-limited clients", admission_stats)
+    if BOOKING_GROUP_COMMIT:
+        register_stats("group_commit", "Bookings committed in groups by the booking writer", booking_writer.stats)
+        register_stats("group_commit_admission", "Booking slots and queue in front of the group commit writer", group_commit_slots.stats)
+
+if SQL_PROFILING:
+    app.add_middleware(SQLProfilingMiddleware)
+    profile_engine(engine)
+    if async_engine is not None:
+        profile_engine(async_engine)
+    for replica in read_replicas.replicas:
+        profile_engine(replica.engine)
+
 # Include API routes
 app.include_router(bookings.router)
 app.include_router(classes.router)
@@ -91,3 +137,18 @@ async def root():
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "message": "API is running"}
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until the startup warm-up has finished, or for good if the data load failed"""
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if readiness.ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=readiness.state()
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Metrics in the Prometheus text format"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -1,7 +1,7 @@
 from datetime import datetime, timezone
 
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, LargeBinary, func, select, text
+from sqlalchemy.orm import column_property, relationship
 
 from .database import Base
 
@@ -11,10 +11,14 @@ class FitnessClass(Base):
     Model for fitness classes
     """
     __tablename__ = "classes"
+    __table_args__ = (
+        # Upcoming classes filter and sort on scheduled_at, paginating on id
+        Index("ix_classes_scheduled_at_id", "scheduled_at", "id"),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False, index=True)
-    scheduled_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    scheduled_at = Column(DateTime(timezone=True), nullable=False)
     instructor = Column(String(100), nullable=False)
     total_slots = Column(Integer, nullable=False)
     available_slots = Column(Integer, nullable=False)
@@ -24,6 +28,12 @@ class FitnessClass(Base):
     # Relationship with bookings
     bookings = relationship("Booking", back_populates="fitness_class")
 
+    @property
+    def remaining_slots(self) -> int:
+        """Open spots, counting those held in slot shards when they were loaded"""
+        # Reading __dict__ never triggers a lazy load of the deferred column
+        return self.available_slots + (self.__dict__.get("sharded_slots") or 0)
+
     def __repr__(self):
         return f"<FitnessClass(id={self.id}, name='{self.name}', datetime='{self.scheduled_at}')>"
 
@@ -33,11 +43,29 @@ class Booking(Base):
     Model for class bookings
     """
     __tablename__ = "bookings"
+    __table_args__ = (
+        # Booking history filters on client_email and sorts on booking_time
+        Index("ix_bookings_client_email_booking_time", "client_email", "booking_time", "id"),
+        # Duplicate check, and at most one confirmed booking per client and class
+        Index(
+            "uq_bookings_confirmed_class_email", "class_id", "client_email",
+            unique=True,
+            sqlite_where=text("status = 'confirmed'"),
+            postgresql_where=text("status = 'confirmed'")
+        ),
+        # At most one place on a class's waitlist per client
+        Index(
+            "uq_bookings_waitlisted_class_email", "class_id", "client_email",
+            unique=True,
+            sqlite_where=text("status = 'waitlisted'"),
+            postgresql_where=text("status = 'waitlisted'")
+        ),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     class_id = Column(Integer, ForeignKey("classes.id"), nullable=False, index=True)
     client_name = Column(String(100), nullable=False)
-    client_email = Column(String(255), nullable=False, index=True)
+    client_email = Column(String(255), nullable=False)
     booking_time = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     status = Column(String(20), default="confirmed", index=True)
 
@@ -45,4 +73,74 @@ class Booking(Base):
     fitness_class = relationship("FitnessClass", back_populates="bookings")
 
     def __repr__(self):
-        return f"<Booking(id={self.id}, class_id={self.class_id}, client_email='{self.client_email}')>"
\ No newline at end of file
+        return f"<Booking(id={self.id}, class_id={self.class_id}, client_email='{self.client_email}')>"
+
+
+class ClassSlotShard(Base):
+    """
+    Model for one share of a hot class's open spots
+
+    Splitting a class's spots across several rows lets concurrent bookings
+    decrement different rows instead of all waiting on the class row.
+    While a class is sharded its own available_slots holds only the spots
+    not moved into shards.
+    """
+    __tablename__ = "class_slot_shards"
+
+    class_id = Column(Integer, ForeignKey("classes.id"), primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    available_slots = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<ClassSlotShard(class_id={self.class_id}, shard={self.shard}, available_slots={self.available_slots})>"
+
+
+class WaitlistEntry(Base):
+    """
+    Model for a client waiting on a fully booked class
+
+    Entries are served in id order; the (class_id, id) index makes finding
+    the head of a class's waitlist a single index seek.
+    """
+    __tablename__ = "waitlist_entries"
+    __table_args__ = (
+        Index("ix_waitlist_entries_class_id_id", "class_id", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    class_id = Column(Integer, ForeignKey("classes.id"), nullable=False)
+    booking_id = Column(Integer, ForeignKey("bookings.id"), nullable=False, unique=True)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f"<WaitlistEntry(id={self.id}, class_id={self.class_id}, booking_id={self.booking_id})>"
+
+
+class IdempotencyRecord(Base):
+    """
+    Model for the stored response to a request sent with an Idempotency-Key
+
+    A row without a status_code is a claim by a request still in progress.
+    """
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=True)
+    body = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<IdempotencyRecord(key='{self.key}', status_code={self.status_code})>"
+
+
+# Spots held in shards; deferred, so only queries that undefer it, which
+# they do when SLOT_SHARDS is set, pay for the subquery
+FitnessClass.sharded_slots = column_property(
+    select(func.coalesce(func.sum(ClassSlotShard.available_slots), 0))
+    .where(ClassSlotShard.class_id == FitnessClass.id)
+    .correlate_except(ClassSlotShard)
+    .scalar_subquery(),
+    deferred=True
+)
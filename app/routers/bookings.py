@@ -1,27 +1,69 @@
-from datetime import datetime
 import logging
+from contextlib import asynccontextmanager
 from typing import Optional, List
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import get_read_session, get_session, mark_client_wrote, run_db
 from app.utils.timezone_utils import (
     get_default_timezone,
     is_valid_timezone,
-    convert_utc_to_timezone
+    convert_utc_to_timezone_batch
+)
+from app.utils.admission import AdmissionError, OverloadedError, booking_writers, route_limits
+from app.utils.etags import (
+    BOOKINGS_CACHE_CONTROL,
+    etag_matches,
+    make_etag,
+    not_modified,
+    set_cache_headers
+)
+from app.utils.idempotency import (
+    MAX_KEY_LENGTH,
+    IdempotencyKeyInProgressError,
+    IdempotencyKeyReusedError,
+    idempotency_store,
+    request_fingerprint
+)
+from app.utils.metrics import admission_rejections, booking_outcomes
+from app.utils.pagination import (
+    MAX_PAGE_SIZE,
+    decode_cursor,
+    encode_cursor,
+    set_next_page_headers
+)
+from app.utils.serializers import (
+    json_response,
+    serialize_batch_results,
+    serialize_booking,
+    serialize_bookings_with_class,
+    serialize_cancellation,
+    serialize_detail
 )
 from app.schemas import (
+    BatchBookingCreate,
+    BatchBookingResponse,
+    BookingCancellationResponse,
     BookingCreate, 
     BookingResponse, 
     BookingWithClassResponse
 )
 from app.crud.book_class import (
-    get_class,
-    check_existing_booking,
+    BookingError,
+    BookingNotFoundError,
+    ClassAlreadyOverError,
+    ClassNotFoundError,
+    DuplicateBookingError,
+    NoAvailableSlotsError,
+    cancel_booking,
     create_booking,
+    create_bookings_batch,
+    get_bookings_fingerprint,
     get_bookings_with_class_details_by_email
 )
+from app.crud.group_commit import BOOKING_GROUP_COMMIT, booking_writer, group_commit_slots
 
 
 logger = logging.getLogger(__name__)
@@ -32,80 +74,245 @@ router = APIRouter(
     tags=['bookings']
 )
 
+# booking_outcomes label for each create_booking rejection
+BOOKING_OUTCOMES = {
+    ClassAlreadyOverError: "class_over",
+    DuplicateBookingError: "duplicate",
+    NoAvailableSlotsError: "sold_out",
+}
+
+
+@asynccontextmanager
+async def _admitted(request: Request, route: str, email: str):
+    """
+    Run the block once the client is within its rate limits and a booking
+    writer slot is free, raising 429 or 503 with Retry-After otherwise
+
+    Group-committed bookings take group_commit_slots instead, so the
+    writer can collect a full GROUP_COMMIT_MAX_BATCH.
+    """
+    writers = group_commit_slots if route == "book" and BOOKING_GROUP_COMMIT else booking_writers
+    try:
+        route_limits[route].check(email, request.client.host if request.client else None)
+        await writers.acquire()
+    except AdmissionError as e:
+        admission_rejections.inc(route, e.reason)
+        raise HTTPException(
+            status_code=(
+                status.HTTP_503_SERVICE_UNAVAILABLE if isinstance(e, OverloadedError)
+                else status.HTTP_429_TOO_MANY_REQUESTS
+            ),
+            detail=str(e),
+            headers={"Retry-After": e.retry_after_header}
+        )
+    try:
+        yield
+    finally:
+        writers.release()
+
+
+async def _book(db: Session, booking: BookingCreate) -> Response:
+    """Create the booking and build its response, raising HTTPException on failure"""
+    try:
+        if BOOKING_GROUP_COMMIT:
+            db_booking, scheduled_at = await booking_writer.book(booking)
+        else:
+            db_booking, scheduled_at = await run_db(db, create_booking, booking)
+    except ClassNotFoundError as e:
+        booking_outcomes.inc("class_not_found")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except BookingError as e:
+        booking_outcomes.inc(BOOKING_OUTCOMES.get(type(e), "rejected"))
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    except Exception as e:
+        booking_outcomes.inc("error")
+        logger.error(f"Error creating booking: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to create booking"
+        )
+
+    booking_outcomes.inc("created" if db_booking.status == "confirmed" else db_booking.status)
+    logger.info(f"Created {db_booking.status} booking {db_booking.id} for {booking.client_email}")
+    return json_response(
+        serialize_booking(db_booking, scheduled_at),
+        status_code=(
+            status.HTTP_202_ACCEPTED if db_booking.status == "waitlisted"
+            else status.HTTP_201_CREATED
+        )
+    )
+
+
 @router.post(
     "/book",
     response_model=BookingResponse,
     status_code=status.HTTP_201_CREATED,
+    responses={status.HTTP_202_ACCEPTED: {"model": BookingResponse}},
 )
 async def create_booking_for_class(
+    request: Request,
     booking: BookingCreate,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session),
+    idempotency_key: Optional[str] = Header(
+        None,
+        min_length=1,
+        max_length=MAX_KEY_LENGTH,
+        description="Retries sent with the same key get the first response replayed"
+    )
 ):
     """
     Book a spot in a fitness class
+
+    When the class is full and join_waitlist is set, the client is put on
+    its waitlist instead and 202 is returned with the waitlisted booking.
+
+    With an Idempotency-Key header the first response, success or a
+    404/409 rejection, is stored and replayed to retries with the same key
+    and body without touching the booking tables or the rate limits.
     """
+    if idempotency_key is None:
+        async with _admitted(request, "book", booking.client_email):
+            response = await _book(db, booking)
+        mark_client_wrote(request, booking.client_email)
+        return response
+
+    # Replays are answered before admission: a client retrying after a
+    # lost response must not be rate limited or queued for it
+    fingerprint = request_fingerprint(booking.model_dump(mode="json"))
+    try:
+        stored = await run_in_threadpool(idempotency_store.begin, idempotency_key, fingerprint)
+    except IdempotencyKeyInProgressError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    except IdempotencyKeyReusedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+    if stored is not None:
+        status_code, body = stored
+        response = json_response(body, status_code=status_code)
+        response.headers["Idempotent-Replayed"] = "true"
+        return response
+
     try:
-        # Check if class exists
-        db_class = get_class(db, booking.class_id)
-        if not db_class:
+        async with _admitted(request, "book", booking.client_email):
+            response = await _book(db, booking)
+    except HTTPException as e:
+        # Server errors and admission rejections are not stored, so that
+        # a retry can succeed
+        if (
+            e.status_code >= status.HTTP_500_INTERNAL_SERVER_ERROR
+            or e.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        ):
+            await run_in_threadpool(idempotency_store.release, idempotency_key)
+        else:
+            await run_in_threadpool(
+                idempotency_store.complete, idempotency_key, fingerprint,
+                e.status_code, serialize_detail(e.detail)
+            )
+        raise
+    except BaseException:
+        await run_in_threadpool(idempotency_store.release, idempotency_key)
+        raise
+
+    await run_in_threadpool(
+        idempotency_store.complete, idempotency_key, fingerprint,
+        response.status_code, response.body
+    )
+    mark_client_wrote(request, booking.client_email)
+    return response
+
+
+@router.post(
+    "/{booking_id}/cancel",
+    response_model=BookingCancellationResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def cancel_booking_for_class(
+    request: Request,
+    booking_id: int,
+    email: str = Query(..., description="Client email address the booking was made with"),
+    db: Session = Depends(get_session)
+):
+    """
+    Cancel a booking
+
+    A cancelled confirmed booking passes its spot to the first client on
+    the class's waitlist, whose booking id is returned as promoted_booking_id.
+    """
+    async with _admitted(request, "cancel", email):
+        try:
+            db_booking, scheduled_at, promoted = await run_db(db, cancel_booking, booking_id, email)
+        except BookingNotFoundError as e:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Class with id {booking.class_id} not found"
+                detail=str(e)
             )
-        
-        current_time = datetime.now().replace(tzinfo=None)
-
-        if db_class.scheduled_at <= current_time:
+        except BookingError as e:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
-                detail="Class is already over"
-            )  
-        
-        # Check for existing booking
-        existing_booking = check_existing_booking(
-            db, booking.class_id, booking.client_email
-        )
-        if existing_booking:
+                detail=str(e)
+            )
+        except Exception as e:
+            logger.error(f"Error cancelling booking {booking_id}: {str(e)}")
             raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail="You already have a booking for this class"
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to cancel booking"
             )
-        
-        # Check available slots
-        if db_class.available_slots <= 0:
+
+        mark_client_wrote(request, email)
+        return json_response(serialize_cancellation(db_booking, scheduled_at, promoted))
+    
+
+@router.post(
+    "/batch",
+    response_model=BatchBookingResponse,
+    status_code=status.HTTP_201_CREATED,
+    responses={status.HTTP_409_CONFLICT: {"model": BatchBookingResponse}},
+)
+async def create_batch_booking(
+    request: Request,
+    batch: BatchBookingCreate,
+    db: Session = Depends(get_session)
+):
+    """
+    Book several classes for one client in a single transaction
+
+    Returns 201 when at least one class was booked and 409 when none was,
+    with a result per class either way.
+    """
+    async with _admitted(request, "batch", batch.client_email):
+        try:
+            results = await run_db(db, create_bookings_batch, batch)
+        except BookingError as e:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
-                detail="No available slots for this class"
+                detail=str(e)
             )
-        
-        # Create booking
-        db_booking = create_booking(db, booking)
-        if not db_booking:
+        except Exception as e:
+            logger.error(f"Error creating batch booking: {str(e)}")
             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Failed to create booking"
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to create bookings"
             )
-        
-        logger.info(f"Created booking {db_booking.id} for {booking.client_email}")
-        return BookingResponse(
-            id=db_booking.id,
-            class_id=db_booking.class_id,
-            client_name=db_booking.client_name,
-            client_email=db_booking.client_email,
-            scheduled_at=db_class.scheduled_at,
-            booking_time=db_booking.booking_time,
-            status=db_booking.status
-        )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error creating booking: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to create booking"
+
+        booked = any(result["status"] == "confirmed" for result in results)
+        if booked:
+            mark_client_wrote(request, batch.client_email)
+        return json_response(
+            serialize_batch_results(batch.mode, results),
+            status_code=status.HTTP_201_CREATED if booked else status.HTTP_409_CONFLICT
         )
-    
+
 
 @router.get(
     "",
@@ -113,12 +320,23 @@ async def create_booking_for_class(
     status_code=status.HTTP_200_OK
 )
 async def get_bookings(
+    request: Request,
     email: str = Query(..., description="Client email address"),
     time_zone: Optional[str] = Query(
         None, 
         description="Target timezone for datetime conversion"
     ),
-    db: Session = Depends(get_db)
+    limit: Optional[int] = Query(
+        None,
+        ge=1,
+        le=MAX_PAGE_SIZE,
+        description="Maximum number of bookings to return"
+    ),
+    cursor: Optional[str] = Query(
+        None,
+        description="X-Next-Cursor value from the previous page"
+    ),
+    db: Session = Depends(get_read_session)
 ):
     """
     Get all bookings for a specific email address
@@ -129,32 +347,58 @@ async def get_bookings(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Invalid timezone: {target_timezone}"
         )
+
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
     try:
-        bookings = get_bookings_with_class_details_by_email(db, email)
+        # Revalidation costs one aggregate row instead of the whole history
+        fingerprint = await run_db(db, get_bookings_fingerprint, email)
+        etag = make_etag(fingerprint, email, target_timezone, limit, cursor)
+        if fingerprint[0] and etag_matches(request, etag):
+            return not_modified(etag, BOOKINGS_CACHE_CONTROL)
+
+        # Fetch one extra row to learn whether there is a next page
+        bookings = await run_db(
+            db, get_bookings_with_class_details_by_email, email,
+            limit=limit + 1 if limit else None, after=after
+        )
         
         if not bookings:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"No bookings found for email: {email}"
             )
+
+        next_cursor = None
+        if limit and len(bookings) > limit:
+            bookings = bookings[:limit]
+            next_cursor = encode_cursor(bookings[-1]["booking_time"], bookings[-1]["id"])
         
-        response_bookings = []
-        for booking in bookings:
-            response_bookings.append(BookingWithClassResponse(
-                id=booking["id"],
-                class_id=booking["class_id"],
-                class_name=booking["class_name"],
-                scheduled_at=convert_utc_to_timezone(booking["scheduled_at"], target_timezone),
-                instructor=booking["instructor"],
-                client_name=booking["client_name"],
-                client_email=booking["client_email"],
-                booking_time=convert_utc_to_timezone(booking["booking_time"], target_timezone),
-                status=booking["status"]
-            ))
-        
-        logger.info(f"Retrieved {len(response_bookings)} bookings for {email}")
-        return response_bookings
+        scheduled_times = convert_utc_to_timezone_batch(
+            [booking["scheduled_at"] for booking in bookings], target_timezone
+        )
+        booking_times = convert_utc_to_timezone_batch(
+            [booking["booking_time"] for booking in bookings], target_timezone
+        )
+
+        logger.info(f"Retrieved {len(bookings)} bookings for {email}")
+        return set_cache_headers(
+            set_next_page_headers(
+                json_response(
+                    serialize_bookings_with_class(bookings, scheduled_times, booking_times)
+                ),
+                request,
+                next_cursor
+            ),
+            etag,
+            BOOKINGS_CACHE_CONTROL
+        )
         
     except HTTPException:
         raise
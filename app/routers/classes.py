@@ -1,14 +1,32 @@
+import asyncio
+import logging
 from datetime import datetime, timezone
 from typing import List, Optional
 
 from sqlalchemy.orm import Session
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
 
-from app.database import get_db
-from app.crud.fitness_class import get_upcoming_classes
+from app.database import close_db, get_read_session, get_session, is_replica_session, run_db
+from app.crud.fitness_class import get_remaining_slots, get_schedule_fingerprint, get_upcoming_classes
 from app.schemas import FitnessClassResponse
-from app.utils.timezone_utils import convert_utc_to_timezone, get_default_timezone, is_valid_timezone
+from app.utils.availability import (
+    AVAILABILITY_HEARTBEAT,
+    AVAILABILITY_SEND_TIMEOUT,
+    MAX_CLASSES_PER_SUBSCRIPTION,
+    TooManySubscribersError,
+    availability_broker
+)
+from app.utils.cache import classes_cache, get_schedule_version
+from app.utils.etags import CLASSES_CACHE_CONTROL, etag_matches, make_etag, not_modified, set_cache_headers
+from app.utils.pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor, set_next_page_headers
+from app.utils.compression import CompressibleBody, compressed_response
+from app.utils.negotiation import negotiate_format
+from app.utils.serializers import FITNESS_CLASS_FORMATS, serialize_availability
+from app.utils.timezone_utils import as_utc, convert_utc_to_timezone_batch, get_default_timezone, is_valid_timezone
+
 
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/classes",
@@ -19,11 +37,21 @@ router = APIRouter(
             response_model=List[FitnessClassResponse], 
             status_code=status.HTTP_200_OK
             )
-async def get_classes(db: Session = Depends(get_db),
+async def get_classes(request: Request,
+                      db: Session = Depends(get_read_session),
                       time_zone: Optional[str] = Query(None, description="Target timezone for datetime conversion"
      ),
+                      limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of classes to return"),
+                      cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+                      requested_format: Optional[str] = Query(None, alias="format", description="json, columnar or msgpack; overrides the Accept header"),
     ):
-    """Get all upcoming fitness classes"""
+    """
+    Get all upcoming fitness classes
+
+    The format is negotiated from the `format` parameter or the Accept
+    header: JSON objects (the default), one JSON array per field
+    (application/vnd.fitness.columnar+json) or MessagePack.
+    """
     current_time = datetime.now(timezone.utc)
     target_timezone = time_zone or get_default_timezone()
     if not is_valid_timezone(target_timezone):
@@ -32,18 +60,236 @@ async def get_classes(db: Session = Depends(get_db),
             detail=f"Invalid timezone: {target_timezone}"
         )
     
-    results = get_upcoming_classes(db, current_time)
-    
-    class_details = []
-    for fitness_class in results:
-        class_details.append(FitnessClassResponse(
-            id=fitness_class.id,
-            name=fitness_class.name,
-            scheduled_at=convert_utc_to_timezone(fitness_class.scheduled_at, target_timezone),
-            instructor=fitness_class.instructor,
-            total_slots=fitness_class.total_slots,
-            available_slots=fitness_class.available_slots
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    media_types = {name: media_types for name, (media_types, _) in FITNESS_CLASS_FORMATS.items()}
+    try:
+        response_format = negotiate_format(media_types, requested_format, request.headers.get("accept"))
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    cache_key = (target_timezone, get_schedule_version(), limit, cursor, response_format)
+    cached = classes_cache.get(cache_key)
+    if cached is not None:
+        class_details, next_cursor, etag = cached
+        if etag_matches(request, etag):
+            return _vary_on_accept(not_modified(etag, CLASSES_CACHE_CONTROL))
+        return await _classes_response(request, class_details, response_format, next_cursor, etag)
+
+    # Revalidation costs one aggregate row instead of the whole schedule
+    fingerprint = await run_db(db, get_schedule_fingerprint, current_time)
+    etag = make_etag(fingerprint, target_timezone, limit, cursor, response_format)
+    if etag_matches(request, etag):
+        return _vary_on_accept(not_modified(etag, CLASSES_CACHE_CONTROL))
+
+    class_details, next_cursor = await _load_classes_page(
+        db, cache_key, etag, current_time, target_timezone, limit, after, response_format
+    )
+    return await _classes_response(request, class_details, response_format, next_cursor, etag)
+
+
+def _vary_on_accept(response):
+    # Shared caches must not hand a MessagePack body to a JSON client
+    response.headers.add_vary_header("Accept")
+    return response
+
+
+async def _classes_response(
+    request: Request, class_details: CompressibleBody, response_format: str, next_cursor, etag: str
+):
+    media_type = FITNESS_CLASS_FORMATS[response_format][0][0]
+    return _vary_on_accept(set_cache_headers(
+        set_next_page_headers(await compressed_response(request, class_details, media_type), request, next_cursor),
+        etag, CLASSES_CACHE_CONTROL
     ))
+
+
+async def _load_classes_page(
+    db, cache_key, etag: str, current_time: datetime, target_timezone: str, limit, after,
+    response_format: str = "json"
+):
+    """Query and serialize a page of the schedule, caching it under cache_key"""
+    # Fetch one extra row to learn whether there is a next page
+    results = await run_db(
+        db, get_upcoming_classes, current_time,
+        limit=limit + 1 if limit else None, after=after
+    )
+    next_cursor = None
+    if limit and len(results) > limit:
+        results = results[:limit]
+        next_cursor = encode_cursor(results[-1].scheduled_at, results[-1].id)
     
-    return class_details
+    scheduled_times = convert_utc_to_timezone_batch(
+        [fitness_class.scheduled_at for fitness_class in results], target_timezone
+    )
+    # Every format is built from the same rows and converted times
+    serialize = FITNESS_CLASS_FORMATS[response_format][1]
+    # Cached along with each compressed form, once a client asks for it
+    class_details = CompressibleBody(serialize(results, scheduled_times))
+
+    # Expire no later than the first class starts, so it drops off the list
+    ttl = None
+    if results:
+        ttl = (as_utc(results[0].scheduled_at) - current_time).total_seconds()
+    # A lagging replica's rows would be cached under the primary's schedule
+    # version and served to everyone, including clients pinned to the
+    # primary after booking; only primary reads fill the cache
+    if not is_replica_session(db):
+        classes_cache.set(cache_key, (class_details, next_cursor, etag), ttl)
+    return class_details, next_cursor
+
+
+async def preload_classes(db, target_timezone: str) -> None:
+    """Put the full upcoming schedule in one timezone into the GET /classes cache, as JSON"""
+    current_time = datetime.now(timezone.utc)
+    fingerprint = await run_db(db, get_schedule_fingerprint, current_time)
+    etag = make_etag(fingerprint, target_timezone, None, None, "json")
+    cache_key = (target_timezone, get_schedule_version(), None, None, "json")
+    await _load_classes_page(db, cache_key, etag, current_time, target_timezone, None, None)
+
+
+def _check_class_ids(class_ids: List[int]) -> List[int]:
+    """Reject subscriptions that are malformed or too large to serve cheaply"""
+    class_ids = list(dict.fromkeys(class_ids))
+    if any(class_id < 1 for class_id in class_ids):
+        raise ValueError("Class ids must be positive")
+    if len(class_ids) > MAX_CLASSES_PER_SUBSCRIPTION:
+        raise ValueError(f"At most {MAX_CLASSES_PER_SUBSCRIPTION} classes can be watched per connection")
+    return class_ids
+
+
+@router.get("/availability/stream", status_code=status.HTTP_200_OK)
+async def stream_availability(
+    class_ids: List[int] = Query(..., description="Classes to watch; repeat the parameter for several"),
+    db: Session = Depends(get_read_session)
+):
+    """
+    Server-Sent Events stream of open spots for the given classes
+
+    The current counts are sent first, then an update whenever a booking
+    or cancellation changes them. Updates arriving close together are
+    coalesced into one event carrying the latest count per class.
+    """
+    try:
+        class_ids = _check_class_ids(class_ids)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    sequence = availability_broker.next_sequence()
+    snapshot = await run_db(db, get_remaining_slots, class_ids)
+    # The stream can stay open for hours; do not hold a pooled connection
+    await close_db(db)
+    try:
+        subscription = availability_broker.subscribe(class_ids)
+    except TooManySubscribersError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
+    # Counts read before the snapshot may still be on their way
+    subscription.skip_older(class_ids, sequence)
+
+    async def events():
+        try:
+            yield b"event: availability\ndata: " + serialize_availability(snapshot) + b"\n\n"
+            while True:
+                batch = await subscription.next_batch(AVAILABILITY_HEARTBEAT)
+                if batch:
+                    yield b"event: availability\ndata: " + serialize_availability(batch) + b"\n\n"
+                else:
+                    yield b": keepalive\n\n"
+        finally:
+            availability_broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/availability/ws")
+async def availability_socket(
+    websocket: WebSocket,
+    class_ids: List[int] = Query([], description="Classes to watch from the start"),
+    db: Session = Depends(get_session)
+):
+    """
+    WebSocket stream of open spots, with changeable subscriptions
+
+    Send {"subscribe": [ids]} or {"unsubscribe": [ids]} to change the
+    watched classes; each message received is a JSON list of
+    {"class_id", "available_slots"}. A client that cannot keep up within
+    AVAILABILITY_SEND_TIMEOUT is disconnected.
+    """
+    await websocket.accept()
+    try:
+        class_ids = _check_class_ids(class_ids)
+        subscription = availability_broker.subscribe([])
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    except TooManySubscribersError as e:
+        await websocket.close(code=1013, reason=str(e))
+        return
+
+    async def watch(add: List[int], remove: List[int]) -> None:
+        if remove:
+            availability_broker.update(subscription, remove=remove)
+        add = [class_id for class_id in add if class_id not in subscription.class_ids]
+        if not add:
+            return
+        _check_class_ids(list(subscription.class_ids) + add)
+        availability_broker.update(subscription, add=add)
+        sequence = availability_broker.next_sequence()
+        snapshot = await run_db(db, get_remaining_slots, add)
+        await close_db(db)
+        for class_id, available_slots in snapshot.items():
+            subscription.offer(class_id, available_slots, sequence)
+
+    async def receive_subscriptions() -> None:
+        try:
+            while True:
+                message = await websocket.receive_json()
+                await watch(
+                    [int(class_id) for class_id in message.get("subscribe", [])],
+                    [int(class_id) for class_id in message.get("unsubscribe", [])]
+                )
+        finally:
+            # Wake the sender so it notices the connection is gone
+            subscription.ready.set()
 
+    receiver = None
+    try:
+        await watch(class_ids, [])
+        receiver = asyncio.create_task(receive_subscriptions())
+        while not receiver.done():
+            batch = await subscription.next_batch(AVAILABILITY_HEARTBEAT)
+            if batch:
+                await asyncio.wait_for(
+                    websocket.send_text(serialize_availability(batch).decode()),
+                    AVAILABILITY_SEND_TIMEOUT
+                )
+        if not isinstance(receiver.exception(), WebSocketDisconnect):
+            await websocket.close(code=1003, reason="Invalid subscription message")
+    except WebSocketDisconnect:
+        pass
+    except asyncio.TimeoutError:
+        logger.info("Dropping availability subscriber that stopped reading")
+        await websocket.close(code=1013, reason="Too slow")
+    finally:
+        if receiver is not None:
+            receiver.cancel()
+        availability_broker.unsubscribe(subscription)
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import List, Literal, Optional
 
 from pydantic import BaseModel, EmailStr, Field, field_serializer, field_validator
 
@@ -37,7 +38,7 @@ class BookingBase(BaseModel):
 
 class BookingCreate(BookingBase):
     """Schema for creating a new booking"""
-    pass
+    join_waitlist: bool = False
 
 
 class BookingResponse(BookingBase, ORMConfig):
@@ -55,4 +56,53 @@ class BookingResponse(BookingBase, ORMConfig):
 class BookingWithClassResponse(BookingResponse, ORMConfig):
     """Schema for booking response with class details"""
     class_name: str
-    instructor: str
\ No newline at end of file
+    instructor: str
+
+
+# Upper bound on the number of classes in one batch booking
+MAX_BATCH_SIZE = 50
+
+
+class BatchBookingCreate(BaseModel):
+    """Schema for booking several classes for one client"""
+    class_ids: List[int] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+    client_name: str = Field(..., min_length=4, max_length=50)
+    client_email: EmailStr
+    mode: Literal["all_or_nothing", "best_effort"] = "all_or_nothing"
+
+    @field_validator('class_ids')
+    def validate_class_ids(cls, v):
+        """Validate class ids are positive and not repeated"""
+        if any(class_id < 1 for class_id in v):
+            raise ValueError('Class ids must be positive')
+        if len(set(v)) != len(v):
+            raise ValueError('Class ids must not be repeated')
+        return v
+
+    @field_validator('client_name')
+    def validate_client_name(cls, v):
+        """Validate client name format"""
+        if not v.strip():
+            raise ValueError('Client name cannot be empty')
+        return v.strip()
+
+
+class BatchBookingItemResult(BaseModel):
+    """Outcome of one class in a batch booking"""
+    class_id: int
+    status: Literal["confirmed", "rejected"]
+    detail: Optional[str] = None
+    booking: Optional[BookingResponse] = None
+
+
+class BatchBookingResponse(BaseModel):
+    """Schema for batch booking response"""
+    mode: str
+    booked: int
+    results: List[BatchBookingItemResult]
+
+
+class BookingCancellationResponse(BaseModel):
+    """Schema for booking cancellation response"""
+    booking: BookingResponse
+    promoted_booking_id: Optional[int] = None
@@ -6,9 +6,14 @@ from sqlalchemy import create_engine, text
 from sqlalchemy.pool import StaticPool
 from sqlalchemy.orm import sessionmaker
 
-from ..models import Booking, FitnessClass
+from ..models import Booking, FitnessClass, WaitlistEntry
 from ..main import app
 from ..database import Base, get_db
+from ..utils.admission import route_limits
+from ..utils.cache import classes_cache
+from ..utils.idempotency import idempotency_store
+from ..utils.negative_cache import negative_cache
+from ..utils.metrics import instrument_engine
 from app import main
 
 # Use an in-memory SQLite database for testing
@@ -18,6 +23,7 @@ engine = create_engine(
     connect_args={'check_same_thread': False},
     poolclass=StaticPool
 )
+instrument_engine(engine)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base.metadata.create_all(bind=engine)
 
@@ -31,6 +37,16 @@ def override_get_db():
 
 app.dependency_overrides[get_db] = override_get_db
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Keep cached responses from leaking between tests"""
+    classes_cache.clear()
+    idempotency_store.clear()
+    negative_cache.clear()
+    for limits in route_limits.values():
+        limits.clear()
+    yield
+
 @pytest.fixture
 def client():
     """Test client fixture"""
@@ -63,6 +79,28 @@ def test_class(test_db):
     yield fitness_class
 
     # Cleanup
+    test_db.query(WaitlistEntry).filter(WaitlistEntry.class_id == fitness_class.id).delete()
+    test_db.query(Booking).filter(Booking.class_id == fitness_class.id).delete()
+    test_db.delete(fitness_class)
+    test_db.commit()
+
+
+# Fixture for a second class with a single spot
+@pytest.fixture
+def second_class(test_db):
+    fitness_class = FitnessClass(
+        name="Spin",
+        scheduled_at=datetime.now(timezone.utc) + timedelta(days=2),
+        instructor="Test Instructor",
+        total_slots=1,
+        available_slots=1
+    )
+    test_db.add(fitness_class)
+    test_db.commit()
+
+    yield fitness_class
+
+    test_db.query(WaitlistEntry).filter(WaitlistEntry.class_id == fitness_class.id).delete()
     test_db.query(Booking).filter(Booking.class_id == fitness_class.id).delete()
     test_db.delete(fitness_class)
     test_db.commit()
@@ -75,11 +113,11 @@ def mock_db_bookings():
             "id": 1,
             "class_id": 10,
             "class_name": "Yoga",
-            "scheduled_at": "2025-06-10T10:00:00+00:00",
+            "scheduled_at": datetime(2025, 6, 10, 10, 0, tzinfo=timezone.utc),
             "instructor": "test instructor",
             "client_name": "test user",
             "client_email": "testuser@example.com",
-            "booking_time": "2025-06-01T12:00:00+00:00",
+            "booking_time": datetime(2025, 6, 1, 12, 0, tzinfo=timezone.utc),
             "status": "confirmed"
         }
     ]
@@ -0,0 +1,142 @@
+import asyncio
+
+from fastapi import status
+import pytest
+
+from ..utils.admission import (
+    ConcurrencyLimiter,
+    OverloadedError,
+    TokenBucketLimiter,
+    parse_limit,
+    route_limits
+)
+from ..utils.metrics import admission_rejections
+
+
+def test_parse_limit():
+    assert parse_limit("10/60") == (10, 60.0)
+    assert parse_limit("") is None
+    assert parse_limit("0/60") is None
+    with pytest.raises(ValueError):
+        parse_limit("ten per minute")
+
+
+def test_token_bucket_allows_burst_then_limits():
+    limiter = TokenBucketLimiter(requests=3, seconds=60)
+    assert [limiter.acquire("a") for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire("a") == pytest.approx(20, rel=0.01)
+    # Buckets are per key
+    assert limiter.acquire("b") == 0
+
+
+def test_token_bucket_forgets_least_recent_keys():
+    limiter = TokenBucketLimiter(requests=1, seconds=60, max_keys=2)
+    for key in ("a", "b", "c"):
+        limiter.acquire(key)
+    assert len(limiter) == 2
+
+
+def test_booking_rate_limited_per_email(test_class, client, monkeypatch):
+    monkeypatch.setattr(route_limits["book"], "email", TokenBucketLimiter(requests=2, seconds=60))
+    before = admission_rejections.value("book", "email")
+    booking_data = {
+        "class_id": test_class.id,
+        "client_name": "Eager Client",
+        "client_email": "eager@example.com"
+    }
+
+    statuses = [client.post("/bookings/book", json=booking_data).status_code for _ in range(3)]
+    assert statuses == [status.HTTP_201_CREATED, status.HTTP_409_CONFLICT, status.HTTP_429_TOO_MANY_REQUESTS]
+
+    response = client.post("/bookings/book", json={**booking_data, "client_email": "EAGER@example.com"})
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert response.json() == {"detail": "Too many requests for this email"}
+    assert response.headers["Retry-After"] == "30"
+    assert admission_rejections.value("book", "email") == before + 2
+
+    other = client.post("/bookings/book", json={**booking_data, "client_email": "patient@example.com"})
+    assert other.status_code == status.HTTP_201_CREATED
+
+
+def test_idempotent_replay_skips_rate_limit(test_class, client, monkeypatch):
+    monkeypatch.setattr(route_limits["book"], "email", TokenBucketLimiter(requests=1, seconds=60))
+    booking_data = {
+        "class_id": test_class.id,
+        "client_name": "Retrying Client",
+        "client_email": "retry@example.com"
+    }
+
+    first = client.post("/bookings/book", json=booking_data, headers={"Idempotency-Key": "first"})
+    assert first.status_code == status.HTTP_201_CREATED
+    replay = client.post("/bookings/book", json=booking_data, headers={"Idempotency-Key": "first"})
+    assert replay.status_code == status.HTTP_201_CREATED
+    assert replay.headers["Idempotent-Replayed"] == "true"
+
+    # A rejection at admission is not stored against the key
+    limited = client.post("/bookings/book", json=booking_data, headers={"Idempotency-Key": "second"})
+    assert limited.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    monkeypatch.setattr(route_limits["book"], "email", None)
+    retried = client.post("/bookings/book", json=booking_data, headers={"Idempotency-Key": "second"})
+    assert retried.status_code == status.HTTP_409_CONFLICT
+    assert "Idempotent-Replayed" not in retried.headers
+
+
+def test_booking_rate_limited_per_address(test_class, client, monkeypatch):
+    monkeypatch.setattr(route_limits["cancel"], "ip", TokenBucketLimiter(requests=1, seconds=10))
+    client.post("/bookings/999999/cancel?email=a@example.com")
+
+    response = client.post("/bookings/999999/cancel?email=b@example.com")
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert response.json() == {"detail": "Too many requests from this address"}
+    assert response.headers["Retry-After"] == "10"
+
+
+def test_concurrency_limiter_queues_then_sheds():
+    async def scenario():
+        limiter = ConcurrencyLimiter(max_concurrency=1, max_queue=1, queue_timeout=5)
+        await limiter.acquire()
+        queued = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.stats()["queued"] == 1
+
+        with pytest.raises(OverloadedError) as shed:
+            await limiter.acquire()
+        assert shed.value.reason == "queue_full"
+
+        limiter.release()
+        await queued
+        assert limiter.stats()["in_flight"] == 1
+        limiter.release()
+        assert limiter.stats() == {
+            "in_flight": 0, "queued": 0, "max_concurrency": 1, "max_queue": 1,
+            "admitted": 2, "queue_full": 1, "timed_out": 0,
+        }
+
+    asyncio.run(scenario())
+
+
+def test_concurrency_limiter_times_out_queued_requests():
+    async def scenario():
+        limiter = ConcurrencyLimiter(max_concurrency=1, max_queue=1, queue_timeout=0.01)
+        await limiter.acquire()
+        with pytest.raises(OverloadedError) as shed:
+            await limiter.acquire()
+        assert shed.value.reason == "queue_timeout"
+        limiter.release()
+        assert limiter.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_overloaded_booking_returns_503(test_class, client, monkeypatch):
+    limiter = ConcurrencyLimiter(max_concurrency=1, max_queue=0, queue_timeout=1)
+    limiter.in_flight = 1
+    monkeypatch.setattr("app.routers.bookings.booking_writers", limiter)
+
+    response = client.post("/bookings/book", json={
+        "class_id": test_class.id,
+        "client_name": "Test User",
+        "client_email": "busy@example.com"
+    })
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,64 @@
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from ..crud.book_class import NoAvailableSlotsError, create_booking
+from ..crud.fitness_class import get_upcoming_classes
+from ..database import Base, run_db, to_async_url
+from ..models import FitnessClass
+from ..schemas import BookingCreate
+
+ASYNC_TEST_DATABASE_PATH = "./test_async.db"
+
+
+def test_to_async_url():
+    assert to_async_url("sqlite:///./fitness_studio.db") == "sqlite+aiosqlite:///./fitness_studio.db"
+    assert to_async_url("postgresql+psycopg2://u:p@db/app") == "postgresql+asyncpg://u:p@db/app"
+    with pytest.raises(ValueError):
+        to_async_url("oracle://u:p@db/app")
+
+
+def test_crud_runs_on_async_session():
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{ASYNC_TEST_DATABASE_PATH}")
+        session_factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        try:
+            async with session_factory() as db:
+                fitness_class = FitnessClass(
+                    name="Pilates",
+                    scheduled_at=datetime.now(timezone.utc) + timedelta(days=1),
+                    instructor="Test Instructor",
+                    total_slots=1,
+                    available_slots=1
+                )
+                db.add(fitness_class)
+                await db.commit()
+
+                booking = BookingCreate(
+                    class_id=fitness_class.id,
+                    client_name="Async User",
+                    client_email="async@example.com"
+                )
+                db_booking, _ = await run_db(db, create_booking, booking)
+                assert db_booking.id is not None
+
+                with pytest.raises(NoAvailableSlotsError):
+                    await run_db(db, create_booking, booking.model_copy(
+                        update={"client_email": "other@example.com"}
+                    ))
+
+                upcoming = await run_db(db, get_upcoming_classes, datetime.now(timezone.utc))
+                assert [c.available_slots for c in upcoming] == [0]
+        finally:
+            await engine.dispose()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        os.remove(ASYNC_TEST_DATABASE_PATH)
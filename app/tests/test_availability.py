@@ -0,0 +1,111 @@
+import asyncio
+import threading
+
+from fastapi import status
+
+from ..crud import book_class
+from ..crud.group_commit import apply_bookings
+from ..models import Booking
+from ..routers.classes import stream_availability
+from ..schemas import BookingCreate
+from ..utils import availability
+from ..utils.availability import AvailabilityBroker, availability_broker
+
+
+def test_broker_coalesces_updates_from_other_threads(monkeypatch):
+    monkeypatch.setattr(availability, "AVAILABILITY_COALESCE_MS", 0)
+    broker = AvailabilityBroker()
+
+    async def scenario():
+        watching = broker.subscribe([1, 2])
+        other = broker.subscribe([3])
+        publisher = threading.Thread(target=lambda: [broker.publish(1, slots) for slots in (5, 4, 3)])
+        publisher.start()
+        publisher.join()
+        broker.publish(2, 7)
+        broker.publish(4, 1)
+        batch = await watching.next_batch(1)
+        idle = await other.next_batch(0.01)
+        broker.unsubscribe(watching)
+        broker.unsubscribe(other)
+        return batch, idle
+
+    batch, idle = asyncio.run(scenario())
+    assert batch == {1: 3, 2: 7}
+    assert idle == {}
+    assert broker.stats() == {"subscribers": 0, "watched_classes": 0, "published": 4}
+
+def test_broker_drops_counts_read_before_a_delivered_one(monkeypatch):
+    monkeypatch.setattr(availability, "AVAILABILITY_COALESCE_MS", 0)
+    broker = AvailabilityBroker()
+
+    async def scenario():
+        watching = broker.subscribe([1])
+        older, newer = broker.next_sequence(), broker.next_sequence()
+        # The newer read finishes first; the older one must not win
+        broker.publish(1, 3, newer)
+        broker.publish(1, 4, older)
+        batch = await watching.next_batch(1)
+        broker.publish(1, 5, older)
+        late = await watching.next_batch(0.01)
+        broker.unsubscribe(watching)
+        return batch, late
+
+    batch, late = asyncio.run(scenario())
+    assert batch == {1: 3}
+    assert late == {}
+
+def test_availability_stream_sends_snapshot_then_updates(test_class, test_db):
+    async def scenario():
+        response = await stream_availability(class_ids=[test_class.id], db=test_db)
+        events = response.body_iterator
+        snapshot = await events.__anext__()
+        availability_broker.publish(test_class.id, 3)
+        update = await events.__anext__()
+        await events.aclose()
+        return snapshot, update
+
+    snapshot, update = asyncio.run(scenario())
+    assert snapshot == b'event: availability\ndata: [{"class_id":%d,"available_slots":10}]\n\n' % test_class.id
+    assert update == b'event: availability\ndata: [{"class_id":%d,"available_slots":3}]\n\n' % test_class.id
+    assert availability_broker.stats()["subscribers"] == 0
+
+def test_availability_stream_rejects_bad_class_ids(client):
+    response = client.get("/classes/availability/stream?class_ids=0")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json() == {"detail": "Class ids must be positive"}
+
+def test_availability_websocket_pushes_bookings(test_class, second_class, client):
+    with client.websocket_connect(f"/classes/availability/ws?class_ids={test_class.id}") as websocket:
+        assert websocket.receive_json() == [{"class_id": test_class.id, "available_slots": 10}]
+
+        websocket.send_json({"subscribe": [second_class.id]})
+        assert websocket.receive_json() == [{"class_id": second_class.id, "available_slots": 1}]
+
+        client.post("/bookings/book", json={
+            "class_id": test_class.id,
+            "client_name": "Test User",
+            "client_email": "live@example.com"
+        })
+        assert websocket.receive_json() == [{"class_id": test_class.id, "available_slots": 9}]
+
+def test_failed_publish_does_not_fail_committed_booking(test_class, second_class, test_db, client, monkeypatch):
+    def broken(db, class_ids):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(availability_broker, "is_watched", lambda class_id: True)
+    monkeypatch.setattr(book_class, "get_remaining_slots", broken)
+
+    response = client.post("/bookings/book", json={
+        "class_id": test_class.id,
+        "client_name": "Watched Client",
+        "client_email": "watched@example.com"
+    })
+    assert response.status_code == status.HTTP_201_CREATED
+    assert test_db.query(Booking).filter(Booking.client_email == "watched@example.com").count() == 1
+
+    # A group commit keeps every booking of the group
+    results = apply_bookings(test_db, [
+        BookingCreate(class_id=second_class.id, client_name="Group Client", client_email="group@example.com")
+    ])
+    assert results[0][0].status == "confirmed"
@@ -0,0 +1,102 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from fastapi import status
+from fastapi.testclient import TestClient
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from ..database import Base, configure_engine, get_db
+from ..main import app
+from ..models import Booking, FitnessClass
+
+# A file database with a real connection pool, so every request gets its
+# own connection and SQLite's writer lock is genuinely contended
+STRESS_DATABASE_PATH = "./test_concurrency.db"
+CONCURRENT_REQUESTS = 300
+WORKERS = 32
+SLOTS = 50
+
+
+@pytest.fixture
+def stress_session_factory(monkeypatch):
+    # Every simulated client shares the test client's address
+    monkeypatch.setattr("app.utils.admission.RATE_LIMIT_ENABLED", False)
+    engine = create_engine(
+        f"sqlite:///{STRESS_DATABASE_PATH}",
+        connect_args={"check_same_thread": False, "timeout": 30},
+        pool_size=WORKERS,
+    )
+    configure_engine(engine)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    previous_override = app.dependency_overrides.get(get_db)
+    app.dependency_overrides[get_db] = override_get_db
+
+    yield session_factory
+
+    app.dependency_overrides[get_db] = previous_override
+    engine.dispose()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(STRESS_DATABASE_PATH + suffix):
+            os.remove(STRESS_DATABASE_PATH + suffix)
+
+
+def test_concurrent_bookings_never_oversell(stress_session_factory):
+    db = stress_session_factory()
+    fitness_class = FitnessClass(
+        name="Flash Sale Spin",
+        scheduled_at=datetime.now(timezone.utc) + timedelta(days=1),
+        instructor="Test Instructor",
+        total_slots=SLOTS,
+        available_slots=SLOTS
+    )
+    db.add(fitness_class)
+    db.commit()
+    class_id = fitness_class.id
+    db.close()
+
+    client = TestClient(app)
+
+    def book(i):
+        return client.post("/bookings/book", json={
+            "class_id": class_id,
+            "client_name": f"Client {i}",
+            "client_email": f"client{i}@example.com"
+        })
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        responses = list(executor.map(book, range(CONCURRENT_REQUESTS)))
+    elapsed = time.perf_counter() - started
+
+    created = [r for r in responses if r.status_code == status.HTTP_201_CREATED]
+    rejected = [r for r in responses if r.status_code == status.HTTP_409_CONFLICT]
+    print(
+        f"\n{CONCURRENT_REQUESTS} concurrent booking requests in {elapsed:.2f}s: "
+        f"{CONCURRENT_REQUESTS / elapsed:.0f} requests/sec, "
+        f"{len(created) / elapsed:.0f} bookings/sec"
+    )
+
+    assert len(created) == SLOTS
+    assert len(rejected) == CONCURRENT_REQUESTS - SLOTS
+    assert all(r.json() == {"detail": "No available slots for this class"} for r in rejected)
+
+    db = stress_session_factory()
+    try:
+        db_class = db.query(FitnessClass).filter(FitnessClass.id == class_id).first()
+        assert db_class.available_slots == 0
+        assert db.query(Booking).filter(Booking.class_id == class_id).count() == SLOTS
+    finally:
+        db.close()
@@ -3,7 +3,7 @@ from unittest.mock import patch
 
 from fastapi import status
 
-from ..models import FitnessClass
+from ..models import Booking, FitnessClass, WaitlistEntry
 
 
 def test_create_booking_success(test_class, client):
@@ -70,7 +70,7 @@ def test_create_booking_no_slots(test_class, test_db, client):
 def test_get_bookings_success(mock_db_bookings, client):
     with patch("app.routers.bookings.get_bookings_with_class_details_by_email", return_value=mock_db_bookings), \
          patch("app.routers.bookings.is_valid_timezone", return_value=True), \
-         patch("app.routers.bookings.convert_utc_to_timezone", side_effect=lambda dt, tz: dt):
+         patch("app.routers.bookings.convert_utc_to_timezone_batch", side_effect=lambda dts, tz: list(dts)):
 
         response = client.get("/bookings?email=testuser@example.com&time_zone=Asia/Kolkata")
 
@@ -95,3 +95,237 @@ def test_get_bookings_invalid_timezone(client):
     response = client.get("/bookings?email=test@example.com&time_zone=Invalid/Zone")
     assert response.status_code == status.HTTP_400_BAD_REQUEST
     assert "Invalid timezone" in response.json()["detail"]
+
+def test_get_bookings_keyset_pagination(test_class, test_db, client):
+    email = "pages@example.com"
+    booking_time = datetime.now(timezone.utc)
+    # Two bookings share a booking time, so the id tie-breaker is exercised
+    test_db.add_all([
+        Booking(
+            class_id=test_class.id,
+            client_name="Page User",
+            client_email=email,
+            booking_time=booking_time - timedelta(minutes=i // 2),
+            # Only one booking per client and class can be confirmed
+            status="confirmed" if i == 0 else "cancelled"
+        )
+        for i in range(5)
+    ])
+    test_db.commit()
+
+    everything = client.get("/bookings", params={"email": email}).json()
+    assert len(everything) == 5
+
+    paged, cursor = [], None
+    while True:
+        params = {"email": email, "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/bookings", params=params)
+        assert response.status_code == status.HTTP_200_OK
+        paged.extend(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert [b["id"] for b in paged] == [b["id"] for b in everything]
+
+def _available_slots(test_db, class_id):
+    test_db.expire_all()
+    return test_db.query(FitnessClass).filter(FitnessClass.id == class_id).first().available_slots
+
+def test_batch_booking_success(test_class, second_class, test_db, client):
+    response = client.post("/bookings/batch", json={
+        "class_ids": [test_class.id, second_class.id],
+        "client_name": "Test User",
+        "client_email": "batch@example.com"
+    })
+    assert response.status_code == status.HTTP_201_CREATED
+    data = response.json()
+    assert data["booked"] == 2
+    assert [r["class_id"] for r in data["results"]] == [test_class.id, second_class.id]
+    assert all(r["status"] == "confirmed" for r in data["results"])
+    assert data["results"][0]["booking"]["client_email"] == "batch@example.com"
+    assert _available_slots(test_db, test_class.id) == 9
+    assert _available_slots(test_db, second_class.id) == 0
+
+def test_batch_booking_all_or_nothing_rolls_back(test_class, second_class, test_db, client):
+    client.post("/bookings/book", json={
+        "class_id": second_class.id,
+        "client_name": "Other User",
+        "client_email": "other@example.com"
+    })
+
+    response = client.post("/bookings/batch", json={
+        "class_ids": [test_class.id, second_class.id],
+        "client_name": "Test User",
+        "client_email": "batch@example.com"
+    })
+    assert response.status_code == status.HTTP_409_CONFLICT
+    results = response.json()["results"]
+    assert results[0] == {"class_id": test_class.id, "status": "rejected", "detail": "Batch rolled back", "booking": None}
+    assert results[1]["detail"] == "No available slots for this class"
+    assert _available_slots(test_db, test_class.id) == 10
+
+def test_batch_booking_best_effort(test_class, client):
+    client.post("/bookings/book", json={
+        "class_id": test_class.id,
+        "client_name": "Test User",
+        "client_email": "batch@example.com"
+    })
+
+    response = client.post("/bookings/batch", json={
+        "class_ids": [999, test_class.id],
+        "client_name": "Test User",
+        "client_email": "batch@example.com",
+        "mode": "best_effort"
+    })
+    assert response.status_code == status.HTTP_409_CONFLICT
+    details = [r["detail"] for r in response.json()["results"]]
+    assert details == ["Class with id 999 not found", "You already have a booking for this class"]
+
+def test_batch_booking_best_effort_partial(test_class, client):
+    response = client.post("/bookings/batch", json={
+        "class_ids": [test_class.id, 999],
+        "client_name": "Test User",
+        "client_email": "batch@example.com",
+        "mode": "best_effort"
+    })
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["booked"] == 1
+    assert [r["status"] for r in response.json()["results"]] == ["confirmed", "rejected"]
+
+def test_batch_booking_repeated_class(test_class, client):
+    response = client.post("/bookings/batch", json={
+        "class_ids": [test_class.id, test_class.id],
+        "client_name": "Test User",
+        "client_email": "batch@example.com"
+    })
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+def _book(client, class_id, email, join_waitlist=False):
+    return client.post("/bookings/book", json={
+        "class_id": class_id,
+        "client_name": "Test User",
+        "client_email": email,
+        "join_waitlist": join_waitlist
+    })
+
+def test_create_booking_joins_waitlist(second_class, client):
+    _book(client, second_class.id, "first@example.com")
+
+    response = _book(client, second_class.id, "second@example.com", join_waitlist=True)
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert response.json()["status"] == "waitlisted"
+
+    response = _book(client, second_class.id, "second@example.com", join_waitlist=True)
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert response.json() == {'detail': 'You are already on the waitlist for this class'}
+
+def test_cancel_booking_promotes_waitlist_in_order(second_class, test_db, client):
+    confirmed = _book(client, second_class.id, "first@example.com").json()
+    waiting = [
+        _book(client, second_class.id, f"wait{i}@example.com", join_waitlist=True).json()
+        for i in range(3)
+    ]
+
+    response = client.post(f"/bookings/{confirmed['id']}/cancel?email=first@example.com")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["booking"]["status"] == "cancelled"
+    assert response.json()["promoted_booking_id"] == waiting[0]["id"]
+
+    test_db.expire_all()
+    promoted = test_db.query(Booking).filter(Booking.id == waiting[0]["id"]).one()
+    assert promoted.status == "confirmed"
+    assert test_db.query(WaitlistEntry).filter(WaitlistEntry.class_id == second_class.id).count() == 2
+    assert _available_slots(test_db, second_class.id) == 0
+
+def test_cancel_booking_releases_spot_without_waitlist(test_class, test_db, client):
+    booking = _book(client, test_class.id, "test@example.com").json()
+
+    response = client.post(f"/bookings/{booking['id']}/cancel?email=test@example.com")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["promoted_booking_id"] is None
+    assert _available_slots(test_db, test_class.id) == 10
+
+    response = client.post(f"/bookings/{booking['id']}/cancel?email=test@example.com")
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert response.json() == {'detail': 'Booking is already cancelled'}
+
+def test_cancel_waitlisted_booking_leaves_spots(second_class, test_db, client):
+    _book(client, second_class.id, "first@example.com")
+    waiting = _book(client, second_class.id, "second@example.com", join_waitlist=True).json()
+
+    response = client.post(f"/bookings/{waiting['id']}/cancel?email=second@example.com")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["promoted_booking_id"] is None
+    assert test_db.query(WaitlistEntry).filter(WaitlistEntry.class_id == second_class.id).count() == 0
+    assert _available_slots(test_db, second_class.id) == 0
+
+def test_cancel_booking_wrong_email(test_class, client):
+    booking = _book(client, test_class.id, "test@example.com").json()
+
+    response = client.post(f"/bookings/{booking['id']}/cancel?email=other@example.com")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.json() == {'detail': f"Booking with id {booking['id']} not found"}
+
+def test_create_booking_idempotency_key_replays(test_class, test_db, client):
+    booking_data = {
+        "class_id": test_class.id,
+        "client_name": "Test User",
+        "client_email": "retry@example.com"
+    }
+    headers = {"Idempotency-Key": "retry-1"}
+    first = client.post("/bookings/book", json=booking_data, headers=headers)
+    retry = client.post("/bookings/book", json=booking_data, headers=headers)
+
+    assert first.status_code == retry.status_code == status.HTTP_201_CREATED
+    assert retry.content == first.content
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert _available_slots(test_db, test_class.id) == 9
+
+def test_create_booking_idempotency_key_replays_rejection(client):
+    booking_data = {
+        "class_id": 999,
+        "client_name": "Test User",
+        "client_email": "retry@example.com"
+    }
+    headers = {"Idempotency-Key": "retry-2"}
+    client.post("/bookings/book", json=booking_data, headers=headers)
+    retry = client.post("/bookings/book", json=booking_data, headers=headers)
+
+    assert retry.status_code == status.HTTP_404_NOT_FOUND
+    assert retry.json() == {'detail': 'Class with id 999 not found'}
+    assert retry.headers["Idempotent-Replayed"] == "true"
+
+def test_create_booking_idempotency_key_reused(test_class, client):
+    headers = {"Idempotency-Key": "retry-3"}
+    client.post("/bookings/book", headers=headers, json={
+        "class_id": test_class.id,
+        "client_name": "Test User",
+        "client_email": "retry@example.com"
+    })
+    response = client.post("/bookings/book", headers=headers, json={
+        "class_id": test_class.id,
+        "client_name": "Test User",
+        "client_email": "other@example.com"
+    })
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert response.json() == {'detail': 'Idempotency-Key was already used with a different request'}
+
+def test_get_bookings_etag_revalidation(second_class, client):
+    _book(client, second_class.id, "first@example.com")
+    waiting = _book(client, second_class.id, "etag@example.com", join_waitlist=True).json()
+
+    first = client.get("/bookings?email=etag@example.com")
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    cached = client.get("/bookings?email=etag@example.com", headers={"If-None-Match": etag})
+    assert cached.status_code == status.HTTP_304_NOT_MODIFIED
+
+    client.post(f"/bookings/{waiting['id']}/cancel?email=etag@example.com")
+    changed = client.get("/bookings?email=etag@example.com", headers={"If-None-Match": etag})
+    assert changed.status_code == status.HTTP_200_OK
+    assert changed.json()[0]["status"] == "cancelled"
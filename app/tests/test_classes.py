@@ -1,4 +1,11 @@
+from datetime import datetime, timedelta, timezone
+
+import msgpack
 from fastapi import status
+from sqlalchemy import update
+
+from ..models import FitnessClass
+from ..utils.cache import LRUCache, classes_cache
 
 
 def test_get_classes_success(client):
@@ -15,3 +22,163 @@ def test_get_classes_invalid_timezone(client):
     response = client.get("/classes?time_zone=Invalid/Timezone")
     assert response.status_code == status.HTTP_400_BAD_REQUEST
     assert "Invalid timezone" in response.json()["detail"]
+
+def test_get_classes_served_from_cache(test_class, client):
+    first = client.get("/classes")
+    hits_before = classes_cache.stats()["hits"]
+    second = client.get("/classes")
+    assert classes_cache.stats()["hits"] == hits_before + 1
+    assert second.json() == first.json()
+
+def test_get_classes_cache_invalidated_by_booking(test_class, client):
+    before = client.get("/classes").json()
+    assert next(c for c in before if c["id"] == test_class.id)["available_slots"] == 10
+
+    client.post("/bookings/book", json={
+        "class_id": test_class.id,
+        "client_name": "Test User",
+        "client_email": "cache@example.com"
+    })
+
+    after = client.get("/classes").json()
+    assert next(c for c in after if c["id"] == test_class.id)["available_slots"] == 9
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+def test_lru_cache_expires_entries():
+    cache = LRUCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1, ttl_seconds=0)
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
+
+def test_get_classes_keyset_pagination(test_db, client):
+    scheduled_at = datetime.now(timezone.utc) + timedelta(days=2)
+    # Two classes share a start time, so the id tie-breaker is exercised
+    new_classes = [
+        FitnessClass(
+            name=f"Page {i}",
+            scheduled_at=scheduled_at + timedelta(hours=i // 2),
+            instructor="Test Instructor",
+            total_slots=10,
+            available_slots=10
+        )
+        for i in range(5)
+    ]
+    test_db.add_all(new_classes)
+    test_db.commit()
+
+    try:
+        everything = client.get("/classes").json()
+
+        paged, cursor = [], None
+        while True:
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            response = client.get("/classes", params=params)
+            assert response.status_code == status.HTTP_200_OK
+            assert len(response.json()) <= 2
+            paged.extend(response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+            assert 'rel="next"' in response.headers["Link"]
+
+        assert [c["id"] for c in paged] == [c["id"] for c in everything]
+    finally:
+        for fitness_class in new_classes:
+            test_db.delete(fitness_class)
+        test_db.commit()
+
+def test_get_classes_invalid_cursor(client):
+    response = client.get("/classes?cursor=not-a-cursor")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "Invalid cursor" in response.json()["detail"]
+
+def test_get_classes_etag_revalidation(test_class, test_db, client):
+    first = client.get("/classes")
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "public, no-cache"
+
+    cached = client.get("/classes", headers={"If-None-Match": etag})
+    assert cached.status_code == status.HTTP_304_NOT_MODIFIED
+    assert cached.content == b""
+    assert cached.headers["ETag"] == etag
+
+    # Without a cached response the ETag comes from the fingerprint query
+    classes_cache.clear()
+    revalidated = client.get("/classes", headers={"If-None-Match": f'W/{etag}, "other"'})
+    assert revalidated.status_code == status.HTTP_304_NOT_MODIFIED
+
+    db_class = test_db.query(FitnessClass).filter(FitnessClass.id == test_class.id).first()
+    db_class.available_slots = 5
+    db_class.updated_at = datetime.now(timezone.utc) + timedelta(seconds=1)
+    test_db.commit()
+    classes_cache.clear()
+    changed = client.get("/classes", headers={"If-None-Match": etag})
+    assert changed.status_code == status.HTTP_200_OK
+    assert changed.headers["ETag"] != etag
+
+def test_get_classes_etag_depends_on_timezone(test_class, client):
+    utc = client.get("/classes?time_zone=UTC").headers["ETag"]
+    kolkata = client.get("/classes?time_zone=Asia/Kolkata").headers["ETag"]
+    assert utc != kolkata
+
+def test_get_classes_formats(test_class, client):
+    rows = client.get("/classes").json()
+
+    columnar = client.get("/classes", headers={"Accept": "application/vnd.fitness.columnar+json"})
+    assert columnar.headers["Content-Type"] == "application/vnd.fitness.columnar+json"
+    assert columnar.headers["Vary"] == "Accept"
+    columns = columnar.json()
+    assert [dict(zip(columns, values)) for values in zip(*columns.values())] == rows
+
+    packed = client.get("/classes?format=msgpack")
+    assert packed.headers["Content-Type"] == "application/msgpack"
+    assert msgpack.unpackb(packed.content) == rows
+    assert len({columnar.headers["ETag"], packed.headers["ETag"]}) == 2
+
+    # The cached body of one format is never served for another
+    again = client.get("/classes", headers={"Accept": "application/msgpack;q=0.5, application/json"})
+    assert again.headers["Content-Type"] == "application/json"
+    assert again.json() == rows
+
+def test_get_classes_format_negotiation_fallback(client):
+    unknown = client.get("/classes?format=xml")
+    assert unknown.status_code == status.HTTP_400_BAD_REQUEST
+    assert "Invalid format" in unknown.json()["detail"]
+
+    # Nothing available is accepted: JSON, as before formats were negotiated
+    for accept in ("text/csv", "text/plain", "application/xml;q=0.9, image/*"):
+        fallback = client.get("/classes", headers={"Accept": accept})
+        assert fallback.status_code == status.HTTP_200_OK
+        assert fallback.headers["Content-Type"] == "application/json"
+
+def test_get_classes_etag_changes_with_slots_alone(test_class, second_class, test_db, client):
+    db_class = test_db.query(FitnessClass).filter(FitnessClass.id == test_class.id).first()
+    db_class.available_slots = 9
+    test_db.commit()
+    etag = client.get("/classes").headers["ETag"]
+
+    # A cancellation on one class and a booking on another, with no
+    # timestamp moving forward, as when a booking's updated_at is older
+    # than the latest one
+    for class_id, delta in ((test_class.id, 1), (second_class.id, -1)):
+        test_db.execute(
+            update(FitnessClass)
+            .where(FitnessClass.id == class_id)
+            .values(available_slots=FitnessClass.available_slots + delta, updated_at=FitnessClass.updated_at)
+        )
+    test_db.commit()
+    classes_cache.clear()
+
+    response = client.get("/classes", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+
+from fastapi import status
+import pytest
+
+from ..utils import compression
+from ..utils.compression import Compressor, compressor
+
+
+@pytest.fixture
+def compress_everything(monkeypatch):
+    """Compress even the tiny responses of the test database"""
+    monkeypatch.setattr(compressor, "min_size", 1)
+
+
+def test_choose_encoding_follows_accept_encoding(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    gzip_only = Compressor(enabled=True, min_size=100)
+    assert gzip_only.choose_encoding("gzip, deflate", 100) == "gzip"
+    assert gzip_only.choose_encoding("br", 100) is None
+    assert gzip_only.choose_encoding("*", 100) == "gzip"
+    assert gzip_only.choose_encoding("gzip;q=0, *", 100) is None
+    assert gzip_only.choose_encoding("gzip", 99) is None
+    assert gzip_only.choose_encoding(None, 100) is None
+    assert Compressor(enabled=False, min_size=100).choose_encoding("gzip", 100) is None
+
+
+def test_choose_encoding_prefers_brotli_when_installed():
+    pytest.importorskip("brotli")
+    brotli_too = Compressor(enabled=True, min_size=0)
+    assert brotli_too.choose_encoding("gzip, deflate, br", 10) == "br"
+    assert brotli_too.choose_encoding("gzip, br;q=0.5", 10) == "gzip"
+
+
+def test_large_bodies_compressed_off_the_event_loop(monkeypatch):
+    threads = []
+    offloading = Compressor(enabled=True, min_size=0, threadpool_min_size=100)
+    compress = offloading.compress
+
+    def recording_compress(content, encoding):
+        threads.append(threading.get_ident())
+        return compress(content, encoding)
+
+    monkeypatch.setattr(offloading, "compress", recording_compress)
+
+    async def compress_both():
+        loop_thread = threading.get_ident()
+        await offloading.compress_async(b"x" * 99, "gzip")
+        await offloading.compress_async(b"x" * 100, "gzip")
+        return loop_thread
+
+    loop_thread = asyncio.run(compress_both())
+    assert threads[0] == loop_thread
+    assert threads[1] != loop_thread
+
+
+def test_cached_classes_compressed_once(test_class, client, compress_everything):
+    headers = {"Accept-Encoding": "gzip"}
+    first = client.get("/classes", headers=headers)
+    assert first.headers["Content-Encoding"] == "gzip"
+    assert first.headers["Vary"] == "Accept-Encoding, Accept"
+    assert first.headers["ETag"].startswith('W/"')
+    assert any(c["id"] == test_class.id for c in first.json())
+
+    compressed = compressor.stats()["gzip_compressed"]
+    reused = compressor.stats()["reused"]
+    second = client.get("/classes", headers=headers)
+    assert second.json() == first.json()
+    assert compressor.stats()["gzip_compressed"] == compressed
+    assert compressor.stats()["reused"] == reused + 1
+
+    revalidated = client.get("/classes", headers={**headers, "If-None-Match": first.headers["ETag"]})
+    assert revalidated.status_code == status.HTTP_304_NOT_MODIFIED
+
+    identity = client.get("/classes", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in identity.headers
+    assert identity.json() == first.json()
+
+
+def test_middleware_compresses_bookings(test_class, client, compress_everything):
+    client.post("/bookings/book", json={
+        "class_id": test_class.id,
+        "client_name": "Test User",
+        "client_email": "gzip@example.com"
+    })
+
+    response = client.get("/bookings?email=gzip@example.com", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.num_bytes_downloaded == int(response.headers["Content-Length"])
+    assert response.json()[0]["client_email"] == "gzip@example.com"
+
+
+def test_small_responses_not_compressed(client):
+    response = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert "Vary" not in response.headers
@@ -0,0 +1,32 @@
+import os
+
+from sqlalchemy import create_engine, text
+
+from ..database import SQLITE_PRAGMAS, configure_engine, engine_options
+
+TUNED_DATABASE_PATH = "./test_tuning.db"
+
+
+def test_engine_options_for_server_database():
+    options = engine_options("postgresql://u:p@db/app")
+    assert options["pool_pre_ping"] is True
+    assert {"pool_size", "max_overflow", "pool_timeout", "pool_recycle"} <= options.keys()
+    assert "pool_size" not in engine_options("sqlite:///./fitness_studio.db")
+
+
+def test_sqlite_pragmas_applied_on_connect():
+    engine = create_engine(
+        f"sqlite:///{TUNED_DATABASE_PATH}",
+        **engine_options(f"sqlite:///{TUNED_DATABASE_PATH}")
+    )
+    configure_engine(engine)
+    try:
+        with engine.connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == SQLITE_PRAGMAS["journal_mode"].lower()
+            assert conn.execute(text("PRAGMA busy_timeout")).scalar() == SQLITE_PRAGMAS["busy_timeout"]
+            assert conn.execute(text("PRAGMA cache_size")).scalar() == SQLITE_PRAGMAS["cache_size"]
+    finally:
+        engine.dispose()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(TUNED_DATABASE_PATH + suffix):
+                os.remove(TUNED_DATABASE_PATH + suffix)
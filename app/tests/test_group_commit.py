@@ -0,0 +1,103 @@
+from concurrent.futures import wait
+
+from fastapi import status
+import pytest
+
+from ..crud.book_class import BookingError, DuplicateBookingError, NoAvailableSlotsError
+from ..crud.group_commit import GROUP_COMMIT_MAX_BATCH, GroupCommitWriter, apply_bookings, group_commit_slots
+from ..models import Booking, FitnessClass
+from ..schemas import BookingCreate
+from ..utils.admission import ConcurrencyLimiter
+from .conftest import TestingSessionLocal
+
+
+def _request(class_id, email, join_waitlist=False):
+    return BookingCreate(
+        class_id=class_id, client_name="Group User", client_email=email, join_waitlist=join_waitlist
+    )
+
+
+@pytest.fixture
+def writer():
+    writer = GroupCommitWriter(TestingSessionLocal, window_ms=50, max_batch=8)
+    yield writer
+    writer.close()
+
+
+def test_apply_bookings_isolates_rejections(second_class, test_db):
+    db = TestingSessionLocal()
+    try:
+        results = apply_bookings(db, [
+            _request(second_class.id, "first@example.com"),
+            _request(second_class.id, "first@example.com"),
+            _request(second_class.id, "second@example.com"),
+            _request(second_class.id, "third@example.com", join_waitlist=True),
+        ])
+    finally:
+        db.close()
+
+    assert results[0][0].status == "confirmed"
+    assert isinstance(results[1], DuplicateBookingError)
+    assert isinstance(results[2], NoAvailableSlotsError)
+    assert results[3][0].status == "waitlisted"
+
+    db_class = test_db.query(FitnessClass).filter(FitnessClass.id == second_class.id).first()
+    test_db.refresh(db_class)
+    assert db_class.available_slots == 0
+    statuses = sorted(status for (status,) in test_db.query(Booking.status).filter(Booking.class_id == second_class.id))
+    assert statuses == ["confirmed", "waitlisted"]
+
+
+def test_writer_commits_queued_bookings_together(test_class, test_db, writer):
+    futures = [writer.submit(_request(test_class.id, f"group{i}@example.com")) for i in range(12)]
+    futures.append(writer.submit(_request(test_class.id, "group0@example.com")))
+    wait(futures, timeout=10)
+
+    confirmed = [future.result()[0] for future in futures[:10]]
+    assert all(booking.status == "confirmed" for booking in confirmed)
+    assert len({booking.id for booking in confirmed}) == 10
+    for future in futures[10:]:
+        assert isinstance(future.exception(), BookingError)
+
+    stats = writer.stats()
+    assert stats["bookings"] == 13
+    assert stats["batches"] < 13
+    assert stats["largest_batch"] <= 8
+    assert test_db.query(Booking).filter(Booking.class_id == test_class.id).count() == 10
+
+
+def test_book_endpoint_with_group_commit(test_class, client, writer, monkeypatch):
+    monkeypatch.setattr("app.routers.bookings.BOOKING_GROUP_COMMIT", True)
+    monkeypatch.setattr("app.routers.bookings.booking_writer", writer)
+    booking_data = {
+        "class_id": test_class.id,
+        "client_name": "Group User",
+        "client_email": "endpoint@example.com"
+    }
+
+    response = client.post("/bookings/book", json=booking_data)
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["status"] == "confirmed"
+
+    duplicate = client.post("/bookings/book", json=booking_data)
+    assert duplicate.status_code == status.HTTP_409_CONFLICT
+    assert duplicate.json() == {"detail": "You already have a booking for this class"}
+    assert writer.stats()["bookings"] == 2
+
+
+def test_group_commit_bookings_skip_writer_slots(test_class, client, writer, monkeypatch):
+    # Every booking writer slot is taken; group-committed bookings do not need one
+    full = ConcurrencyLimiter(max_concurrency=1, max_queue=0, queue_timeout=1)
+    full.in_flight = 1
+    monkeypatch.setattr("app.routers.bookings.booking_writers", full)
+    monkeypatch.setattr("app.routers.bookings.BOOKING_GROUP_COMMIT", True)
+    monkeypatch.setattr("app.routers.bookings.booking_writer", writer)
+
+    response = client.post("/bookings/book", json={
+        "class_id": test_class.id,
+        "client_name": "Group User",
+        "client_email": "slots@example.com"
+    })
+    assert response.status_code == status.HTTP_201_CREATED
+    assert group_commit_slots.stats()["in_flight"] == 0
+    assert group_commit_slots.max_concurrency >= GROUP_COMMIT_MAX_BATCH
@@ -0,0 +1,53 @@
+import pytest
+
+from ..models import IdempotencyRecord
+from ..utils.idempotency import (
+    DatabaseIdempotencyStore,
+    IdempotencyKeyInProgressError,
+    IdempotencyKeyReusedError,
+    MemoryIdempotencyStore
+)
+from .conftest import TestingSessionLocal
+
+
+@pytest.fixture(params=["memory", "database"])
+def store(request):
+    if request.param == "memory":
+        yield MemoryIdempotencyStore(max_entries=100, ttl_seconds=60)
+        return
+    store = DatabaseIdempotencyStore(TestingSessionLocal, ttl_seconds=60, claim_timeout=30)
+    yield store
+    store.clear()
+
+def test_store_replays_completed_response(store):
+    assert store.begin("key", "abc") is None
+    store.complete("key", "abc", 201, b'{"id":1}')
+
+    assert store.begin("key", "abc") == (201, b'{"id":1}')
+    assert store.stats()["replays"] == 1
+    assert store.stats()["replay_rate"] == 0.5
+
+def test_store_rejects_key_in_progress(store):
+    store.begin("key", "abc")
+    with pytest.raises(IdempotencyKeyInProgressError):
+        store.begin("key", "abc")
+
+    store.release("key")
+    assert store.begin("key", "abc") is None
+
+def test_store_rejects_reused_key(store):
+    store.begin("key", "abc")
+    store.complete("key", "abc", 201, b"{}")
+    with pytest.raises(IdempotencyKeyReusedError):
+        store.begin("key", "def")
+    assert store.stats()["reused"] == 1
+
+def test_database_store_reclaims_abandoned_key():
+    store = DatabaseIdempotencyStore(TestingSessionLocal, ttl_seconds=60, claim_timeout=0)
+    try:
+        store.begin("key", "abc")
+        assert store.begin("key", "abc") is None
+        with TestingSessionLocal() as db:
+            assert db.query(IdempotencyRecord).count() == 1
+    finally:
+        store.clear()
@@ -0,0 +1,81 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from ..models import Booking, FitnessClass
+
+
+def explain(db, query) -> str:
+    """SQLite's query plan for an ORM query, one step per line"""
+    compiled = query.statement.compile(dialect=db.bind.dialect)
+    params = tuple(
+        value.isoformat(" ") if isinstance(value, datetime) else value
+        for value in (compiled.params[name] for name in compiled.positiontup)
+    )
+    rows = db.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), params).all()
+    return "\n".join(row[-1] for row in rows)
+
+
+def test_duplicate_check_uses_partial_unique_index(test_db):
+    query = test_db.query(Booking).filter(
+        Booking.class_id == 1,
+        Booking.client_email == "test@example.com",
+        Booking.status == "confirmed"
+    )
+    assert "USING INDEX uq_bookings_confirmed_class_email" in explain(test_db, query)
+
+def test_bookings_by_email_use_index_for_filter_and_sort(test_db):
+    query = (
+        test_db.query(Booking, FitnessClass)
+        .join(FitnessClass, Booking.class_id == FitnessClass.id)
+        .filter(Booking.client_email == "test@example.com")
+        .order_by(Booking.booking_time.desc(), Booking.id.desc())
+    )
+    plan = explain(test_db, query)
+    assert "USING INDEX ix_bookings_client_email_booking_time" in plan
+    assert "TEMP B-TREE" not in plan
+
+def test_upcoming_classes_use_index_for_filter_and_sort(test_db):
+    query = (
+        test_db.query(FitnessClass)
+        .filter(FitnessClass.scheduled_at > datetime.now(timezone.utc))
+        .order_by(FitnessClass.scheduled_at.asc(), FitnessClass.id.asc())
+    )
+    plan = explain(test_db, query)
+    assert "USING INDEX ix_classes_scheduled_at_id" in plan
+    assert "TEMP B-TREE" not in plan
+
+def test_second_confirmed_booking_rejected_by_database(test_class, test_db):
+    def booking(status):
+        return Booking(
+            class_id=test_class.id,
+            client_name="Test User",
+            client_email="unique@example.com",
+            status=status
+        )
+
+    test_db.add_all([booking("confirmed"), booking("cancelled")])
+    test_db.commit()
+
+    test_db.add(booking("confirmed"))
+    with pytest.raises(IntegrityError):
+        test_db.commit()
+    test_db.rollback()
+
+def test_second_waitlisted_booking_rejected_by_database(test_class, test_db):
+    def booking():
+        return Booking(
+            class_id=test_class.id,
+            client_name="Test User",
+            client_email="waiting@example.com",
+            status="waitlisted"
+        )
+
+    test_db.add(booking())
+    test_db.commit()
+
+    test_db.add(booking())
+    with pytest.raises(IntegrityError):
+        test_db.commit()
+    test_db.rollback()
@@ -0,0 +1,137 @@
+import io
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from ..initial_data_loading import iter_json_array, load_fitness_classes
+from ..models import Booking, FitnessClass, WaitlistEntry
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 64, 65536])
+def test_iter_json_array_matches_json_load(chunk_size):
+    with open("app/data/classes.json") as file:
+        expected = json.load(file)
+    with open("app/data/classes.json") as file:
+        assert list(iter_json_array(file, chunk_size)) == expected
+
+def test_iter_json_array_rejects_truncated_input():
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO('[{"name": "Yoga"}, {"na'), 4))
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO('{"name": "Yoga"}'), 4))
+
+@pytest.mark.parametrize("text", [
+    '[{"a": 1} {"b": 2}]',
+    '[1 2]',
+    '[1,, 2]',
+    '[, 1]',
+    '[1, 2,]',
+    '[1] 2',
+])
+def test_iter_json_array_rejects_malformed_input(text):
+    for chunk_size in (1, 3, 64):
+        with pytest.raises(ValueError):
+            list(iter_json_array(io.StringIO(text), chunk_size))
+
+@pytest.mark.parametrize("text", [
+    "[1e5, -0.5]",
+    "[-12.25E-3,1.5e+10,0,-0]",
+    '[{"price": -1.25e2}, 3.0, [2E2, -7]]',
+    "[ 123456789 , -98765.4321e-12 ]",
+])
+def test_iter_json_array_numbers_split_across_reads(text):
+    for chunk_size in range(1, 9):
+        assert list(iter_json_array(io.StringIO(text), chunk_size)) == json.loads(text)
+
+def test_iter_json_array_accepts_empty_and_spaced_arrays():
+    assert list(iter_json_array(io.StringIO(" [ ] \n"), 2)) == []
+    assert list(iter_json_array(io.StringIO("[ 1 ,\n2 ]"), 1)) == [1, 2]
+
+
+@pytest.fixture
+def classes_file(tmp_path):
+    start = (datetime.now(timezone.utc) + timedelta(days=30)).replace(microsecond=0)
+    classes = [
+        {
+            "name": "Loader Yoga",
+            "scheduled_at": (start + timedelta(hours=i)).isoformat(),
+            "instructor": "Loader Instructor",
+            "slots": 10
+        }
+        for i in range(7)
+    ]
+    path = tmp_path / "classes.json"
+    path.write_text(json.dumps(classes))
+    return path, classes
+
+@pytest.fixture
+def loader_cleanup(test_db):
+    yield
+    test_db.query(FitnessClass).filter(FitnessClass.name == "Loader Yoga").delete()
+    test_db.commit()
+
+def test_load_fitness_classes_inserts_in_batches(classes_file, test_db, loader_cleanup):
+    path, classes = classes_file
+    totals = load_fitness_classes(test_db, str(path), batch_size=3)
+    assert totals == {"inserted": 7, "updated": 0, "unchanged": 0, "promoted": 0}
+    assert test_db.query(FitnessClass).filter(FitnessClass.name == "Loader Yoga").count() == 7
+
+def test_load_fitness_classes_resyncs_existing(classes_file, test_db, loader_cleanup):
+    path, classes = classes_file
+    load_fitness_classes(test_db, str(path), batch_size=3)
+
+    # Two spots get booked, then capacity of one class is raised
+    first = (
+        test_db.query(FitnessClass)
+        .filter(FitnessClass.name == "Loader Yoga")
+        .order_by(FitnessClass.scheduled_at)
+        .first()
+    )
+    first.available_slots = 8
+    test_db.commit()
+
+    classes[0]["slots"] = 20
+    path.write_text(json.dumps(classes))
+    totals = load_fitness_classes(test_db, str(path), batch_size=3)
+    assert totals == {"inserted": 0, "updated": 1, "unchanged": 6, "promoted": 0}
+
+    test_db.refresh(first)
+    assert first.total_slots == 20
+    assert first.available_slots == 18
+    assert test_db.query(FitnessClass).filter(FitnessClass.name == "Loader Yoga").count() == 7
+
+def test_load_fitness_classes_promotes_waitlist_into_new_spots(classes_file, test_db, loader_cleanup):
+    path, classes = classes_file
+    load_fitness_classes(test_db, str(path), batch_size=3)
+    first = (
+        test_db.query(FitnessClass)
+        .filter(FitnessClass.name == "Loader Yoga")
+        .order_by(FitnessClass.scheduled_at)
+        .first()
+    )
+    first.available_slots = 0
+    waiting = [
+        Booking(class_id=first.id, client_name="Waiting", client_email=f"wait{i}@example.com", status="waitlisted")
+        for i in range(3)
+    ]
+    test_db.add_all(waiting)
+    test_db.flush()
+    test_db.add_all([WaitlistEntry(class_id=first.id, booking_id=booking.id) for booking in waiting])
+    test_db.commit()
+
+    try:
+        # Two more spots than the 10 already taken
+        classes[0]["slots"] = 12
+        path.write_text(json.dumps(classes))
+        totals = load_fitness_classes(test_db, str(path), batch_size=3)
+        assert totals["promoted"] == 2
+
+        test_db.expire_all()
+        assert [booking.status for booking in waiting] == ["confirmed", "confirmed", "waitlisted"]
+        assert test_db.get(FitnessClass, first.id).available_slots == 0
+        assert test_db.query(WaitlistEntry).filter(WaitlistEntry.class_id == first.id).count() == 1
+    finally:
+        test_db.query(WaitlistEntry).filter(WaitlistEntry.class_id == first.id).delete()
+        test_db.query(Booking).filter(Booking.class_id == first.id).delete()
+        test_db.commit()
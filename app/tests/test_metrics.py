@@ -0,0 +1,51 @@
+from fastapi import status
+
+from ..utils.metrics import Counter, Histogram, Registry, booking_outcomes, http_requests
+
+
+def test_registry_renders_prometheus_text():
+    registry = Registry()
+    requests = registry.register(Counter("requests_total", "Requests", ("route",)))
+    latency = registry.register(Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0)))
+    requests.inc("/classes")
+    requests.inc("/classes")
+    latency.observe(0.05, "/classes")
+    latency.observe(0.5, "/classes")
+
+    assert registry.render().splitlines() == [
+        "# HELP requests_total Requests",
+        "# TYPE requests_total counter",
+        'requests_total{route="/classes"} 2',
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/classes",le="0.1"} 1',
+        'latency_seconds_bucket{route="/classes",le="1"} 2',
+        'latency_seconds_bucket{route="/classes",le="+Inf"} 2',
+        'latency_seconds_sum{route="/classes"} 0.55',
+        'latency_seconds_count{route="/classes"} 2',
+    ]
+
+def test_metrics_endpoint(test_class, client):
+    before = http_requests.value("POST", "/bookings/book", "201")
+    created = booking_outcomes.value("created")
+    duplicates = booking_outcomes.value("duplicate")
+    booking_data = {
+        "class_id": test_class.id,
+        "client_name": "Test User",
+        "client_email": "metrics@example.com"
+    }
+    client.post("/bookings/book", json=booking_data)
+    client.post("/bookings/book", json=booking_data)
+
+    assert http_requests.value("POST", "/bookings/book", "201") == before + 1
+    assert booking_outcomes.value("created") == created + 1
+    assert booking_outcomes.value("duplicate") == duplicates + 1
+
+    response = client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_request_duration_seconds_bucket{method="POST",route="/bookings/book",status="409",le="+Inf"}' in body
+    assert 'db_query_duration_seconds_count{operation="UPDATE"}' in body
+    assert 'db_queries_per_request_count{route="/bookings/book"}' in body
+    assert 'classes_cache{field="hits"}' in body
@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta, timezone
+
+from fastapi import status
+import pytest
+from sqlalchemy.orm import Session
+
+from ..crud.book_class import (
+    ClassAlreadyOverError,
+    DuplicateBookingError,
+    NoAvailableSlotsError,
+    create_booking,
+    load_negative_cache
+)
+from ..models import Booking
+from ..schemas import BookingCreate
+from ..utils import profiling
+from ..utils.negative_cache import BloomFilter, negative_cache
+from ..utils.profiling import record_statements
+from .conftest import engine
+
+profiling.profile_engine(engine)
+
+
+def _book(db, class_id, email, join_waitlist=False):
+    return create_booking(db, BookingCreate(
+        class_id=class_id, client_name="Test User", client_email=email, join_waitlist=join_waitlist
+    ))
+
+
+def test_bloom_filter_membership():
+    bloom = BloomFilter(bits=1024, hashes=7)
+    bloom.add("1:a@example.com")
+    assert "1:a@example.com" in bloom
+    assert "1:b@example.com" not in bloom
+    assert "2:a@example.com" not in bloom
+
+
+def test_bloom_filter_starts_over_when_full():
+    bloom = BloomFilter(bits=100, hashes=3)
+    for i in range(11):
+        bloom.add(str(i))
+    assert bloom.entries == 1
+    assert bloom.resets == 1
+    assert "10" in bloom
+
+
+def test_sold_out_class_rejected_without_sql(second_class):
+    with Session(bind=engine, expire_on_commit=False) as db:
+        _book(db, second_class.id, "first@example.com")
+        # The first doomed request learns that the class is full
+        with pytest.raises(NoAvailableSlotsError):
+            _book(db, second_class.id, "second@example.com")
+
+        with record_statements() as profile:
+            with pytest.raises(NoAvailableSlotsError):
+                _book(db, second_class.id, "third@example.com")
+        assert profile.count == 0
+
+        # The client holding the spot is still told it is a duplicate
+        with pytest.raises(DuplicateBookingError):
+            _book(db, second_class.id, "first@example.com")
+        # and joining the waitlist still reaches the database
+        waiting, _ = _book(db, second_class.id, "third@example.com", join_waitlist=True)
+        assert waiting.status == "waitlisted"
+
+
+def test_started_class_rejected_without_sql(test_class, test_db):
+    negative_cache.note_class(test_class.id, datetime.now(timezone.utc) - timedelta(minutes=1))
+    with Session(bind=engine, expire_on_commit=False) as db:
+        with record_statements() as profile:
+            with pytest.raises(ClassAlreadyOverError):
+                _book(db, test_class.id, "late@example.com")
+    assert profile.count == 0
+
+
+def test_duplicate_confirmed_with_one_read(test_class):
+    with Session(bind=engine, expire_on_commit=False) as db:
+        _book(db, test_class.id, "twice@example.com")
+        with record_statements() as profile:
+            with pytest.raises(DuplicateBookingError):
+                _book(db, test_class.id, "twice@example.com")
+    assert [statement.split(None, 1)[0] for statement, _, _ in profile.statements] == ["SELECT"]
+    assert negative_cache.stats()["duplicates_confirmed"] >= 1
+
+
+def test_duplicate_unknown_to_the_cache_is_still_rejected(test_class, test_db):
+    # Booked before startup, or by another worker
+    test_db.add(Booking(
+        class_id=test_class.id,
+        client_name="Test User",
+        client_email="elsewhere@example.com",
+        booking_time=datetime.now(timezone.utc),
+        status="confirmed"
+    ))
+    test_db.commit()
+
+    with Session(bind=engine, expire_on_commit=False) as db:
+        with pytest.raises(DuplicateBookingError):
+            _book(db, test_class.id, "elsewhere@example.com")
+
+    assert load_negative_cache(test_db) >= 1
+    assert negative_cache.may_have_booking(test_class.id, "elsewhere@example.com")
+
+
+def test_cancellation_reopens_sold_out_class(second_class, client):
+    booked = client.post("/bookings/book", json={
+        "class_id": second_class.id, "client_name": "Test User", "client_email": "first@example.com"
+    }).json()
+    full = client.post("/bookings/book", json={
+        "class_id": second_class.id, "client_name": "Test User", "client_email": "second@example.com"
+    })
+    assert full.status_code == status.HTTP_409_CONFLICT
+
+    client.post(f"/bookings/{booked['id']}/cancel?email=first@example.com")
+    retry = client.post("/bookings/book", json={
+        "class_id": second_class.id, "client_name": "Test User", "client_email": "second@example.com"
+    })
+    assert retry.status_code == status.HTTP_201_CREATED
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import Session
+
+from ..crud.book_class import create_booking
+from ..schemas import BookingCreate
+from ..utils import profiling
+from ..utils.profiling import SQLProfilingMiddleware, record_statements, report
+from .conftest import engine
+
+profiling.profile_engine(engine)
+
+
+def test_record_statements_counts_booking_queries(test_class):
+    # Configured like app.database.SessionLocal
+    with Session(bind=engine, expire_on_commit=False) as db:
+        with record_statements() as profile:
+            create_booking(db, BookingCreate(
+                class_id=test_class.id,
+                client_name="Test User",
+                client_email="profile@example.com"
+            ))
+
+    statements = [statement.split(None, 1)[0] for statement, _, _ in profile.statements]
+    # The negative cache knows the client has no booking, so no duplicate check
+    assert statements == ["UPDATE", "INSERT"]
+    assert profile.repeated() == []
+
+def test_repeated_queries_are_flagged(test_class, caplog):
+    with record_statements() as profile:
+        with engine.connect() as conn:
+            for _ in range(3):
+                conn.execute(text("SELECT name FROM classes WHERE id = :id"), {"id": test_class.id})
+            for class_id in range(3):
+                conn.execute(text("SELECT total_slots FROM classes WHERE id = :id"), {"id": class_id})
+
+    with caplog.at_level(logging.WARNING, logger="app.utils.profiling"):
+        report("GET /test", profile, elapsed=1.0)
+
+    assert "identical query run 3 times: SELECT name FROM classes" in caplog.text
+    assert "query with 3 parameter sets, likely N+1 run 3 times: SELECT total_slots" in caplog.text
+    assert "Slow request GET /test" in caplog.text
+    assert "SEARCH classes USING INTEGER PRIMARY KEY" in caplog.text
+    assert "<1 redacted>" in caplog.text
+    assert f"({test_class.id},)" not in caplog.text
+
+def test_parameters_logged_only_when_enabled(test_class, caplog, monkeypatch):
+    with record_statements() as profile:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT name FROM classes WHERE instructor = :instructor"), {"instructor": "secret@example.com"})
+
+    with caplog.at_level(logging.WARNING, logger="app.utils.profiling"):
+        report("GET /test", profile, elapsed=1.0)
+    assert "secret@example.com" not in caplog.text
+
+    monkeypatch.setattr(profiling, "SQL_PROFILING_LOG_PARAMETERS", True)
+    caplog.clear()
+    with caplog.at_level(logging.WARNING, logger="app.utils.profiling"):
+        report("GET /test", profile, elapsed=1.0)
+    assert "secret@example.com" in caplog.text
+
+
+def test_slow_request_on_async_engine_is_explained(tmp_path, caplog, monkeypatch):
+    # As configured with DB_ASYNC=true
+    monkeypatch.setattr(profiling, "SLOW_REQUEST_MS", 0)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'profile.db'}")
+    profiling.profile_engine(async_engine)
+
+    async def app(scope, receive, send):
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT name FROM studios WHERE id = :id"), {"id": 1})
+
+    async def scenario():
+        async with async_engine.begin() as conn:
+            await conn.execute(text("CREATE TABLE studios (id INTEGER PRIMARY KEY, name TEXT)"))
+        try:
+            await SQLProfilingMiddleware(app)({"type": "http", "method": "GET", "path": "/studios"}, None, None)
+        finally:
+            await async_engine.dispose()
+
+    with caplog.at_level(logging.WARNING, logger="app.utils.profiling"):
+        asyncio.run(scenario())
+    assert "Slow request GET /studios" in caplog.text
+    assert "SEARCH studios USING INTEGER PRIMARY KEY" in caplog.text
+    assert "EXPLAIN failed" not in caplog.text
@@ -0,0 +1,112 @@
+import asyncio
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+import pytest
+
+from .. import database
+from ..database import Replica, ReplicaSet, get_read_db, get_read_session, is_replica_session
+from ..main import app
+from ..utils.cache import classes_cache
+from .conftest import engine as test_engine
+
+
+def _replica(sync_engine):
+    return Replica(str(sync_engine.url), sessionmaker(bind=sync_engine), sync_engine)
+
+def _broken_replica():
+    return _replica(create_engine("sqlite:////nonexistent/directory/replica.db"))
+
+def _request(email=None, host="10.0.0.1"):
+    query = f"email={email}".encode() if email else b""
+    return Request({"type": "http", "query_string": query, "headers": [], "client": (host, 1234)})
+
+def test_round_robin_alternates_replicas():
+    replicas = [_replica(test_engine), _replica(test_engine)]
+    replica_set = ReplicaSet(replicas, "round_robin", sticky_seconds=5, retry_seconds=30)
+    assert [replica_set.acquire() for _ in range(4)] == replicas * 2
+
+def test_least_busy_picks_fewest_sessions():
+    replicas = [_replica(test_engine), _replica(test_engine)]
+    replica_set = ReplicaSet(replicas, "least_busy", sticky_seconds=5, retry_seconds=30)
+    first = replica_set.acquire()
+    second = replica_set.acquire()
+    assert first is not second
+    replica_set.release(first)
+    assert replica_set.acquire() is first
+
+def test_client_reads_primary_after_writing():
+    replica_set = ReplicaSet([_replica(test_engine)], "round_robin", sticky_seconds=5, retry_seconds=30)
+    replica_set.stick("user@example.com", "10.0.0.1")
+    assert replica_set.acquire("user@example.com", None) is None
+    assert replica_set.acquire(None, "10.0.0.1") is None
+    assert replica_set.acquire("other@example.com", "10.0.0.2") is not None
+    assert replica_set.stats()["sticky_reads"] == 2
+
+def test_failed_replica_is_skipped():
+    broken = _broken_replica()
+    replica_set = ReplicaSet([broken], "round_robin", sticky_seconds=5, retry_seconds=30)
+    with pytest.raises(OperationalError):
+        with broken.sync_engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    assert not broken.healthy
+    assert replica_set.acquire() is None
+    assert replica_set.stats()["healthy"] == 0
+
+def test_get_read_db_falls_back_to_primary_when_probe_fails(monkeypatch):
+    broken = _broken_replica()
+    replica_set = ReplicaSet([broken], "round_robin", sticky_seconds=5, retry_seconds=0)
+    monkeypatch.setattr(database, "read_replicas", replica_set)
+
+    async def read_bind():
+        dependency = get_read_db(_request())
+        db = await dependency.__anext__()
+        bind = db.get_bind()
+        assert not is_replica_session(db)
+        await dependency.aclose()
+        return bind
+
+    assert asyncio.run(read_bind()) is database.engine
+    assert broken.in_flight == 0
+
+def test_get_read_db_uses_replica(monkeypatch):
+    replica = _replica(test_engine)
+    monkeypatch.setattr(database, "read_replicas", ReplicaSet([replica], "round_robin", 5, 30))
+
+    async def read_bind():
+        dependency = get_read_db(_request("reader@example.com"))
+        db = await dependency.__anext__()
+        bind = db.get_bind()
+        assert replica.in_flight == 1
+        assert is_replica_session(db)
+        await dependency.aclose()
+        return bind
+
+    assert asyncio.run(read_bind()) is test_engine
+    assert replica.in_flight == 0
+    assert replica.verified
+
+def test_replica_reads_do_not_fill_classes_cache(test_class, client, monkeypatch):
+    replica = _replica(test_engine)
+    monkeypatch.setattr(database, "read_replicas", ReplicaSet([replica], "round_robin", 5, 30))
+    monkeypatch.setitem(app.dependency_overrides, get_read_session, get_read_db)
+
+    response = client.get("/classes")
+    assert any(c["id"] == test_class.id for c in response.json())
+    assert database.read_replicas.stats()["replica_reads"] == 1
+    assert classes_cache.stats()["entries"] == 0
+
+
+def test_stickiness_keys_on_address_only_when_enabled(monkeypatch):
+    replica = _replica(test_engine)
+    monkeypatch.setattr(database, "read_replicas", ReplicaSet([replica], "round_robin", 5, 30))
+    database.mark_client_wrote(_request(host="10.0.0.9"), "writer@example.com")
+    # Another client behind the same proxy address still reads from the replica
+    assert database.read_replicas.acquire(*database._client_keys(_request("other@example.com", "10.0.0.9"))) is replica
+    assert database.read_replicas.acquire(*database._client_keys(_request("writer@example.com", "10.0.0.2"))) is None
+
+    monkeypatch.setattr(database, "REPLICA_STICKY_BY_ADDRESS", True)
+    database.mark_client_wrote(_request(host="10.0.0.9"), "writer@example.com")
+    assert database.read_replicas.acquire(*database._client_keys(_request("other@example.com", "10.0.0.9"))) is None
@@ -0,0 +1,80 @@
+import json
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import msgpack
+
+from ..schemas import BookingResponse, BookingWithClassResponse, FitnessClassResponse
+from ..utils.serializers import (
+    serialize_booking,
+    serialize_bookings_with_class,
+    serialize_fitness_classes,
+    serialize_fitness_classes_columnar,
+    serialize_fitness_classes_msgpack
+)
+from ..utils.timezone_utils import convert_utc_to_timezone
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+
+def test_serialize_fitness_classes_matches_schema():
+    fitness_class = SimpleNamespace(
+        id=1, name="Yoga", instructor="Yoga Instructor 1",
+        scheduled_at=datetime(2025, 7, 1, 0, 30), total_slots=5, remaining_slots=4
+    )
+    scheduled_at = convert_utc_to_timezone(fitness_class.scheduled_at, "Asia/Kolkata")
+
+    expected = FitnessClassResponse(
+        id=1, name="Yoga", instructor="Yoga Instructor 1",
+        scheduled_at=scheduled_at, total_slots=5, available_slots=4
+    ).model_dump_json()
+
+    assert serialize_fitness_classes([fitness_class], [scheduled_at]) == f"[{expected}]".encode()
+
+
+def test_fitness_class_formats_carry_the_same_rows():
+    start = datetime(2025, 7, 1, 0, 30, 15, 250000)
+    classes = [
+        SimpleNamespace(
+            id=i, name="Yoga", instructor=f"Yoga Instructor {i}",
+            scheduled_at=start + timedelta(hours=i), total_slots=5, remaining_slots=i
+        )
+        for i in range(3)
+    ]
+    scheduled_times = [convert_utc_to_timezone(c.scheduled_at, "Asia/Kolkata") for c in classes]
+    rows = json.loads(serialize_fitness_classes(classes, scheduled_times))
+
+    columns = json.loads(serialize_fitness_classes_columnar(classes, scheduled_times))
+    assert list(columns) == list(rows[0])
+    assert [dict(zip(columns, values)) for values in zip(*columns.values())] == rows
+
+    assert msgpack.unpackb(serialize_fitness_classes_msgpack(classes, scheduled_times)) == rows
+
+
+def test_serialize_booking_matches_schema():
+    booking = SimpleNamespace(
+        id=7, class_id=1, client_name="Test User", client_email="test@example.com",
+        booking_time=datetime(2025, 6, 10, 16, 6, 56, 123456, tzinfo=timezone.utc),
+        status="confirmed"
+    )
+    scheduled_at = datetime(2025, 7, 1, 0, 30)
+
+    expected = BookingResponse(
+        id=7, class_id=1, client_name="Test User", client_email="test@example.com",
+        booking_time=booking.booking_time, scheduled_at=scheduled_at, status="confirmed"
+    ).model_dump_json()
+
+    assert json.loads(serialize_booking(booking, scheduled_at)) == json.loads(expected)
+
+
+def test_serialize_bookings_with_class_matches_schema(mock_db_bookings):
+    booking = mock_db_bookings[0]
+    scheduled_at = booking["scheduled_at"].astimezone(IST)
+    booking_time = booking["booking_time"].astimezone(IST)
+
+    expected = BookingWithClassResponse(
+        **{**booking, "scheduled_at": scheduled_at, "booking_time": booking_time}
+    ).model_dump_json()
+
+    serialized = serialize_bookings_with_class(mock_db_bookings, [scheduled_at], [booking_time])
+    assert serialized == f"[{expected}]".encode()
@@ -0,0 +1,114 @@
+from datetime import datetime, timezone
+import sys
+
+from fastapi import status
+import pytest
+
+from .. import initial_data_loading
+from ..crud import book_class, fitness_class, slot_shards
+from ..crud.fitness_class import get_remaining_slots, get_upcoming_classes
+from ..crud.slot_shards import reserve_from_shards, shard_class_slots, unshard_class_slots
+from ..models import ClassSlotShard, FitnessClass
+from ..utils import profiling
+from ..utils.profiling import record_statements
+from .conftest import engine
+
+profiling.profile_engine(engine)
+
+
+@pytest.fixture
+def sharded_class(test_class, test_db, monkeypatch):
+    for module in (slot_shards, book_class, fitness_class, initial_data_loading):
+        monkeypatch.setattr(module, "SLOT_SHARDS", 4)
+    shard_class_slots(test_db, test_class.id, 4)
+
+    yield test_class
+
+    test_db.query(ClassSlotShard).filter(ClassSlotShard.class_id == test_class.id).delete()
+    test_db.commit()
+
+def _listed_slots(client, class_id):
+    return next(c for c in client.get("/classes").json() if c["id"] == class_id)["available_slots"]
+
+def test_shard_class_slots_splits_open_spots(sharded_class, test_db):
+    shards = test_db.query(ClassSlotShard).filter(ClassSlotShard.class_id == sharded_class.id).all()
+    assert sorted(shard.available_slots for shard in shards) == [2, 2, 3, 3]
+
+    db_class = test_db.query(FitnessClass).filter(FitnessClass.id == sharded_class.id).first()
+    test_db.refresh(db_class)
+    assert db_class.available_slots == 0
+    assert get_remaining_slots(test_db, [sharded_class.id]) == {sharded_class.id: 10}
+
+def test_bookings_drain_every_shard(sharded_class, test_db, client):
+    assert _listed_slots(client, sharded_class.id) == 10
+
+    for i in range(10):
+        response = client.post("/bookings/book", json={
+            "class_id": sharded_class.id,
+            "client_name": "Shard User",
+            "client_email": f"shard{i}@example.com"
+        })
+        assert response.status_code == status.HTTP_201_CREATED
+
+    response = client.post("/bookings/book", json={
+        "class_id": sharded_class.id,
+        "client_name": "Shard User",
+        "client_email": "late@example.com"
+    })
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert response.json() == {"detail": "No available slots for this class"}
+    assert _listed_slots(client, sharded_class.id) == 0
+
+def test_sharded_class_rejects_duplicate(sharded_class, client):
+    booking_data = {
+        "class_id": sharded_class.id,
+        "client_name": "Shard User",
+        "client_email": "twice@example.com"
+    }
+    client.post("/bookings/book", json=booking_data)
+    response = client.post("/bookings/book", json=booking_data)
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert response.json() == {"detail": "You already have a booking for this class"}
+    assert _listed_slots(client, sharded_class.id) == 9
+
+def test_batch_booking_reserves_from_shards(sharded_class, client):
+    response = client.post("/bookings/batch", json={
+        "class_ids": [sharded_class.id],
+        "client_name": "Shard User",
+        "client_email": "batch@example.com"
+    })
+    assert response.status_code == status.HTTP_201_CREATED
+    assert _listed_slots(client, sharded_class.id) == 9
+
+def test_unshard_class_slots_merges_spots_back(sharded_class, test_db):
+    unshard_class_slots(test_db, sharded_class.id)
+    assert test_db.query(ClassSlotShard).filter(ClassSlotShard.class_id == sharded_class.id).count() == 0
+
+    db_class = test_db.query(FitnessClass).filter(FitnessClass.id == sharded_class.id).first()
+    test_db.refresh(db_class)
+    assert db_class.available_slots == 10
+
+def test_reserve_uses_the_class_shard_count(sharded_class, test_db):
+    # Fewer shards than SLOT_SHARDS; every spot is still reachable
+    shard_class_slots(test_db, sharded_class.id, 2)
+    now = datetime.now(timezone.utc)
+    assert all(reserve_from_shards(test_db, sharded_class.id, f"two{i}@example.com", now) for i in range(10))
+    assert not reserve_from_shards(test_db, sharded_class.id, "eleven@example.com", now)
+    test_db.rollback()
+
+def test_shard_class_slots_rejects_no_shards(test_class, test_db):
+    with pytest.raises(ValueError):
+        shard_class_slots(test_db, test_class.id, 0)
+
+def test_cli_refuses_to_shard_without_slot_shards(monkeypatch):
+    monkeypatch.setattr(slot_shards, "SLOT_SHARDS", 0)
+    monkeypatch.setattr(sys, "argv", ["slot_shards", "1", "--shards", "4"])
+    with pytest.raises(SystemExit):
+        slot_shards.main()
+
+def test_shard_totals_not_queried_when_sharding_is_off(test_class, test_db):
+    with record_statements() as profile:
+        classes = get_upcoming_classes(test_db, datetime.now(timezone.utc))
+        assert next(c for c in classes if c.id == test_class.id).remaining_slots == 10
+    assert profile.count == 1
+    assert "class_slot_shards" not in profile.statements[0][0]
@@ -1,7 +1,14 @@
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 
-from ..utils.timezone_utils import convert_utc_to_timezone, convert_timezone_to_utc, is_valid_timezone
+from ..utils import timezone_utils
+from ..utils.timezone_utils import (
+    convert_utc_to_timezone,
+    convert_utc_to_timezone_batch,
+    convert_timezone_to_utc,
+    get_timezone,
+    is_valid_timezone
+)
 
 def test_convert_utc_to_timezone():
     now_utc = datetime(2025, 6, 10, 12, 0, tzinfo=timezone.utc)
@@ -18,3 +25,41 @@ def test_convert_timezone_to_utc():
 def test_invalid_timezone_check():
     assert is_valid_timezone("Asia/Kolkata")
     assert not is_valid_timezone("Invalid/Zone")
+
+def test_convert_utc_to_timezone_batch_matches_per_row():
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    utc_datetimes = [start + timedelta(hours=7 * i) for i in range(3000)]
+    for zone in ("America/New_York", "Europe/London", "Asia/Kolkata", "UTC"):
+        batch = convert_utc_to_timezone_batch(utc_datetimes, zone)
+        per_row = [convert_utc_to_timezone(dt, zone) for dt in utc_datetimes]
+        assert [dt.isoformat() for dt in batch] == [dt.isoformat() for dt in per_row]
+        assert [dt.tzname() for dt in batch] == [dt.tzname() for dt in per_row]
+
+def test_convert_utc_to_timezone_batch_unsorted_and_naive():
+    utc_datetimes = [
+        datetime(2025, 7, 1, 12, 0),
+        datetime(2025, 1, 1, 12, 0),
+        datetime(2025, 7, 1, 12, 0, tzinfo=timezone.utc),
+    ]
+    converted = convert_utc_to_timezone_batch(utc_datetimes, "Europe/Berlin")
+    assert [dt.isoformat() for dt in converted] == [
+        "2025-07-01T14:00:00+02:00",
+        "2025-01-01T13:00:00+01:00",
+        "2025-07-01T14:00:00+02:00",
+    ]
+
+def test_get_timezone_is_memoized():
+    assert get_timezone("Asia/Kolkata") is get_timezone("Asia/Kolkata")
+
+def test_get_timezone_ignores_case():
+    assert get_timezone("asia/KOLKATA") is get_timezone("Asia/Kolkata")
+    assert timezone_utils._load_timezone.cache_info().currsize <= len(timezone_utils._canonical_names)
+
+def test_convert_utc_to_timezone_batch_without_transition_table(monkeypatch):
+    monkeypatch.setattr(timezone_utils, "_transition_table", lambda tz: None)
+    utc_datetimes = [datetime(2025, 1, 1, 12, 0), datetime(2025, 7, 1, 12, 0, tzinfo=timezone.utc)]
+    converted = convert_utc_to_timezone_batch(utc_datetimes, "Europe/Berlin")
+    assert [dt.isoformat() for dt in converted] == [
+        "2025-01-01T13:00:00+01:00",
+        "2025-07-01T14:00:00+02:00",
+    ]
@@ -0,0 +1,77 @@
+import asyncio
+
+from fastapi import status
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
+from .. import warmup
+from ..routers.classes import preload_classes
+from ..utils.cache import classes_cache
+from .conftest import TestingSessionLocal
+
+
+def test_ready_reports_startup_progress(client, monkeypatch):
+    monkeypatch.setattr(warmup.readiness, "ready", False)
+    monkeypatch.setattr(warmup.readiness, "phases", {"initial_data_load": 0.0123})
+    response = client.get("/ready")
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.json() == {"status": "starting", "phases_ms": {"initial_data_load": 12.3}, "failed": []}
+
+    monkeypatch.setattr(warmup.readiness, "ready", True)
+    assert client.get("/ready").status_code == status.HTTP_200_OK
+    # Liveness does not wait for warm-up
+    assert client.get("/health").status_code == status.HTTP_200_OK
+
+
+def test_open_pool_connections(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=QueuePool, pool_size=3)
+    try:
+        assert warmup.open_pool_connections(engine, 3) == 3
+        assert engine.pool.checkedin() == 3
+    finally:
+        engine.dispose()
+
+
+def test_load_timezones_skips_unknown_zones():
+    assert warmup.load_timezones(["UTC", "Asia/Kolkata", "Not/AZone", "UTC"]) == ["UTC", "Asia/Kolkata"]
+
+
+def test_preloaded_schedule_served_from_cache(test_class, client):
+    db = TestingSessionLocal()
+    try:
+        asyncio.run(preload_classes(db, "Asia/Kolkata"))
+    finally:
+        db.close()
+
+    hits = classes_cache.stats()["hits"]
+    response = client.get("/classes", params={"time_zone": "Asia/Kolkata"})
+    assert response.status_code == status.HTTP_200_OK
+    assert any(c["id"] == test_class.id for c in response.json())
+    assert classes_cache.stats()["hits"] == hits + 1
+
+
+def test_failed_phase_is_logged_and_skipped(monkeypatch):
+    monkeypatch.setattr(warmup, "readiness", warmup.Readiness())
+
+    async def broken():
+        raise RuntimeError("database unreachable")
+
+    assert asyncio.run(warmup._run_phase("connection_pools", broken)) is None
+    assert warmup.readiness.failed == ["connection_pools"]
+    assert "connection_pools" in warmup.readiness.phases
+
+
+def test_failed_data_load_keeps_worker_unready(monkeypatch):
+    monkeypatch.setattr(warmup, "readiness", warmup.Readiness())
+    monkeypatch.setattr(warmup, "WARMUP_ENABLED", False)
+    monkeypatch.setattr(warmup.negative_cache, "enabled", False)
+
+    def broken():
+        raise RuntimeError("classes.json is malformed")
+
+    monkeypatch.setattr(warmup, "initial_data_load_fitness_classes", broken)
+    asyncio.run(warmup.load_data())
+    asyncio.run(warmup.warm_up())
+    assert not warmup.readiness.ready
+    assert warmup.readiness.state()["status"] == "failed"
+    assert warmup.readiness.failed == ["initial_data_load"]
@@ -0,0 +1,255 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Hashable, Optional, Tuple
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# Clients tracked per limit; the least recently seen are forgotten first
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Booking writes handled at once; the rest wait in a queue of bounded length
+BOOKING_MAX_CONCURRENCY = int(os.getenv("BOOKING_MAX_CONCURRENCY", "8"))
+BOOKING_MAX_QUEUE = int(os.getenv("BOOKING_MAX_QUEUE", "64"))
+BOOKING_QUEUE_TIMEOUT = float(os.getenv("BOOKING_QUEUE_TIMEOUT", "5"))
+# Retry-After sent with 503 when a booking request is shed
+BOOKING_OVERLOAD_RETRY_AFTER = int(os.getenv("BOOKING_OVERLOAD_RETRY_AFTER", "1"))
+
+
+class AdmissionError(Exception):
+    """A request turned away before it reached the database"""
+
+    def __init__(self, message: str, retry_after: float, reason: str):
+        super().__init__(message)
+        self.retry_after = retry_after
+        # Label for the admission_rejections_total metric
+        self.reason = reason
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class RateLimitedError(AdmissionError):
+    """A client used up its token bucket"""
+
+
+class OverloadedError(AdmissionError):
+    """The booking queue is full or the wait in it timed out"""
+
+
+def parse_limit(value: str) -> Optional[Tuple[int, float]]:
+    """
+    Parse "<requests>/<seconds>", e.g. "10/60", into (requests, seconds)
+
+    An empty value or zero requests turns the limit off.
+    """
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        requests, seconds = value.split("/")
+        requests, seconds = int(requests), float(seconds)
+    except ValueError:
+        raise ValueError(f"Invalid rate limit {value!r}, expected <requests>/<seconds>")
+    if requests <= 0:
+        return None
+    if seconds <= 0:
+        raise ValueError(f"Invalid rate limit {value!r}, seconds must be positive")
+    return requests, seconds
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket per key: bursts of up to `requests`, refilled evenly
+    over `seconds`
+
+    Buckets live in memory, so each worker process limits on its own.
+    """
+
+    def __init__(self, requests: int, seconds: float, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.capacity = requests
+        self.rate = requests / seconds
+        self.max_keys = max_keys
+        # key -> (tokens, monotonic time of the last refill)
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: Hashable) -> float:
+        """Take a token; returns 0 when allowed, else seconds until one is free"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return 0.0 if allowed else (1 - tokens) / self.rate
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class RouteLimits:
+    """The per-email and per-address token buckets of one route"""
+
+    def __init__(self, route: str, email_limit: Optional[Tuple[int, float]], ip_limit: Optional[Tuple[int, float]]):
+        self.route = route
+        self.email = TokenBucketLimiter(*email_limit) if email_limit else None
+        self.ip = TokenBucketLimiter(*ip_limit) if ip_limit else None
+
+    def check(self, email: Optional[str], ip: Optional[str]) -> None:
+        """Raise RateLimitedError when either bucket of the client is empty"""
+        if not RATE_LIMIT_ENABLED:
+            return
+        if self.ip is not None and ip:
+            retry_after = self.ip.acquire(ip)
+            if retry_after:
+                raise RateLimitedError("Too many requests from this address", retry_after, "ip")
+        if self.email is not None and email:
+            retry_after = self.email.acquire(email.lower())
+            if retry_after:
+                raise RateLimitedError("Too many requests for this email", retry_after, "email")
+
+    def clear(self) -> None:
+        for limiter in (self.email, self.ip):
+            if limiter is not None:
+                limiter.clear()
+
+    def stats(self) -> dict:
+        return {
+            "email_clients": len(self.email) if self.email else 0,
+            "ip_clients": len(self.ip) if self.ip else 0,
+        }
+
+
+def _route_limits(route: str, email_default: str, ip_default: str) -> RouteLimits:
+    prefix = f"RATE_LIMIT_{route.upper()}"
+    return RouteLimits(
+        route,
+        parse_limit(os.getenv(f"{prefix}_EMAIL", email_default)),
+        parse_limit(os.getenv(f"{prefix}_IP", ip_default)),
+    )
+
+
+class ConcurrencyLimiter:
+    """
+    Caps the requests in flight, queueing a bounded number behind them
+
+    When the queue is full, or a request waits in it past queue_timeout,
+    OverloadedError is raised straight away, so overload shows up as fast
+    503s instead of every request waiting on the database's write lock.
+    Waiters may sit on different event loops, as under TestClient, so a
+    freed slot is handed over on the waiter's own loop.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.admitted = 0
+        self.queue_full = 0
+        self.timed_out = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def _overloaded(self, reason: str) -> OverloadedError:
+        return OverloadedError("Too many booking requests, try again shortly", BOOKING_OVERLOAD_RETRY_AFTER, reason)
+
+    async def acquire(self) -> None:
+        if self.max_concurrency <= 0:
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        with self._lock:
+            if self.in_flight < self.max_concurrency and not self._waiters:
+                self.in_flight += 1
+                self.admitted += 1
+                return
+            if len(self._waiters) >= self.max_queue:
+                self.queue_full += 1
+                raise self._overloaded("queue_full")
+            self._waiters.append(waiter)
+
+        try:
+            # release() hands its slot over by resolving the waiter
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timed_out += 1
+            raise self._overloaded("queue_timeout")
+        except BaseException:
+            # Cancelled while queued; pass on a slot handed over meanwhile
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        with self._lock:
+            self.admitted += 1
+
+    def release(self) -> None:
+        if self.max_concurrency <= 0:
+            return
+        with self._lock:
+            if not self._waiters:
+                self.in_flight -= 1
+                return
+            waiter = self._waiters.popleft()
+        try:
+            waiter.get_loop().call_soon_threadsafe(self._hand_over, waiter)
+        except RuntimeError:
+            # The waiter's loop has shut down
+            self.release()
+
+    def _hand_over(self, waiter: asyncio.Future) -> None:
+        if waiter.done():
+            # It gave up waiting in the meantime
+            self.release()
+        else:
+            waiter.set_result(None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "queued": len(self._waiters),
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "admitted": self.admitted,
+                "queue_full": self.queue_full,
+                "timed_out": self.timed_out,
+            }
+
+
+# "<requests>/<seconds>" per client email and per client address;
+# RATE_LIMIT_<ROUTE>_EMAIL / RATE_LIMIT_<ROUTE>_IP override them. The
+# per-address limits are off by default: behind a proxy every client
+# shares its address unless the server is told to trust forwarded headers
+route_limits: Dict[str, RouteLimits] = {
+    "book": _route_limits("book", "10/60", ""),
+    "batch": _route_limits("batch", "5/60", ""),
+    "cancel": _route_limits("cancel", "10/60", ""),
+}
+
+# Shared by every booking write route, since they contend for the same lock
+booking_writers = ConcurrencyLimiter(BOOKING_MAX_CONCURRENCY, BOOKING_MAX_QUEUE, BOOKING_QUEUE_TIMEOUT)
+
+
+def admission_stats() -> dict:
+    stats = booking_writers.stats()
+    for route, limits in route_limits.items():
+        for field, value in limits.stats().items():
+            stats[f"{route}_{field}"] = value
+    return stats
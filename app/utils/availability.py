@@ -0,0 +1,163 @@
+import asyncio
+import itertools
+import os
+import threading
+from typing import Dict, Iterable, Optional, Set
+
+# Updates to a connection are held back this long and sent together
+AVAILABILITY_COALESCE_MS = float(os.getenv("AVAILABILITY_COALESCE_MS", "100"))
+# A connection whose send takes longer than this is dropped
+AVAILABILITY_SEND_TIMEOUT = float(os.getenv("AVAILABILITY_SEND_TIMEOUT", "10"))
+AVAILABILITY_HEARTBEAT = float(os.getenv("AVAILABILITY_HEARTBEAT", "15"))
+AVAILABILITY_MAX_SUBSCRIBERS = int(os.getenv("AVAILABILITY_MAX_SUBSCRIBERS", "10000"))
+MAX_CLASSES_PER_SUBSCRIPTION = int(os.getenv("AVAILABILITY_MAX_CLASSES", "100"))
+
+
+class TooManySubscribersError(Exception):
+    """The broker is at AVAILABILITY_MAX_SUBSCRIBERS"""
+
+
+class Subscription:
+    """
+    One connection's interest in a set of classes
+
+    Only the latest count per class is kept, so a slow consumer costs one
+    dict entry per class it watches, however many updates it misses.
+    Counts read before one already offered arrive with a lower sequence
+    number and are dropped, so a late, stale count never replaces a
+    newer one.
+    """
+
+    def __init__(self, class_ids: Iterable[int]):
+        self.class_ids: Set[int] = set(class_ids)
+        self.pending: Dict[int, int] = {}
+        self.sequences: Dict[int, int] = {}
+        self.ready = asyncio.Event()
+
+    def offer(self, class_id: int, available_slots: int, sequence: int) -> None:
+        if sequence < self.sequences.get(class_id, 0):
+            return
+        self.sequences[class_id] = sequence
+        self.pending[class_id] = available_slots
+        self.ready.set()
+
+    def skip_older(self, class_ids: Iterable[int], sequence: int) -> None:
+        """Drop counts read before sequence, e.g. once a snapshot was sent"""
+        for class_id in class_ids:
+            self.sequences[class_id] = max(sequence, self.sequences.get(class_id, 0))
+
+    async def next_batch(self, timeout: Optional[float] = None) -> Dict[int, int]:
+        """
+        Wait for updates and return them, latest count per class
+
+        Returns an empty dict when the timeout passes first, so the caller
+        can send a heartbeat.
+        """
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return {}
+        # Let a burst of bookings land before sending
+        if AVAILABILITY_COALESCE_MS:
+            await asyncio.sleep(AVAILABILITY_COALESCE_MS / 1000)
+        self.ready.clear()
+        batch, self.pending = self.pending, {}
+        return batch
+
+
+class AvailabilityBroker:
+    """
+    Fans out available-slot changes to subscribed connections
+
+    publish() may be called from any thread, such as the threadpool CRUD
+    functions run in; delivery always happens on the event loop that the
+    subscribers live on. With no subscribers, publishing costs a set lookup.
+
+    Counts are read after commit in several threads and may be delivered
+    in any order. Each read takes a sequence number from next_sequence()
+    before it starts; the highest number is then taken after the last
+    commit, so its count is current, and subscribers drop anything older.
+    """
+
+    def __init__(self, max_subscribers: int = AVAILABILITY_MAX_SUBSCRIBERS):
+        self.max_subscribers = max_subscribers
+        self.published = 0
+        self._by_class: Dict[int, Set[Subscription]] = {}
+        self._subscribers = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        self._sequence = itertools.count(1)
+
+    def subscribe(self, class_ids: Iterable[int]) -> Subscription:
+        """Register a connection; must be called on the event loop"""
+        subscription = Subscription(class_ids)
+        with self._lock:
+            if self._subscribers >= self.max_subscribers:
+                raise TooManySubscribersError("Too many availability subscribers")
+            self._loop = asyncio.get_running_loop()
+            self._subscribers += 1
+            for class_id in subscription.class_ids:
+                self._by_class.setdefault(class_id, set()).add(subscription)
+        return subscription
+
+    def update(self, subscription: Subscription, add: Iterable[int] = (), remove: Iterable[int] = ()) -> None:
+        """Change the classes a subscription watches"""
+        with self._lock:
+            for class_id in remove:
+                subscription.class_ids.discard(class_id)
+                subscription.pending.pop(class_id, None)
+                self._discard(class_id, subscription)
+            for class_id in add:
+                subscription.class_ids.add(class_id)
+                self._by_class.setdefault(class_id, set()).add(subscription)
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers -= 1
+            for class_id in subscription.class_ids:
+                self._discard(class_id, subscription)
+
+    def _discard(self, class_id: int, subscription: Subscription) -> None:
+        watchers = self._by_class.get(class_id)
+        if watchers is not None:
+            watchers.discard(subscription)
+            if not watchers:
+                del self._by_class[class_id]
+
+    def is_watched(self, class_id: int) -> bool:
+        return class_id in self._by_class
+
+    def next_sequence(self) -> int:
+        """Take before reading counts to publish or offer"""
+        with self._lock:
+            return next(self._sequence)
+
+    def publish(self, class_id: int, available_slots: int, sequence: Optional[int] = None) -> None:
+        """Send a class's new count, read after next_sequence(), to everyone watching it"""
+        if class_id not in self._by_class or self._loop is None:
+            return
+        if sequence is None:
+            sequence = self.next_sequence()
+        self.published += 1
+        try:
+            self._loop.call_soon_threadsafe(self._deliver, class_id, available_slots, sequence)
+        except RuntimeError:
+            # The loop has shut down
+            pass
+
+    def _deliver(self, class_id: int, available_slots: int, sequence: int) -> None:
+        with self._lock:
+            watchers = list(self._by_class.get(class_id, ()))
+        for subscription in watchers:
+            subscription.offer(class_id, available_slots, sequence)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "subscribers": self._subscribers,
+                "watched_classes": len(self._by_class),
+                "published": self.published,
+            }
+
+
+availability_broker = AvailabilityBroker()
@@ -0,0 +1,80 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with a per-entry TTL and hit/miss counters
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None when missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """Store a value, evicting the least recently used entry when full"""
+        ttl = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# Bumped whenever the schedule or a class's slot count changes, so cached
+# schedules are keyed on it and never served after a change
+_schedule_version = 0
+_version_lock = threading.Lock()
+
+
+def get_schedule_version() -> int:
+    return _schedule_version
+
+
+def bump_schedule_version() -> int:
+    global _schedule_version
+    with _version_lock:
+        _schedule_version += 1
+        return _schedule_version
+
+
+classes_cache = LRUCache(
+    max_entries=int(os.getenv("CLASSES_CACHE_MAX_ENTRIES", "128")),
+    ttl_seconds=float(os.getenv("CLASSES_CACHE_TTL", "5")),
+)
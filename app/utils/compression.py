@@ -0,0 +1,219 @@
+import gzip
+import os
+import threading
+from typing import Dict, List, Optional
+
+from fastapi import Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+from .negotiation import parse_qualities
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+# Bodies smaller than this are sent as they are; compressing them saves
+# next to nothing and still costs CPU
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# 1 (fastest) to 9 (smallest)
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# Brotli quality, 0 to 11; above 5 gets slow for per-request compression
+BROTLI_LEVEL = int(os.getenv("BROTLI_LEVEL", "5"))
+# Bodies this large or larger are compressed in the threadpool so the event
+# loop keeps serving meanwhile; smaller ones cost less than the hand-off
+COMPRESSION_THREADPOOL_MIN_SIZE = int(os.getenv("COMPRESSION_THREADPOOL_MIN_SIZE", "65536"))
+
+# Streams are never buffered to be compressed
+EXCLUDED_CONTENT_TYPES = ("text/event-stream",)
+
+
+class Compressor:
+    """
+    Picks a content coding for a client and compresses bodies with it
+
+    Brotli is preferred when the brotli package is installed, gzip
+    otherwise, unless the client's Accept-Encoding q-values say different.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = COMPRESSION_ENABLED,
+        min_size: int = COMPRESSION_MIN_SIZE,
+        gzip_level: int = GZIP_LEVEL,
+        brotli_level: int = BROTLI_LEVEL,
+        threadpool_min_size: int = COMPRESSION_THREADPOOL_MIN_SIZE
+    ):
+        self.enabled = enabled
+        self.min_size = min_size
+        self.threadpool_min_size = threadpool_min_size
+        self.gzip_level = gzip_level
+        self.brotli_level = brotli_level
+        self.compressed: Dict[str, int] = {}
+        self.reused = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._lock = threading.Lock()
+
+    @property
+    def encodings(self) -> List[str]:
+        """Supported codings, most preferred first"""
+        return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+    def choose_encoding(self, accept_encoding: Optional[str], size: int) -> Optional[str]:
+        """The coding to send a body of size bytes in, or None to send it as is"""
+        if not self.enabled or not accept_encoding or size < self.min_size:
+            return None
+        qualities = dict(parse_qualities(accept_encoding))
+        wildcard = qualities.get("*", 0.0)
+        candidates = [
+            (qualities.get(encoding, wildcard), encoding)
+            for encoding in self.encodings
+        ]
+        # max() keeps the first of equal q values, i.e. our preference
+        quality, encoding = max(candidates, key=lambda candidate: candidate[0])
+        return encoding if quality > 0 else None
+
+    def compress(self, content: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            compressed = brotli.compress(content, quality=self.brotli_level)
+        elif encoding == "gzip":
+            # mtime=0 keeps the output, and so any ETag, the same every time
+            compressed = gzip.compress(content, compresslevel=self.gzip_level, mtime=0)
+        else:
+            raise ValueError(f"Unsupported content coding: {encoding}")
+        with self._lock:
+            self.compressed[encoding] = self.compressed.get(encoding, 0) + 1
+            self.bytes_in += len(content)
+            self.bytes_out += len(compressed)
+        return compressed
+
+    async def compress_async(self, content: bytes, encoding: str) -> bytes:
+        """compress(), in the threadpool for bodies of threadpool_min_size bytes or more"""
+        if len(content) >= self.threadpool_min_size:
+            return await run_in_threadpool(self.compress, content, encoding)
+        return self.compress(content, encoding)
+
+    def record_reuse(self) -> None:
+        with self._lock:
+            self.reused += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {f"{encoding}_compressed": count for encoding, count in self.compressed.items()}
+            stats.update({
+                "reused": self.reused,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+            })
+            return stats
+
+
+compressor = Compressor()
+
+
+class CompressibleBody:
+    """
+    A serialized body together with its compressed forms
+
+    Each coding is compressed on first use and kept, so a body held in a
+    response cache is compressed once however often it is served.
+    """
+
+    def __init__(self, content: bytes):
+        self.content = content
+        self._encoded: Dict[str, bytes] = {}
+
+    async def encode(self, encoding: str) -> bytes:
+        encoded = self._encoded.get(encoding)
+        if encoded is None:
+            encoded = self._encoded[encoding] = await compressor.compress_async(self.content, encoding)
+        else:
+            compressor.record_reuse()
+        return encoded
+
+
+async def compressed_response(
+    request: Request,
+    body: CompressibleBody,
+    media_type: str,
+    status_code: int = status.HTTP_200_OK
+) -> Response:
+    """
+    Send a body in the client's preferred coding, reusing earlier compressions
+    """
+    encoding = compressor.choose_encoding(request.headers.get("accept-encoding"), len(body.content))
+    if encoding is None:
+        response = Response(content=body.content, status_code=status_code, media_type=media_type)
+    else:
+        response = Response(content=await body.encode(encoding), status_code=status_code, media_type=media_type)
+        response.headers["Content-Encoding"] = encoding
+    if compressor.enabled and len(body.content) >= compressor.min_size:
+        response.headers.add_vary_header("Accept-Encoding")
+    return response
+
+
+def _weaken_etag(headers: MutableHeaders) -> None:
+    # The compressed bytes differ from the identity ones, so the ETag can
+    # only be a weak validator; If-None-Match compares weakly anyway
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["ETag"] = f"W/{etag}"
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware compressing response bodies of COMPRESSION_MIN_SIZE
+    bytes or more
+
+    Only bodies sent in one piece are compressed; streamed responses pass
+    through untouched. Responses that already carry a Content-Encoding,
+    such as cached schedules sent with compressed_response, are left alone
+    apart from the ETag.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not compressor.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = Headers(scope=scope).get("accept-encoding")
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                # Held back until the body shows whether to compress
+                start = message
+                return
+            if start is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            headers = MutableHeaders(scope=start)
+            body = message.get("body", b"")
+            if "content-encoding" in headers:
+                _weaken_etag(headers)
+            elif (
+                not message.get("more_body", False)
+                and len(body) >= compressor.min_size
+                and not headers.get("content-type", "").startswith(EXCLUDED_CONTENT_TYPES)
+            ):
+                headers.add_vary_header("Accept-Encoding")
+                encoding = compressor.choose_encoding(accept_encoding, len(body))
+                if encoding is not None:
+                    body = await compressor.compress_async(body, encoding)
+                    headers["Content-Encoding"] = encoding
+                    headers["Content-Length"] = str(len(body))
+                    _weaken_etag(headers)
+                    message = {**message, "body": body}
+            await send(start)
+            start = None
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,43 @@
+import hashlib
+import os
+from typing import Optional
+
+from fastapi import Request, Response, status
+
+# Cache-Control sent with each endpoint's responses, including 304s
+CLASSES_CACHE_CONTROL = os.getenv("CLASSES_CACHE_CONTROL", "public, no-cache")
+BOOKINGS_CACHE_CONTROL = os.getenv("BOOKINGS_CACHE_CONTROL", "private, no-cache")
+
+
+def make_etag(*parts) -> str:
+    """
+    Strong ETag for a response determined by parts
+
+    parts must pin down the response bytes: the data fingerprint plus
+    every query parameter that shapes the output.
+    """
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match already names this ETag"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+def set_cache_headers(response: Response, etag: Optional[str], cache_control: str) -> Response:
+    if etag:
+        response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return set_cache_headers(Response(status_code=status.HTTP_304_NOT_MODIFIED), etag, cache_control)
@@ -0,0 +1,236 @@
+import hashlib
+import logging
+from abc import ABC, abstractmethod
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional, Tuple
+
+import orjson
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+
+from ..database import SessionLocal
+from ..models import IdempotencyRecord
+from .cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# "memory" keeps keys per process; "database" shares them between workers
+IDEMPOTENCY_BACKEND = os.getenv("IDEMPOTENCY_BACKEND", "memory")
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+# How long a claim by a request that never finished blocks its key
+IDEMPOTENCY_CLAIM_TIMEOUT = float(os.getenv("IDEMPOTENCY_CLAIM_TIMEOUT", "30"))
+MAX_KEY_LENGTH = 255
+
+# A stored response: (status_code, body)
+StoredResponse = Tuple[int, bytes]
+
+
+class IdempotencyError(Exception):
+    """Base class for reasons an Idempotency-Key cannot be used"""
+
+
+class IdempotencyKeyInProgressError(IdempotencyError):
+    """A request with the same key has not finished yet"""
+
+
+class IdempotencyKeyReusedError(IdempotencyError):
+    """The key was already used with a different request body"""
+
+
+def request_fingerprint(payload: dict) -> str:
+    """Hash of a request body, to tell a retry from a reused key"""
+    return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+class IdempotencyStore(ABC):
+    """
+    Responses stored by Idempotency-Key, with replay counters
+
+    begin() claims a key and returns None, or returns the stored response
+    to replay. The caller then either complete()s the key with its response
+    or release()s it so the request can be retried.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.replays = 0
+        self.in_progress = 0
+        self.reused = 0
+        self._counter_lock = threading.Lock()
+
+    def begin(self, key: str, fingerprint: str) -> Optional[StoredResponse]:
+        with self._counter_lock:
+            self.requests += 1
+        try:
+            stored = self._claim(key, fingerprint)
+        except IdempotencyKeyInProgressError:
+            with self._counter_lock:
+                self.in_progress += 1
+            raise
+        except IdempotencyKeyReusedError:
+            with self._counter_lock:
+                self.reused += 1
+            raise
+        if stored is not None:
+            with self._counter_lock:
+                self.replays += 1
+            logger.info(f"Replaying stored response for Idempotency-Key {key}")
+        return stored
+
+    @abstractmethod
+    def complete(self, key: str, fingerprint: str, status_code: int, body: bytes) -> None:
+        """Store the response for a claimed key"""
+
+    @abstractmethod
+    def release(self, key: str) -> None:
+        """Give up a claim without storing a response"""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Forget every key"""
+
+    @abstractmethod
+    def _claim(self, key: str, fingerprint: str) -> Optional[StoredResponse]:
+        """Claim the key and return None, or return its stored response"""
+
+    def stats(self) -> dict:
+        with self._counter_lock:
+            return {
+                "requests": self.requests,
+                "replays": self.replays,
+                "in_progress": self.in_progress,
+                "reused": self.reused,
+                "replay_rate": self.replays / self.requests if self.requests else 0.0,
+            }
+
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    """Keys held in this process only, evicted by TTL and LRU"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        super().__init__()
+        self._responses = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self._claimed = set()
+        self._lock = threading.Lock()
+
+    def _claim(self, key: str, fingerprint: str) -> Optional[StoredResponse]:
+        with self._lock:
+            entry = self._responses.get(key)
+            if entry is not None:
+                stored_fingerprint, status_code, body = entry
+                if stored_fingerprint != fingerprint:
+                    raise IdempotencyKeyReusedError("Idempotency-Key was already used with a different request")
+                return status_code, body
+            if key in self._claimed:
+                raise IdempotencyKeyInProgressError("A request with this Idempotency-Key is still in progress")
+            self._claimed.add(key)
+            return None
+
+    def complete(self, key: str, fingerprint: str, status_code: int, body: bytes) -> None:
+        with self._lock:
+            self._responses.set(key, (fingerprint, status_code, body))
+            self._claimed.discard(key)
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._claimed.discard(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._responses.clear()
+            self._claimed.clear()
+
+
+class DatabaseIdempotencyStore(IdempotencyStore):
+    """
+    Keys held in the idempotency_keys table, shared by every worker
+
+    A claim is an INSERT, so the primary key decides which of two
+    concurrent requests goes ahead. Each call uses its own short
+    transaction, separate from the booking's.
+    """
+
+    # Expired rows are purged in bulk once every this many claims
+    PURGE_EVERY = 1000
+
+    def __init__(self, session_factory: Callable, ttl_seconds: float, claim_timeout: float):
+        super().__init__()
+        self.session_factory = session_factory
+        self.ttl_seconds = ttl_seconds
+        self.claim_timeout = claim_timeout
+        self._claims = 0
+        # Claims come from threadpool threads
+        self._claims_lock = threading.Lock()
+
+    def _claim(self, key: str, fingerprint: str) -> Optional[StoredResponse]:
+        now = datetime.now(timezone.utc)
+        with self._claims_lock:
+            self._claims += 1
+            purge = self._claims % self.PURGE_EVERY == 0
+        with self.session_factory() as db:
+            expired = IdempotencyRecord.expires_at <= now
+            if purge:
+                db.execute(delete(IdempotencyRecord).where(expired))
+            else:
+                db.execute(delete(IdempotencyRecord).where(IdempotencyRecord.key == key, expired))
+            db.add(IdempotencyRecord(
+                key=key,
+                fingerprint=fingerprint,
+                created_at=now,
+                expires_at=now + timedelta(seconds=self.claim_timeout)
+            ))
+            try:
+                db.commit()
+                return None
+            except IntegrityError:
+                db.rollback()
+
+            record = db.get(IdempotencyRecord, key)
+            if record is None:
+                # The holder released it in between; let the client retry
+                raise IdempotencyKeyInProgressError("A request with this Idempotency-Key is still in progress")
+            if record.fingerprint != fingerprint:
+                raise IdempotencyKeyReusedError("Idempotency-Key was already used with a different request")
+            if record.status_code is None:
+                raise IdempotencyKeyInProgressError("A request with this Idempotency-Key is still in progress")
+            return record.status_code, record.body
+
+    def complete(self, key: str, fingerprint: str, status_code: int, body: bytes) -> None:
+        with self.session_factory() as db:
+            db.execute(
+                update(IdempotencyRecord)
+                .where(IdempotencyRecord.key == key)
+                .values(
+                    status_code=status_code,
+                    body=body,
+                    expires_at=datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+                )
+            )
+            db.commit()
+
+    def release(self, key: str) -> None:
+        with self.session_factory() as db:
+            db.execute(
+                delete(IdempotencyRecord)
+                .where(IdempotencyRecord.key == key, IdempotencyRecord.status_code.is_(None))
+            )
+            db.commit()
+
+    def clear(self) -> None:
+        with self.session_factory() as db:
+            db.execute(delete(IdempotencyRecord))
+            db.commit()
+
+
+def make_idempotency_store(backend: str = IDEMPOTENCY_BACKEND) -> IdempotencyStore:
+    if backend == "database":
+        return DatabaseIdempotencyStore(SessionLocal, IDEMPOTENCY_TTL, IDEMPOTENCY_CLAIM_TIMEOUT)
+    if backend != "memory":
+        raise ValueError(f"Unknown IDEMPOTENCY_BACKEND: {backend}")
+    return MemoryIdempotencyStore(IDEMPOTENCY_MAX_ENTRIES, IDEMPOTENCY_TTL)
+
+
+idempotency_store = make_idempotency_store()
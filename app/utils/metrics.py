@@ -0,0 +1,261 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+# A sample: (labels, value)
+Sample = Tuple[Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic count per label combination"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, dict(zip(self.labelnames, labels)), value) for labels, value in items]
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label combination"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            items = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        samples = []
+        for labels, counts, total in items:
+            base = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", {**base, "le": _format_value(bound)}, cumulative))
+            samples.append((f"{self.name}_sum", base, total))
+            samples.append((f"{self.name}_count", base, cumulative))
+        return samples
+
+
+class GaugeCollector:
+    """Gauges read from a callback at scrape time, e.g. a cache's stats()"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, collect: Callable[[], Iterable[Sample]]):
+        self.name = name
+        self.documentation = documentation
+        self.collect = collect
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        return [(self.name, labels, value) for labels, value in self.collect()]
+
+
+class Registry:
+    """Metrics rendered together in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by method, route and status", ("method", "route", "status")
+))
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by method, route and status", ("method", "route", "status")
+))
+db_query_duration = registry.register(Histogram(
+    "db_query_duration_seconds", "SQL statement latency by statement type", ("operation",), QUERY_BUCKETS
+))
+db_queries_per_request = registry.register(Histogram(
+    "db_queries_per_request", "SQL statements executed per HTTP request", ("route",), COUNT_BUCKETS
+))
+db_pool_checkout_wait = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", (), QUERY_BUCKETS
+))
+booking_outcomes = registry.register(Counter(
+    "booking_outcomes_total", "POST /bookings/book results by outcome", ("outcome",)
+))
+admission_rejections = registry.register(Counter(
+    "admission_rejections_total", "Booking requests turned away with 429 or 503, by route and reason", ("route", "reason")
+))
+
+
+def register_stats(name: str, documentation: str, stats: Callable[[], dict], labels: Optional[Dict[str, str]] = None) -> None:
+    """
+    Export every numeric field of a stats() dict as a gauge
+
+    Fields become the "field" label, so LRUCache.stats() exports as
+    name{field="hits"}, name{field="misses"} and so on.
+    """
+    def collect():
+        return [
+            ({**(labels or {}), "field": field}, value)
+            for field, value in stats().items()
+            if isinstance(value, (int, float))
+        ]
+    registry.register(GaugeCollector(name, documentation, collect))
+
+
+# Statements run while handling a request, counted by the middleware
+_request_queries: ContextVar[Optional[List[int]]] = ContextVar("request_queries", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement else "UNKNOWN"
+    db_query_duration.observe(elapsed, operation)
+    queries = _request_queries.get()
+    if queries is not None:
+        queries[0] += 1
+
+
+def _handle_error(exception_context):
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def _time_pool_checkout(pool) -> None:
+    connect = pool.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            db_pool_checkout_wait.observe(time.perf_counter() - started)
+
+    pool.connect = timed_connect
+
+
+def instrument_engine(sync_engine) -> None:
+    """Time every statement and pool checkout of an engine"""
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+    _time_pool_checkout(sync_engine.pool)
+    # dispose() replaces the pool, so the new one needs timing too
+    event.listen(sync_engine, "engine_disposed", lambda engine: _time_pool_checkout(engine.pool))
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware counting and timing requests per route and status
+
+    Requests are labelled with the route template (/bookings/{booking_id}/cancel),
+    not the raw path, so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        queries = [0]
+        token = _request_queries.set(queries)
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_queries.reset(token)
+            route = scope.get("route")
+            route_label = getattr(route, "path", None) or "unmatched"
+            status_label = str(status_code)
+            http_requests.inc(scope["method"], route_label, status_label)
+            http_request_duration.observe(elapsed, scope["method"], route_label, status_label)
+            db_queries_per_request.observe(queries[0], route_label)
@@ -0,0 +1,167 @@
+import hashlib
+import os
+import threading
+from datetime import datetime
+from typing import List
+
+from .cache import LRUCache
+from .timezone_utils import as_utc
+
+NEGATIVE_CACHE_ENABLED = os.getenv("NEGATIVE_CACHE_ENABLED", "true").lower() == "true"
+# Another worker may free a spot without this one hearing of it, so a
+# sold-out mark is only trusted this long
+SOLD_OUT_CACHE_TTL = float(os.getenv("SOLD_OUT_CACHE_TTL", "2"))
+# 8 Mi bits is 1 MiB, holding ~840k bookings at under 1% false positives
+BOOKING_FILTER_BITS = int(os.getenv("BOOKING_FILTER_BITS", str(8 * 1024 * 1024)))
+BOOKING_FILTER_HASHES = int(os.getenv("BOOKING_FILTER_HASHES", "7"))
+
+
+class BloomFilter:
+    """
+    Set membership in a fixed bit array: no false negatives, a small rate
+    of false positives
+
+    Entries cannot be removed, so once it holds more than a tenth of its
+    bits in entries, where false positives pass 1% with 7 hashes, it starts
+    over empty.
+    """
+
+    def __init__(self, bits: int, hashes: int):
+        self.bits = bits
+        self.hashes = hashes
+        self.capacity = bits // 10
+        self.entries = 0
+        self.resets = 0
+        self._array = bytearray((bits + 7) // 8)
+        self._lock = threading.Lock()
+
+    def _positions(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        # Double hashing: the k positions are h1 + i * h2
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, key: str) -> None:
+        positions = self._positions(key)
+        with self._lock:
+            if self.entries >= self.capacity:
+                self._array = bytearray(len(self._array))
+                self.entries = 0
+                self.resets += 1
+            for position in positions:
+                self._array[position >> 3] |= 1 << (position & 7)
+            self.entries += 1
+
+    def __contains__(self, key: str) -> bool:
+        array = self._array
+        return all(array[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._array = bytearray(len(self._array))
+            self.entries = 0
+
+
+class NegativeCache:
+    """
+    What this worker knows about bookings that cannot succeed
+
+    Holds class start times, classes found sold out and a Bloom filter of
+    the (class, email) pairs with a confirmed booking. A started class, or
+    a sold-out one the client has no booking for, can then be rejected
+    without SQL, and a duplicate only needs one read to confirm. Anything
+    the cache does not know falls through to the database as before.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = NEGATIVE_CACHE_ENABLED,
+        sold_out_ttl: float = SOLD_OUT_CACHE_TTL,
+        filter_bits: int = BOOKING_FILTER_BITS,
+        filter_hashes: int = BOOKING_FILTER_HASHES
+    ):
+        self.enabled = enabled
+        # Start times are refreshed hourly in case a class is rescheduled
+        self._start_times = LRUCache(max_entries=100_000, ttl_seconds=3600)
+        self._sold_out = LRUCache(max_entries=100_000, ttl_seconds=sold_out_ttl)
+        self._bookings = BloomFilter(filter_bits, filter_hashes)
+        self.started_rejections = 0
+        self.sold_out_rejections = 0
+        self.duplicates_confirmed = 0
+        self.false_positives = 0
+
+    @staticmethod
+    def _booking_key(class_id: int, email: str) -> str:
+        return f"{class_id}:{email}"
+
+    def note_class(self, class_id: int, scheduled_at: datetime) -> None:
+        self._start_times.set(class_id, as_utc(scheduled_at))
+
+    def mark_sold_out(self, class_id: int) -> None:
+        self._sold_out.set(class_id, True)
+
+    def reopen(self, class_id: int) -> None:
+        """A spot in the class was freed"""
+        self._sold_out.delete(class_id)
+
+    def has_started(self, class_id: int, now: datetime) -> bool:
+        if not self.enabled:
+            return False
+        scheduled_at = self._start_times.get(class_id)
+        started = scheduled_at is not None and scheduled_at <= now
+        if started:
+            self.started_rejections += 1
+        return started
+
+    def is_sold_out(self, class_id: int) -> bool:
+        if not self.enabled:
+            return False
+        sold_out = bool(self._sold_out.get(class_id))
+        if sold_out:
+            self.sold_out_rejections += 1
+        return sold_out
+
+    def note_booking(self, class_id: int, email: str) -> None:
+        self._bookings.add(self._booking_key(class_id, email))
+
+    def may_have_booking(self, class_id: int, email: str) -> bool:
+        """
+        False when this worker neither made nor loaded a confirmed booking
+        for the pair; bookings made by other workers since are not known
+        """
+        if not self.enabled:
+            return True
+        return self._booking_key(class_id, email) in self._bookings
+
+    def record_duplicate_check(self, found: bool) -> None:
+        if found:
+            self.duplicates_confirmed += 1
+        else:
+            self.false_positives += 1
+
+    def load(self, start_times, bookings) -> None:
+        """Seed the cache from (class_id, scheduled_at) and (class_id, email) rows"""
+        for class_id, scheduled_at in start_times:
+            self.note_class(class_id, scheduled_at)
+        for class_id, email in bookings:
+            self.note_booking(class_id, email)
+
+    def clear(self) -> None:
+        self._start_times.clear()
+        self._sold_out.clear()
+        self._bookings.clear()
+
+    def stats(self) -> dict:
+        return {
+            "started_rejections": self.started_rejections,
+            "sold_out_rejections": self.sold_out_rejections,
+            "duplicates_confirmed": self.duplicates_confirmed,
+            "false_positives": self.false_positives,
+            "known_classes": self._start_times.stats()["entries"],
+            "filter_entries": self._bookings.entries,
+            "filter_resets": self._bookings.resets,
+        }
+
+
+negative_cache = NegativeCache()
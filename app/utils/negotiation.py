@@ -0,0 +1,74 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+def parse_qualities(header: str) -> List[Tuple[str, float]]:
+    """
+    (value, q) pairs of an Accept-style header, in the header's order
+
+    Values are lowercased; q defaults to 1, and an unreadable q counts as 0.
+    """
+    pairs: List[Tuple[str, float]] = []
+    for item in header.split(","):
+        value, *params = (part.strip() for part in item.split(";"))
+        if not value:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, number = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        pairs.append((value.lower(), quality))
+    return pairs
+
+
+def parse_accept(accept: str) -> List[str]:
+    """
+    Media ranges of an Accept header, most preferred first
+
+    Ranges with q=0 are dropped; equal q values keep the header's order.
+    """
+    ranges = [
+        (-quality, position, media_type)
+        for position, (media_type, quality) in enumerate(parse_qualities(accept))
+        if quality > 0
+    ]
+    return [media_type for _, _, media_type in sorted(ranges)]
+
+
+def negotiate_format(
+    formats: Dict[str, Sequence[str]],
+    requested: Optional[str],
+    accept: Optional[str]
+) -> str:
+    """
+    Pick a response format by name, from formats: name -> media types
+
+    An explicit `requested` name wins over the Accept header; an unknown
+    name raises ValueError. Otherwise the most preferred accepted media
+    type decides, a wildcard or missing header giving the first format.
+    When nothing accepted can be produced the first format is returned
+    too, as clients sending e.g. Accept: text/plain got JSON before
+    formats were negotiated, rather than a 406.
+    """
+    if requested:
+        if requested not in formats:
+            raise ValueError(f"Invalid format: {requested}, expected one of {', '.join(formats)}")
+        return requested
+    default = next(iter(formats))
+    if not accept or not accept.strip():
+        return default
+    for media_range in parse_accept(accept):
+        if media_range in ("*/*", "*"):
+            return default
+        for name, media_types in formats.items():
+            if media_range in media_types:
+                return name
+            # "application/*" matches the first format of that type
+            if media_range.endswith("/*") and any(
+                media_type.startswith(media_range[:-1]) for media_type in media_types
+            ):
+                return name
+    return default
@@ -0,0 +1,41 @@
+import base64
+import os
+from datetime import datetime
+from typing import Optional, Tuple
+
+import orjson
+from fastapi import Request, Response
+
+# Upper bound for the limit query parameter
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+
+
+def encode_cursor(sort_value: datetime, row_id: int) -> str:
+    """
+    Opaque token for the position just after a row
+    """
+    raw = orjson.dumps([sort_value.isoformat(), row_id])
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Position encoded by encode_cursor; raises ValueError for a bad token
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = orjson.loads(raw)
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def set_next_page_headers(response: Response, request: Request, next_cursor: Optional[str]) -> Response:
+    """
+    Advertise the next page through X-Next-Cursor and a Link header
+    """
+    if next_cursor:
+        next_url = request.url.include_query_params(cursor=next_cursor)
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    return response
@@ -0,0 +1,234 @@
+import logging
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+# Off by default: every statement of every request is kept in memory
+SQL_PROFILING = os.getenv("SQL_PROFILING", "false").lower() == "true"
+# A request is logged as slow past either threshold
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "200"))
+SLOW_REQUEST_QUERIES = int(os.getenv("SLOW_REQUEST_QUERIES", "10"))
+# The same statement this many times in one request is flagged
+REPEATED_QUERY_THRESHOLD = int(os.getenv("REPEATED_QUERY_THRESHOLD", "3"))
+SQL_PROFILING_EXPLAIN = os.getenv("SQL_PROFILING_EXPLAIN", "true").lower() == "true"
+# Parameters carry client emails and names, so slow-request logs leave
+# them out unless this is set
+SQL_PROFILING_LOG_PARAMETERS = os.getenv("SQL_PROFILING_LOG_PARAMETERS", "false").lower() == "true"
+
+
+class StatementProfile:
+    """Statements run in one unit of work, with their parameters and timings"""
+
+    def __init__(self):
+        # (statement, parameters, seconds)
+        self.statements: List[Tuple[str, object, float]] = []
+        self.engine = None
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(elapsed for _, _, elapsed in self.statements)
+
+    def repeated(self, threshold: int = REPEATED_QUERY_THRESHOLD) -> List[Tuple[str, int, int]]:
+        """
+        Statements run at least threshold times
+
+        Returns (statement, runs, distinct parameter sets). One parameter
+        set means the exact same query was repeated; many usually mean a
+        query per row, the N+1 pattern.
+        """
+        runs = Counter(statement for statement, _, _ in self.statements)
+        repeated = []
+        for statement, count in runs.items():
+            if count < threshold:
+                continue
+            distinct = {repr(parameters) for s, parameters, _ in self.statements if s == statement}
+            repeated.append((statement, count, len(distinct)))
+        return repeated
+
+
+_profile: ContextVar[Optional[StatementProfile]] = ContextVar("statement_profile", default=None)
+# Async engines by their sync facade, which can only run queries from
+# inside the async engine's own calls
+_async_engines: Dict[object, AsyncEngine] = {}
+
+
+@contextmanager
+def record_statements():
+    """Collect the statements run inside the block, on any profiled engine"""
+    profile = StatementProfile()
+    token = _profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _profile.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _profile.get() is not None:
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _profile.get()
+    if profile is None:
+        return
+    elapsed = time.perf_counter() - conn.info["profile_started"].pop()
+    profile.statements.append((statement, parameters, elapsed))
+    profile.engine = conn.engine
+
+
+def _handle_error(exception_context):
+    started = exception_context.connection.info.get("profile_started") if exception_context.connection else None
+    if started and _profile.get() is not None:
+        started.pop()
+
+
+def profile_engine(db_engine) -> None:
+    """Record the statements of an engine, sync or async, inside record_statements()"""
+    if isinstance(db_engine, AsyncEngine):
+        _async_engines[db_engine.sync_engine] = db_engine
+        db_engine = db_engine.sync_engine
+    event.listen(db_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(db_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(db_engine, "handle_error", _handle_error)
+
+
+def _explain_statement(dialect_name: str, statement: str) -> str:
+    prefix = "EXPLAIN QUERY PLAN " if dialect_name == "sqlite" else "EXPLAIN "
+    return prefix + statement
+
+
+def _format_plan(rows) -> str:
+    return "\n".join("    " + " | ".join(str(column) for column in row) for row in rows)
+
+
+def explain(sync_engine, statement: str, parameters) -> str:
+    """The query plan of a SELECT, as reported by the database"""
+    with sync_engine.connect() as conn:
+        rows = conn.exec_driver_sql(_explain_statement(sync_engine.dialect.name, statement), parameters).fetchall()
+    return _format_plan(rows)
+
+
+async def explain_async(async_engine: AsyncEngine, statement: str, parameters) -> str:
+    """explain(), through an async engine"""
+    async with async_engine.connect() as conn:
+        result = await conn.exec_driver_sql(_explain_statement(async_engine.dialect.name, statement), parameters)
+        rows = result.fetchall()
+    return _format_plan(rows)
+
+
+def _selects(profile: StatementProfile) -> List[Tuple[str, object]]:
+    """The first run of each SELECT in a profile, with its parameters"""
+    selects: Dict[str, object] = {}
+    for statement, parameters, _ in profile.statements:
+        if statement.lstrip().upper().startswith("SELECT"):
+            selects.setdefault(statement, parameters)
+    return list(selects.items())
+
+
+def explain_plans(profile: StatementProfile) -> Dict[str, str]:
+    """The plan of each SELECT in a profile, by statement"""
+    plans = {}
+    for statement, parameters in _selects(profile):
+        try:
+            plans[statement] = explain(profile.engine, statement, parameters)
+        except Exception as e:
+            plans[statement] = f"    EXPLAIN failed: {e}"
+    return plans
+
+
+async def explain_plans_async(async_engine: AsyncEngine, profile: StatementProfile) -> Dict[str, str]:
+    """explain_plans(), for a profile recorded on an async engine"""
+    plans = {}
+    for statement, parameters in _selects(profile):
+        try:
+            plans[statement] = await explain_async(async_engine, statement, parameters)
+        except Exception as e:
+            plans[statement] = f"    EXPLAIN failed: {e}"
+    return plans
+
+
+def is_slow(profile: StatementProfile, elapsed: float) -> bool:
+    return elapsed * 1000 >= SLOW_REQUEST_MS or profile.count >= SLOW_REQUEST_QUERIES
+
+
+def _redacted(parameters) -> str:
+    """The shape of a statement's parameters, without their values"""
+    if not parameters:
+        return "()"
+    if isinstance(parameters, list):
+        return f"<{len(parameters)} parameter sets, redacted>"
+    return f"<{len(parameters)} redacted>"
+
+
+def report(label: str, profile: StatementProfile, elapsed: float, plans: Optional[Dict[str, str]] = None) -> None:
+    """
+    Log a slow unit of work with its statements, plans and repeated queries
+
+    plans, by statement, are looked up here when not given; async engines
+    cannot run EXPLAIN from this thread, so their plans are passed in.
+    """
+    for statement, count, distinct in profile.repeated():
+        kind = "identical query" if distinct == 1 else f"query with {distinct} parameter sets, likely N+1"
+        logger.warning(f"{label}: {kind} run {count} times: {statement}")
+
+    if not is_slow(profile, elapsed):
+        return
+
+    if plans is None:
+        plans = explain_plans(profile) if SQL_PROFILING_EXPLAIN and profile.engine is not None else {}
+    lines = [
+        f"Slow request {label}: {elapsed * 1000:.1f} ms, {profile.count} statements "
+        f"taking {profile.total_seconds * 1000:.1f} ms"
+    ]
+    explained = set()
+    for statement, parameters, seconds in profile.statements:
+        shown = repr(parameters) if SQL_PROFILING_LOG_PARAMETERS else _redacted(parameters)
+        lines.append(f"  {seconds * 1000:8.2f} ms  {statement}  {shown}")
+        if statement in plans and statement not in explained:
+            explained.add(statement)
+            lines.append(plans[statement])
+    logger.warning("\n".join(lines))
+
+
+class SQLProfilingMiddleware:
+    """
+    Pure ASGI middleware profiling the statements of every request
+
+    Reporting happens after the response has been sent. Query plans of
+    statements run on an async engine are fetched through that engine on
+    the event loop first.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        with record_statements() as profile:
+            await self.app(scope, receive, send)
+        elapsed = time.perf_counter() - started
+
+        label = f"{scope['method']} {scope['path']}"
+        plans = None
+        async_engine = _async_engines.get(profile.engine)
+        if SQL_PROFILING_EXPLAIN and async_engine is not None and is_slow(profile, elapsed):
+            plans = await explain_plans_async(async_engine, profile)
+        await run_in_threadpool(report, label, profile, elapsed, plans)
@@ -0,0 +1,183 @@
+from datetime import datetime
+from typing import Dict, Iterable, List
+
+import msgpack
+import orjson
+from fastapi import Response, status
+
+# orjson writes naive datetimes as "YYYY-MM-DDTHH:MM:SS", which is exactly
+# what the serialize_dt field serializers in app/schemas.py produce
+JSON_OPTIONS = orjson.OPT_OMIT_MICROSECONDS
+
+
+def _wall_time(dt: datetime) -> datetime:
+    """Drop the offset, keeping local wall-clock time, like serialize_dt"""
+    return dt.replace(tzinfo=None)
+
+
+def _iso_wall_time(dt: datetime) -> str:
+    """Local wall-clock time as orjson writes it with JSON_OPTIONS"""
+    return _wall_time(dt).replace(microsecond=0).isoformat()
+
+
+def json_response(content: bytes, status_code: int = status.HTTP_200_OK) -> Response:
+    """
+    Send already serialized JSON, skipping response_model validation
+    """
+    return Response(content=content, status_code=status_code, media_type="application/json")
+
+
+def serialize_detail(detail) -> bytes:
+    """
+    Serialize an error detail the way FastAPI's HTTPException handler does
+    """
+    return orjson.dumps({"detail": detail})
+
+
+def serialize_fitness_classes(classes: Iterable, scheduled_times: Iterable[datetime]) -> bytes:
+    """
+    Serialize FitnessClass rows in the FitnessClassResponse format
+    """
+    return orjson.dumps([
+        {
+            "id": fitness_class.id,
+            "name": fitness_class.name,
+            "instructor": fitness_class.instructor,
+            "scheduled_at": _wall_time(scheduled_at),
+            "total_slots": fitness_class.total_slots,
+            "available_slots": fitness_class.remaining_slots,
+        }
+        for fitness_class, scheduled_at in zip(classes, scheduled_times)
+    ], option=JSON_OPTIONS)
+
+
+def serialize_fitness_classes_columnar(classes: Iterable, scheduled_times: Iterable[datetime]) -> bytes:
+    """
+    Serialize FitnessClass rows as one array per FitnessClassResponse field
+
+    {"id": [1, 2], "name": ["Yoga", "Zumba"], ...}: the i-th class is the
+    i-th element of every array, so field names are sent once, not per row.
+    """
+    classes = list(classes)
+    return orjson.dumps({
+        "id": [fitness_class.id for fitness_class in classes],
+        "name": [fitness_class.name for fitness_class in classes],
+        "instructor": [fitness_class.instructor for fitness_class in classes],
+        "scheduled_at": [_wall_time(scheduled_at) for scheduled_at in scheduled_times],
+        "total_slots": [fitness_class.total_slots for fitness_class in classes],
+        "available_slots": [fitness_class.remaining_slots for fitness_class in classes],
+    }, option=JSON_OPTIONS)
+
+
+def serialize_fitness_classes_msgpack(classes: Iterable, scheduled_times: Iterable[datetime]) -> bytes:
+    """
+    Serialize FitnessClass rows in the FitnessClassResponse format as
+    MessagePack, with scheduled_at as the same string the JSON carries
+    """
+    return msgpack.packb([
+        {
+            "id": fitness_class.id,
+            "name": fitness_class.name,
+            "instructor": fitness_class.instructor,
+            "scheduled_at": _iso_wall_time(scheduled_at),
+            "total_slots": fitness_class.total_slots,
+            "available_slots": fitness_class.remaining_slots,
+        }
+        for fitness_class, scheduled_at in zip(classes, scheduled_times)
+    ])
+
+
+# GET /classes response formats: name -> (media types, serializer). The
+# first media type is sent as Content-Type, the others are accepted too
+FITNESS_CLASS_FORMATS = {
+    "json": (("application/json",), serialize_fitness_classes),
+    "columnar": (("application/vnd.fitness.columnar+json",), serialize_fitness_classes_columnar),
+    "msgpack": (
+        ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack"),
+        serialize_fitness_classes_msgpack
+    ),
+}
+
+
+def serialize_availability(available_slots: Dict[int, int]) -> bytes:
+    """
+    Serialize open-spot counts by class id for the availability stream
+    """
+    return orjson.dumps([
+        {"class_id": class_id, "available_slots": slots}
+        for class_id, slots in sorted(available_slots.items())
+    ])
+
+
+def booking_to_dict(booking, scheduled_at: datetime) -> dict:
+    """
+    A Booking row in the BookingResponse format
+    """
+    return {
+        "class_id": booking.class_id,
+        "client_name": booking.client_name,
+        "client_email": booking.client_email,
+        "id": booking.id,
+        "booking_time": _wall_time(booking.booking_time),
+        "scheduled_at": _wall_time(scheduled_at),
+        "status": booking.status,
+    }
+
+
+def serialize_booking(booking, scheduled_at: datetime) -> bytes:
+    """
+    Serialize a Booking row in the BookingResponse format
+    """
+    return orjson.dumps(booking_to_dict(booking, scheduled_at), option=JSON_OPTIONS)
+
+
+def serialize_bookings_with_class(
+    bookings: List[dict],
+    scheduled_times: Iterable[datetime],
+    booking_times: Iterable[datetime]
+) -> bytes:
+    """
+    Serialize booking detail dicts in the BookingWithClassResponse format
+    """
+    return orjson.dumps([
+        {
+            "class_id": booking["class_id"],
+            "client_name": booking["client_name"],
+            "client_email": booking["client_email"],
+            "id": booking["id"],
+            "booking_time": _wall_time(booking_time),
+            "scheduled_at": _wall_time(scheduled_at),
+            "status": booking["status"],
+            "class_name": booking["class_name"],
+            "instructor": booking["instructor"],
+        }
+        for booking, scheduled_at, booking_time in zip(bookings, scheduled_times, booking_times)
+    ], option=JSON_OPTIONS)
+
+
+def serialize_cancellation(booking, scheduled_at: datetime, promoted) -> bytes:
+    """
+    Serialize cancel_booking results in the BookingCancellationResponse format
+    """
+    return orjson.dumps({
+        "booking": booking_to_dict(booking, scheduled_at),
+        "promoted_booking_id": promoted.id if promoted else None,
+    }, option=JSON_OPTIONS)
+
+
+def serialize_batch_results(mode: str, results: List[dict]) -> bytes:
+    """
+    Serialize create_bookings_batch results in the BatchBookingResponse format
+    """
+    items = []
+    for result in results:
+        item = {"class_id": result["class_id"], "status": result["status"]}
+        if result["status"] == "confirmed":
+            item["detail"] = None
+            item["booking"] = booking_to_dict(result["booking"], result["scheduled_at"])
+        else:
+            item["detail"] = result["detail"]
+            item["booking"] = None
+        items.append(item)
+    booked = sum(1 for result in results if result["status"] == "confirmed")
+    return orjson.dumps({"mode": mode, "booked": booked, "results": items}, option=JSON_OPTIONS)
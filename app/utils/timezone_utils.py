@@ -1,12 +1,25 @@
 import os
 import pytz
-from datetime import datetime, timezone
+from bisect import bisect_right
+from datetime import datetime, timezone, tzinfo
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
 
 
 def get_default_timezone() -> str:
     """Get the default timezone from environment or return IST"""
     return os.getenv("DEFAULT_TIMEZONE", "Asia/Kolkata")
 
+def as_utc(dt: datetime) -> datetime:
+    """
+    Make a datetime read from the database timezone-aware UTC
+    """
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    if dt.tzinfo != timezone.utc:
+        return dt.astimezone(timezone.utc)
+    return dt
+
 def convert_utc_to_timezone(utc_datetime: datetime, target_timezone: str = None) -> datetime:
     """
     Convert UTC datetime to specified timezone
@@ -15,15 +28,63 @@ def convert_utc_to_timezone(utc_datetime: datetime, target_timezone: str = None)
         target_timezone = get_default_timezone()
     
     # Ensure the datetime is timezone-aware (UTC)
-    if utc_datetime.tzinfo is None:
-        utc_datetime = utc_datetime.replace(tzinfo=timezone.utc)
-    elif utc_datetime.tzinfo != timezone.utc:
-        utc_datetime = utc_datetime.astimezone(timezone.utc)
+    utc_datetime = as_utc(utc_datetime)
     
     # Convert to target timezone
-    target_tz = pytz.timezone(target_timezone)
+    target_tz = get_timezone(target_timezone)
     return utc_datetime.astimezone(target_tz)
 
+def _transition_table(tz: tzinfo) -> Optional[Tuple[list, list, dict]]:
+    """
+    The UTC transition times, (offset, dst, name) infos and tzinfo per info
+    of a pytz zone, or None to convert row by row
+
+    These are pytz internals, present on DST-aware zones only and checked
+    against the pytz pinned in requirements.txt. Fixed offset zones, and
+    any pytz that no longer has them, take the row by row path.
+    """
+    transitions = getattr(tz, "_utc_transition_times", None)
+    transition_infos = getattr(tz, "_transition_info", None)
+    tzinfos = getattr(tz, "_tzinfos", None)
+    if not transitions or transition_infos is None or tzinfos is None:
+        return None
+    if len(transition_infos) != len(transitions):
+        return None
+    return transitions, transition_infos, tzinfos
+
+def convert_utc_to_timezone_batch(utc_datetimes: Iterable[datetime], target_timezone: str = None) -> List[datetime]:
+    """
+    Convert many UTC datetimes to one timezone in a single call
+
+    Consecutive datetimes that fall between the same two UTC offset
+    transitions share one tzinfo, so the transition table is only searched
+    when a datetime leaves the current interval. For sorted input, such as
+    a schedule, that is once per transition crossed rather than once per row.
+    """
+    if target_timezone is None:
+        target_timezone = get_default_timezone()
+    target_tz = get_timezone(target_timezone)
+
+    table = _transition_table(target_tz)
+    if table is None:
+        return [as_utc(dt).astimezone(target_tz) for dt in utc_datetimes]
+    transitions, transition_infos, tzinfos = table
+
+    converted = []
+    interval_start = interval_end = None
+    for dt in utc_datetimes:
+        # Database rows are usually already naive UTC
+        naive_utc = dt if dt.tzinfo is None else as_utc(dt).replace(tzinfo=None)
+        if interval_start is None or not interval_start <= naive_utc < interval_end:
+            index = max(0, bisect_right(transitions, naive_utc) - 1)
+            interval_start = transitions[index]
+            interval_end = transitions[index + 1] if index + 1 < len(transitions) else datetime.max
+            transition_info = transition_infos[index]
+            offset = transition_info[0]
+            local_tz = tzinfos[transition_info]
+        converted.append((naive_utc + offset).replace(tzinfo=local_tz))
+    return converted
+
 def convert_timezone_to_utc(local_datetime: datetime, source_timezone: str = None) -> datetime:
     """
     Convert local datetime to UTC
@@ -33,18 +94,36 @@ def convert_timezone_to_utc(local_datetime: datetime, source_timezone: str = Non
     
     # If datetime is naive, localize it to source timezone
     if local_datetime.tzinfo is None:
-        source_tz = pytz.timezone(source_timezone)
+        source_tz = get_timezone(source_timezone)
         local_datetime = source_tz.localize(local_datetime)
     
     # Convert to UTC
     return local_datetime.astimezone(timezone.utc)
 
+# pytz ignores case, so names are looked up case-insensitively here too;
+# keying the zone cache on the canonical name bounds it by the zone list
+_canonical_names = {name.lower(): name for name in pytz.all_timezones}
+
+def get_timezone(timezone_str: str) -> tzinfo:
+    """
+    Get the tzinfo for a timezone name, loading each zone only once
+    """
+    canonical = _canonical_names.get(timezone_str.lower()) if isinstance(timezone_str, str) else None
+    if canonical is None:
+        raise pytz.UnknownTimeZoneError(timezone_str)
+    return _load_timezone(canonical)
+
+@lru_cache(maxsize=None)
+def _load_timezone(name: str) -> tzinfo:
+    return pytz.timezone(name)
+
+@lru_cache(maxsize=1024)
 def is_valid_timezone(timezone_str: str) -> bool:
     """
     Check if timezone string is valid
     """
     try:
-        pytz.timezone(timezone_str)
+        get_timezone(timezone_str)
         return True
     except pytz.UnknownTimeZoneError:
-        return False
\ No newline at end of file
+        return False
@@ -0,0 +1,180 @@
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+
+from .crud.book_class import load_negative_cache
+from .database import (
+    DB_ASYNC,
+    AsyncSessionLocal,
+    SessionLocal,
+    async_engine,
+    close_db,
+    engine,
+    replica_engines
+)
+from .initial_data_loading import initial_data_load_fitness_classes
+from .routers.classes import preload_classes
+from .utils.negative_cache import negative_cache
+from .utils.timezone_utils import convert_utc_to_timezone_batch, get_default_timezone, is_valid_timezone
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+# Connections opened per engine; empty opens the whole pool
+WARMUP_POOL_CONNECTIONS = os.getenv("WARMUP_POOL_CONNECTIONS", "")
+# Zones loaded and whose schedule is cached, besides DEFAULT_TIMEZONE
+WARMUP_TIMEZONES = [
+    name.strip()
+    for name in os.getenv("WARMUP_TIMEZONES", "UTC,Europe/London,America/New_York").split(",")
+    if name.strip()
+]
+# Phases without which the worker must not take traffic; the others only
+# make it faster
+REQUIRED_PHASES = ("initial_data_load",)
+
+
+class Readiness:
+    """Whether startup finished, and how long each phase of it took"""
+
+    def __init__(self):
+        self.ready = False
+        self.phases: Dict[str, float] = {}
+        self.failed: List[str] = []
+
+    @property
+    def required_failed(self) -> bool:
+        return any(name in self.failed for name in REQUIRED_PHASES)
+
+    def state(self) -> dict:
+        if self.ready:
+            status = "ready"
+        else:
+            status = "failed" if self.required_failed else "starting"
+        return {
+            "status": status,
+            "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()},
+            "failed": self.failed,
+        }
+
+
+readiness = Readiness()
+
+
+def _pool_connections(sync_engine) -> int:
+    if WARMUP_POOL_CONNECTIONS:
+        return int(WARMUP_POOL_CONNECTIONS)
+    size = getattr(sync_engine.pool, "size", None)
+    return size() if size else 1
+
+
+def open_pool_connections(sync_engine, count: int) -> int:
+    """Open count connections at once and return them to the pool"""
+    connections = []
+    try:
+        for _ in range(count):
+            connection = sync_engine.connect()
+            connections.append(connection)
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+
+async def open_async_pool_connections(async_db_engine, count: int) -> int:
+    connections = []
+    try:
+        for _ in range(count):
+            connection = await async_db_engine.connect()
+            connections.append(connection)
+            await connection.execute(text("SELECT 1"))
+    finally:
+        for connection in connections:
+            await connection.close()
+    return len(connections)
+
+
+def load_timezones(names: List[str]) -> List[str]:
+    """Load zones and run a conversion through each; returns the valid ones"""
+    loaded = [name for name in dict.fromkeys(names) if is_valid_timezone(name)]
+    now = datetime.now(timezone.utc)
+    for name in loaded:
+        convert_utc_to_timezone_batch([now], name)
+    return loaded
+
+
+async def warm_pools() -> None:
+    for sync_engine in [engine, *replica_engines]:
+        await run_in_threadpool(open_pool_connections, sync_engine, _pool_connections(sync_engine))
+    if async_engine is not None:
+        await open_async_pool_connections(async_engine, _pool_connections(async_engine.sync_engine))
+
+
+async def warm_schedule(timezones: List[str]) -> None:
+    db = (AsyncSessionLocal if DB_ASYNC else SessionLocal)()
+    try:
+        for name in timezones:
+            await preload_classes(db, name)
+    finally:
+        await close_db(db)
+
+
+def warm_negative_cache() -> None:
+    with SessionLocal() as db:
+        loaded = load_negative_cache(db)
+    logger.info(f"Negative cache loaded with {loaded} upcoming bookings")
+
+
+async def _run_phase(name: str, phase, *args) -> Any:
+    """Await phase(*args), logging its duration; failures are logged and return None"""
+    started = time.perf_counter()
+    try:
+        return await phase(*args)
+    except Exception as e:
+        readiness.failed.append(name)
+        logger.error(f"Startup phase {name} failed: {str(e)}")
+    finally:
+        readiness.phases[name] = time.perf_counter() - started
+        logger.info(f"Startup phase {name}: {readiness.phases[name] * 1000:.1f} ms")
+
+
+async def load_data() -> None:
+    """
+    Load the class data, before the server takes any request
+
+    Run from the lifespan rather than with the rest of warm-up, so that no
+    request sees a half-loaded schedule. A failure is logged and keeps
+    the worker from ever reporting ready.
+    """
+    await _run_phase("initial_data_load", run_in_threadpool, initial_data_load_fitness_classes)
+
+
+async def warm_up() -> None:
+    """
+    Get the worker ready for traffic, then flip readiness
+
+    Seeds the negative cache, then, with WARMUP_ENABLED, opens every
+    pooled connection, loads the common timezones and caches the schedule
+    in each of them. A phase that fails is logged and skipped, since
+    serving cold beats not serving at all; readiness stays off only when
+    one of REQUIRED_PHASES failed.
+    """
+    started = time.perf_counter()
+    if negative_cache.enabled:
+        await _run_phase("negative_cache", run_in_threadpool, warm_negative_cache)
+    if WARMUP_ENABLED:
+        await _run_phase("connection_pools", warm_pools)
+        timezones = await _run_phase(
+            "timezones", run_in_threadpool, load_timezones, [get_default_timezone(), *WARMUP_TIMEZONES]
+        ) or []
+        await _run_phase("schedule_cache", warm_schedule, timezones)
+    if readiness.required_failed:
+        logger.error(f"Not ready: startup phases failed: {', '.join(readiness.failed)}")
+        return
+    readiness.ready = True
+    logger.info(f"Ready after {(time.perf_counter() - started) * 1000:.1f} ms of startup")
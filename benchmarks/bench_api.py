@@ -0,0 +1,264 @@
+"""
+Throughput and latency of the API endpoints, driven in process
+
+    python -m benchmarks.bench_api --classes 500 --bookings 5000 --concurrency 32
+    python -m benchmarks.bench_api --output benchmarks/baseline.json
+    python -m benchmarks.bench_api --baseline benchmarks/baseline.json --tolerance 0.2
+
+Requests go through httpx's ASGI transport into the app from app/main.py,
+so the numbers cover routing, validation, the CRUD layer and serialization
+but not the network or a server process. Each run seeds a fresh scratch
+database (a SQLite file unless --database-url points elsewhere; use an
+empty database, the seeded rows are not removed from it).
+
+The flash-sale scenario sends many clients at one class with few spots
+and checks that exactly that many bookings were confirmed.
+
+With --baseline, any scenario whose req/s dropped or whose p95 grew by
+more than --tolerance is flagged and the exit status is 1.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Tuple
+
+import httpx
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, configure_engine, engine_options, get_session
+from app.main import app
+from app.models import Booking, FitnessClass
+from app.utils import admission
+
+DEFAULT_DATABASE_PATH = "./bench_api.db"
+
+
+def remove_scratch_database() -> None:
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(DEFAULT_DATABASE_PATH + suffix):
+            os.remove(DEFAULT_DATABASE_PATH + suffix)
+
+
+def seed(session_factory, classes: int, bookings: int, clients: int, slots: int) -> List[int]:
+    """Insert classes spread over the next 30 days and bookings spread over them"""
+    if bookings > classes * clients:
+        raise SystemExit("--bookings cannot exceed --classes x --clients")
+
+    now = datetime.now(timezone.utc)
+    # Client c books classes c, c+1, ... so no client books a class twice
+    pairs = [(i % clients, (i // clients + i % clients) % classes) for i in range(bookings)]
+    booked = Counter(class_index for _, class_index in pairs)
+
+    with session_factory() as db:
+        db.execute(insert(FitnessClass), [
+            {
+                "name": f"Benchmark Class {i}",
+                "scheduled_at": now + timedelta(hours=1, minutes=i * 30 * 24 * 60 // classes),
+                "instructor": f"Instructor {i % 20}",
+                "total_slots": max(slots, booked[i]),
+                "available_slots": max(slots, booked[i]) - booked[i],
+            }
+            for i in range(classes)
+        ])
+        class_ids = list(db.scalars(
+            select(FitnessClass.id).where(FitnessClass.name.like("Benchmark Class %")).order_by(FitnessClass.id)
+        ))
+        db.execute(insert(Booking), [
+            {
+                "class_id": class_ids[class_index],
+                "client_name": f"Client {client}",
+                "client_email": f"client{client}@example.com",
+                "booking_time": now - timedelta(seconds=i),
+                "status": "confirmed",
+            }
+            for i, (client, class_index) in enumerate(pairs)
+        ])
+        db.commit()
+    return class_ids
+
+
+def add_flash_sale_class(session_factory, slots: int) -> int:
+    with session_factory() as db:
+        fitness_class = FitnessClass(
+            name="Benchmark Flash Sale",
+            scheduled_at=datetime.now(timezone.utc) + timedelta(hours=2),
+            instructor="Benchmark",
+            total_slots=slots,
+            available_slots=slots
+        )
+        db.add(fitness_class)
+        db.commit()
+        return fitness_class.id
+
+
+async def drive(
+    client: httpx.AsyncClient,
+    make_request: Callable[[int], Tuple[str, str, dict]],
+    requests: int,
+    concurrency: int
+) -> Tuple[List[float], Counter, float]:
+    """Send requests from concurrent workers; returns latencies, status counts and wall time"""
+    latencies = []
+    statuses = Counter()
+    next_index = iter(range(requests))
+
+    async def worker():
+        for i in next_index:
+            method, url, kwargs = make_request(i)
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - started
+
+
+def summarize(latencies: List[float], statuses: Counter, elapsed: float) -> dict:
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": cuts[49] * 1000,
+        "p95_ms": cuts[94] * 1000,
+        "p99_ms": cuts[98] * 1000,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+async def run(args, session_factory) -> Dict[str, dict]:
+    class_ids = seed(session_factory, args.classes, args.bookings, args.clients, args.slots)
+    flash_class_id = add_flash_sale_class(session_factory, args.flash_slots)
+    clients = min(args.clients, args.bookings) or 1
+    rng = random.Random(args.seed)
+
+    scenarios = {
+        "GET /classes": lambda i: ("GET", "/classes", {}),
+        "GET /classes?limit=20": lambda i: ("GET", "/classes", {"params": {"limit": 20}}),
+        "GET /bookings?limit=20": lambda i: ("GET", "/bookings", {"params": {
+            "email": f"client{rng.randrange(clients)}@example.com", "limit": 20
+        }}),
+        "POST /bookings/book": lambda i: ("POST", "/bookings/book", {"json": {
+            "class_id": rng.choice(class_ids),
+            "client_name": "Bench Client",
+            "client_email": f"bench{i}@example.com",
+        }}),
+        "flash sale": lambda i: ("POST", "/bookings/book", {"json": {
+            "class_id": flash_class_id,
+            "client_name": "Flash Client",
+            "client_email": f"flash{i}@example.com",
+        }}),
+    }
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, make_request in scenarios.items():
+            requests = args.flash_requests if name == "flash sale" else args.requests
+            latencies, statuses, elapsed = await drive(client, make_request, requests, args.concurrency)
+            results[name] = summarize(latencies, statuses, elapsed)
+
+    confirmed = results["flash sale"]["statuses"].get("201", 0)
+    if confirmed != min(args.flash_slots, args.flash_requests):
+        print(f"WARNING: flash sale confirmed {confirmed} bookings for {args.flash_slots} spots")
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """Describe every scenario that regressed against the baseline"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: {result['rps']:.0f} req/s, baseline {base['rps']:.0f}")
+        if result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95_ms']:.1f} ms, baseline {base['p95_ms']:.1f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", default=None, help=f"defaults to a fresh {DEFAULT_DATABASE_PATH}")
+    parser.add_argument("--classes", type=int, default=500)
+    parser.add_argument("--bookings", type=int, default=5000)
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--slots", type=int, default=100, help="spots per seeded class")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--flash-slots", type=int, default=50)
+    parser.add_argument("--flash-requests", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against results saved with --output")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if database_url is None:
+        remove_scratch_database()
+        database_url = f"sqlite:///{DEFAULT_DATABASE_PATH}"
+
+    options = engine_options(database_url)
+    if database_url.startswith("sqlite"):
+        options["pool_size"] = args.concurrency
+    engine = create_engine(database_url, **options)
+    configure_engine(engine)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+    def override_get_session():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_session] = override_get_session
+    # Every simulated client shares one address and most book many times
+    admission.RATE_LIMIT_ENABLED = False
+    # Per-request INFO logs would dominate the timings
+    for logger_name in ("app", "httpx"):
+        logging.getLogger(logger_name).setLevel(logging.WARNING)
+
+    print(f"{engine.url.render_as_string(hide_password=True)}: {args.classes} classes, "
+          f"{args.bookings} bookings, concurrency {args.concurrency}")
+    try:
+        results = asyncio.run(run(args, session_factory))
+    finally:
+        app.dependency_overrides.pop(get_session, None)
+        engine.dispose()
+        if args.database_url is None:
+            remove_scratch_database()
+
+    print(f"  {'scenario':<24}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  statuses")
+    for name, result in results.items():
+        print(f"  {name:<24}{result['rps']:>9.0f}{result['p50_ms']:>9.2f}"
+              f"{result['p95_ms']:>9.2f}{result['p99_ms']:>9.2f}  {result['statuses']}")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Payload size and encode/decode time of the GET /classes response formats
+
+    python -m benchmarks.bench_formats --rows 5000
+
+Serializes the same schedule as JSON objects, columnar JSON and
+MessagePack, and reports each body's size, raw and gzipped, the time to
+encode it on the server and the time to decode it again. Decoding uses
+the standard library json module, the closest stand-in here for a phone's
+JSON parser.
+"""
+import argparse
+import gzip
+import json
+import timeit
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import msgpack
+
+from app.utils.serializers import FITNESS_CLASS_FORMATS
+from app.utils.timezone_utils import convert_utc_to_timezone_batch
+
+TIMEZONE = "Asia/Kolkata"
+STUDIOS = ["Yoga", "Zumba", "HIIT", "Pilates", "Spin", "Boxing"]
+
+DECODERS = {
+    "json": json.loads,
+    "columnar": json.loads,
+    "msgpack": msgpack.unpackb,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    start = datetime(2025, 7, 1)
+    classes = [
+        SimpleNamespace(
+            id=i, name=STUDIOS[i % len(STUDIOS)], instructor=f"Instructor {i % 40}",
+            scheduled_at=start + timedelta(minutes=30 * i), total_slots=20, remaining_slots=i % 20
+        )
+        for i in range(args.rows)
+    ]
+    scheduled_times = convert_utc_to_timezone_batch([c.scheduled_at for c in classes], TIMEZONE)
+
+    print(f"{args.rows} classes, best of {args.repeat}")
+    print(f"  {'format':<10}{'bytes':>10}{'gzipped':>10}{'encode ms':>12}{'decode ms':>12}")
+    baseline = None
+    for name, (_, serialize) in FITNESS_CLASS_FORMATS.items():
+        body = serialize(classes, scheduled_times)
+        decode = DECODERS[name]
+        encode_seconds = min(timeit.repeat(
+            lambda: serialize(classes, scheduled_times), number=1, repeat=args.repeat
+        ))
+        decode_seconds = min(timeit.repeat(lambda: decode(body), number=1, repeat=args.repeat))
+        baseline = baseline or len(body)
+        print(
+            f"  {name:<10}{len(body):>10}{len(gzip.compress(body)):>10}"
+            f"{encode_seconds * 1000:>12.2f}{decode_seconds * 1000:>12.2f}  "
+            f"{len(body) / baseline:.0%} of JSON"
+        )
+
+
+if __name__ == "__main__":
+    main()
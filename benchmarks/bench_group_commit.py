@@ -0,0 +1,112 @@
+"""
+Booking throughput with a commit per booking versus group commit
+
+    python -m benchmarks.bench_group_commit --requests 2000 --workers 32
+    SQLITE_SYNCHRONOUS=FULL python -m benchmarks.bench_group_commit --windows 0 1 2 5
+
+Both modes book every spot of a fresh class from --workers threads. The
+per-request mode calls create_booking, one transaction and commit each;
+group commit hands the bookings to a GroupCommitWriter, which commits
+whatever arrived within the window together. Runs against a scratch
+SQLite file unless --database-url is given. With SQLITE_SYNCHRONOUS=FULL
+every commit is an fsync, which is where grouping helps most.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.crud.book_class import create_booking
+from app.crud.group_commit import GroupCommitWriter
+from app.database import Base, configure_engine, engine_options
+from app.models import Booking, FitnessClass
+from app.schemas import BookingCreate
+
+DEFAULT_DATABASE_PATH = "./bench_group_commit.db"
+
+
+def add_class(session_factory, slots: int) -> int:
+    with session_factory() as db:
+        fitness_class = FitnessClass(
+            name="Benchmark Group Commit",
+            scheduled_at=datetime.now(timezone.utc) + timedelta(days=1),
+            instructor="Benchmark",
+            total_slots=slots,
+            available_slots=slots
+        )
+        db.add(fitness_class)
+        db.commit()
+        return fitness_class.id
+
+
+def run(session_factory, requests: int, workers: int, window_ms=None, max_batch: int = 64) -> float:
+    """Book every spot of a fresh class; returns bookings per second"""
+    class_id = add_class(session_factory, requests)
+    writer = GroupCommitWriter(session_factory, window_ms, max_batch) if window_ms is not None else None
+
+    def book(i):
+        booking_data = BookingCreate(
+            class_id=class_id,
+            client_name="Benchmark Client",
+            client_email=f"bench{i}@example.com"
+        )
+        if writer is not None:
+            return writer.submit(booking_data).result()
+        with session_factory() as db:
+            return create_booking(db, booking_data)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(book, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    if writer is not None:
+        writer.close()
+    with session_factory() as db:
+        booked = db.query(Booking).filter(Booking.class_id == class_id).count()
+    if booked != requests:
+        print(f"WARNING: {booked} bookings for {requests} requests")
+    return requests / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", default=None, help=f"defaults to a fresh {DEFAULT_DATABASE_PATH}")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 2, 5], help="group commit windows in ms")
+    parser.add_argument("--max-batch", type=int, default=64)
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{DEFAULT_DATABASE_PATH}"
+    options = engine_options(database_url)
+    if database_url.startswith("sqlite"):
+        options["pool_size"] = args.workers
+    engine = create_engine(database_url, **options)
+    configure_engine(engine)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+    print(f"{engine.url.render_as_string(hide_password=True)}: "
+          f"{args.requests} bookings on one class, {args.workers} workers")
+    try:
+        baseline = run(session_factory, args.requests, args.workers)
+        print(f"  {'commit per booking':<28}{baseline:8.0f} bookings/sec")
+        for window in args.windows:
+            rate = run(session_factory, args.requests, args.workers, window, args.max_batch)
+            label = f"group commit, {window:g} ms"
+            print(f"  {label:<28}{rate:8.0f} bookings/sec  x{rate / baseline:.2f}")
+    finally:
+        engine.dispose()
+        if args.database_url is None:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(DEFAULT_DATABASE_PATH + suffix):
+                    os.remove(DEFAULT_DATABASE_PATH + suffix)
+
+
+if __name__ == "__main__":
+    main()
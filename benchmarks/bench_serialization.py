@@ -0,0 +1,75 @@
+"""
+Compare per-row response serialization before and after the orjson fast path
+
+    python -m benchmarks.bench_serialization --rows 10000
+"""
+import argparse
+import json
+import timeit
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.schemas import FitnessClassResponse
+from app.utils.serializers import serialize_fitness_classes
+from app.utils.timezone_utils import convert_utc_to_timezone_batch
+
+TIMEZONE = "Asia/Kolkata"
+
+
+def pydantic_path(classes, scheduled_times, adapter):
+    """The original path: build models, let response_model validate and dump them"""
+    models = [
+        FitnessClassResponse(
+            id=c.id, name=c.name, scheduled_at=scheduled_at, instructor=c.instructor,
+            total_slots=c.total_slots, available_slots=c.remaining_slots
+        )
+        for c, scheduled_at in zip(classes, scheduled_times)
+    ]
+    validated = adapter.validate_python(models, from_attributes=True)
+    content = jsonable_encoder(adapter.dump_python(validated, mode="json"))
+    return json.dumps(content, separators=(",", ":")).encode()
+
+
+def orjson_path(classes, scheduled_times, _adapter):
+    return serialize_fitness_classes(classes, scheduled_times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    start = datetime(2025, 7, 1)
+    classes = [
+        SimpleNamespace(
+            id=i, name="Yoga", instructor=f"Instructor {i % 20}",
+            scheduled_at=start + timedelta(hours=i), total_slots=20, remaining_slots=i % 20
+        )
+        for i in range(args.rows)
+    ]
+    scheduled_times = convert_utc_to_timezone_batch([c.scheduled_at for c in classes], TIMEZONE)
+    adapter = TypeAdapter(List[FitnessClassResponse])
+
+    assert json.loads(pydantic_path(classes, scheduled_times, adapter)) == \
+        json.loads(orjson_path(classes, scheduled_times, adapter))
+
+    print(f"{args.rows} classes, best of {args.repeat}")
+    baseline = None
+    for name, fn in (("pydantic + response_model", pydantic_path), ("orjson single pass", orjson_path)):
+        seconds = min(timeit.repeat(
+            lambda: fn(classes, scheduled_times, adapter), number=1, repeat=args.repeat
+        ))
+        baseline = baseline or seconds
+        print(
+            f"  {name:<26} {seconds * 1000:8.2f} ms  "
+            f"{seconds / args.rows * 1e6:6.2f} us/row  x{baseline / seconds:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Booking throughput on a single hot class, with and without slot shards
+
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_sharded_slots --shards 1 2 4 8
+
+Every booking on an unsharded class updates the same classes row, so
+writers queue on its row lock. Shards spread them over several rows.
+SQLite has one writer lock for the whole database, so sharding cannot
+help there and its extra statements make it slower: 1000 bookings from
+32 workers ran at 332 bookings/sec unsharded and 142-164 sharded. Any
+gain has to be measured on a server database with row locks before
+turning SLOT_SHARDS on.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from app.crud import book_class, slot_shards
+from app.database import Base, SessionLocal, engine
+from app.models import Booking, ClassSlotShard, FitnessClass
+from app.schemas import BookingCreate
+
+
+def run(shards: int, requests: int, workers: int) -> float:
+    """Book every spot of a fresh class; returns bookings per second"""
+    book_class.SLOT_SHARDS = slot_shards.SLOT_SHARDS = shards if shards > 1 else 0
+
+    db = SessionLocal()
+    fitness_class = FitnessClass(
+        name="Benchmark Hot Class",
+        scheduled_at=datetime.now(timezone.utc) + timedelta(days=1),
+        instructor="Benchmark",
+        total_slots=requests,
+        available_slots=requests
+    )
+    db.add(fitness_class)
+    db.commit()
+    class_id = fitness_class.id
+    if shards > 1:
+        slot_shards.shard_class_slots(db, class_id, shards)
+    db.close()
+
+    def book(i):
+        session = SessionLocal()
+        try:
+            book_class.create_booking(session, BookingCreate(
+                class_id=class_id,
+                client_name="Benchmark Client",
+                client_email=f"bench{i}@example.com"
+            ))
+        finally:
+            session.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(book, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    db = SessionLocal()
+    try:
+        db.query(Booking).filter(Booking.class_id == class_id).delete()
+        db.query(ClassSlotShard).filter(ClassSlotShard.class_id == class_id).delete()
+        db.query(FitnessClass).filter(FitnessClass.id == class_id).delete()
+        db.commit()
+    finally:
+        db.close()
+    return requests / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=32)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    print(f"{engine.url.render_as_string(hide_password=True)}: "
+          f"{args.requests} bookings on one class, {args.workers} workers")
+    baseline = None
+    for shards in args.shards:
+        rate = run(shards, args.requests, args.workers)
+        baseline = baseline or rate
+        print(f"  {shards:>3} shard(s)  {rate:8.0f} bookings/sec  x{rate / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Compare per-row timezone conversion with the batch conversion API
+
+    python -m benchmarks.bench_timezone --rows 5000 --timezone America/New_York
+"""
+import argparse
+import timeit
+from datetime import datetime, timedelta, timezone
+
+import pytz
+
+from app.utils.timezone_utils import convert_utc_to_timezone, convert_utc_to_timezone_batch
+
+
+def per_row_uncached(utc_datetimes, target_timezone):
+    """The original path: a pytz lookup for every row"""
+    return [
+        dt.replace(tzinfo=timezone.utc).astimezone(pytz.timezone(target_timezone))
+        for dt in utc_datetimes
+    ]
+
+
+def per_row(utc_datetimes, target_timezone):
+    return [convert_utc_to_timezone(dt, target_timezone) for dt in utc_datetimes]
+
+
+def batch(utc_datetimes, target_timezone):
+    return convert_utc_to_timezone_batch(utc_datetimes, target_timezone)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--timezone", default="America/New_York")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    # A schedule of classes every three hours, spanning DST transitions,
+    # as naive UTC values the way SQLite returns them
+    start = datetime(2025, 1, 1)
+    utc_datetimes = [start + timedelta(hours=3 * i) for i in range(args.rows)]
+
+    print(f"{args.rows} rows, timezone {args.timezone}, best of {args.repeat}")
+    baseline = None
+    for name, fn in (("per-row, pytz lookup", per_row_uncached),
+                     ("per-row, memoized", per_row),
+                     ("batch", batch)):
+        seconds = min(timeit.repeat(
+            lambda: fn(utc_datetimes, args.timezone), number=1, repeat=args.repeat
+        ))
+        baseline = baseline or seconds
+        print(
+            f"  {name:<22} {seconds * 1000:8.2f} ms  "
+            f"{seconds / args.rows * 1e6:6.2f} us/row  x{baseline / seconds:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()